@@ -7,10 +7,20 @@ Lê configurações do .env e envia alertas formatados para drops
 import os
 import sys
 import json
+import time
 import logging
+import argparse
+import threading
 import requests
-from datetime import datetime
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Iterator, Optional, TextIO
+
+from enrichment import Enricher, load_enricher
+from networks import NetworkClassifier, load_classifier
+from rules import RuleEngine
+from templates import render as render_template
 
 # Configurar logging básico
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,8 +37,9 @@ def load_env():
         except ImportError:
             logger.warning("python-dotenv não instalado, usando apenas variáveis de ambiente do sistema")
 
+@lru_cache(maxsize=1)
 def get_env_vars() -> tuple[Optional[str], Optional[str]]:
-    """Obtém as variáveis obrigatórias do ambiente"""
+    """Obtém as variáveis obrigatórias do ambiente (carregadas uma única vez)"""
     load_env()
     
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -40,99 +51,76 @@ def get_env_vars() -> tuple[Optional[str], Optional[str]]:
     
     return bot_token, chat_id
 
-def is_drop_event(event: Dict[str, Any]) -> bool:
-    """Verifica se o evento indica um Drop"""
-    # Verifica action
-    action = event.get("action", "")
-    if isinstance(action, str) and action.lower() == "drop":
-        return True
-    
-    # Verifica mensagens
-    debug_msg = event.get("debug_message", "")
-    message = event.get("message", "")
-    
-    for msg in [debug_msg, message]:
-        if isinstance(msg, str) and "drop" in msg.lower():
-            return True
-    
-    return False
+@lru_cache(maxsize=1)
+def get_classifier() -> NetworkClassifier:
+    """Classificador de redes (NETWORKS_FILE), carregado uma única vez"""
+    load_env()
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'networks.txt')
+    return load_classifier(os.getenv('NETWORKS_FILE', default_path),
+                           int(os.getenv('NETWORKS_CACHE_SIZE', '65536')))
 
-def normalize_severity(severity: str) -> str:
-    """Normaliza severity removendo duplicações"""
-    if not severity:
-        return "—"
-    
-    # Remove duplicações como "info,info"
-    parts = [part.strip() for part in severity.split(',')]
-    unique_parts = list(dict.fromkeys(parts))  # Remove duplicatas mantendo ordem
-    return unique_parts[0].upper() if unique_parts else "—"
-
-def extract_field(event: Dict[str, Any], field_paths: list) -> str:
-    """Extrai campo usando múltiplos caminhos possíveis"""
-    for path in field_paths:
-        # Primeiro tenta como chave literal
-        value = event.get(path)
-        if value:
-            return str(value)
-            
-        # Se contém ponto, tenta como campo aninhado
-        if '.' in path:
-            keys = path.split('.')
-            temp_value = event
-            try:
-                for key in keys:
-                    temp_value = temp_value[key]
-                if temp_value:
-                    return str(temp_value)
-            except (KeyError, TypeError):
-                continue
-    
-    return "—"
+@lru_cache(maxsize=1)
+def get_enricher() -> Enricher:
+    """Enriquecimento (fabricante do MAC, país/ASN e DNS reverso da origem), carregado uma única vez"""
+    load_env()
+    ip_files = [path.strip() for path in os.getenv('ENRICH_IP_FILES', '').split(',') if path.strip()]
+    return load_enricher(os.getenv('ENRICH_OUI_FILE', ''), ip_files,
+                         rdns=os.getenv('ENRICH_RDNS', 'false').lower() == 'true',
+                         rdns_ttl=int(os.getenv('ENRICH_RDNS_TTL', '3600')),
+                         rdns_negative_ttl=int(os.getenv('ENRICH_RDNS_NEGATIVE_TTL', '300')),
+                         rdns_cache_size=int(os.getenv('ENRICH_RDNS_CACHE_SIZE', '10000')),
+                         rdns_workers=int(os.getenv('ENRICH_RDNS_WORKERS', '4')),
+                         cache_size=int(os.getenv('ENRICH_CACHE_SIZE', '65536')))
+
+@lru_cache(maxsize=1)
+def get_rules() -> RuleEngine:
+    """Regras de filtro (RULES_FILE ou as regras padrão), compiladas uma única vez"""
+    load_env()
+    return RuleEngine(os.getenv('RULES_FILE', ''))
+
+def is_drop_event(event: Dict[str, Any]) -> bool:
+    """Verifica se o evento indica um Drop (regras do escopo "alerts": action Drop ou "drop" na mensagem)"""
+    return get_rules().allows("alerts", event)
 
 def format_alert_message(event: Dict[str, Any]) -> str:
-    """Formata mensagem de alerta para Telegram"""
-    # Extrair campos com fallbacks
-    timestamp = extract_field(event, ["timestamp", "@timestamp", "time"])
-    if timestamp and timestamp != "—":
-        try:
-            # Tentar formatar timestamp se for ISO
-            if 'T' in timestamp:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                timestamp = dt.strftime('%Y-%m-%d %H:%M:%S')
-        except:
-            pass  # Usar timestamp original se falhar
-    
-    host_ip = extract_field(event, ["host.ip", "host", "src_host", "device_ip"])
-    alert_type = extract_field(event, ["alert_type", "type", "topic"])
-    severity = normalize_severity(extract_field(event, ["severity", "level"]))
-    priority = extract_field(event, ["priority", "prio"]).upper()
-    action = extract_field(event, ["action", "act"])
-    protocol = extract_field(event, ["protocol", "proto"])
-    
-    src_ip = extract_field(event, ["source.ip", "srcip", "src_ip"])
-    src_port = extract_field(event, ["source.port", "srcport", "src_port"])
-    dst_ip = extract_field(event, ["destination.ip", "dstip", "dst_ip"])
-    dst_port = extract_field(event, ["destination.port", "dstport", "dst_port"])
-    
-    mac = extract_field(event, ["src-mac", "src_mac", "mac", "source_mac"])
-    interface = extract_field(event, ["interface", "in_interface", "iface"])
-    details = extract_field(event, ["message", "details", "description"])
-    
-    # Construir mensagem formatada
-    message = f"""🚨 MIKROTIK ALERT
-📅 {timestamp}
-🖥️ Host: {host_ip}
-⚠️ Tipo: {alert_type} | Sev: {severity} | Prio: {priority}
-❌ Ação: {action} | 🌐 {protocol}
-📤 {src_ip}:{src_port} → 📥 {dst_ip}:{dst_port}
-🔗 MAC: {mac} | 🔌 Iface: {interface}
-💬 {details}"""
-    
-    return message
+    """Formata mensagem de alerta para Telegram (template "alert" em templates.py)"""
+    return render_template("alert", {**event, **get_classifier().template_fields(event),
+                                     **get_enricher().template_fields(event)})
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Retorna a sessão HTTP compartilhada (keep-alive) para a API do Telegram"""
+    global _session
+    if _session is None:
+        # Threads do pool podem chegar aqui juntas: só uma cria a sessão
+        with _session_lock:
+            if _session is None:
+                pool_size = int(os.getenv('TELEGRAM_MAX_CONNECTIONS', '10'))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+@lru_cache(maxsize=1)
+def get_timeouts() -> tuple[float, float]:
+    """Timeouts (connect, read) em segundos"""
+    return (float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5')),
+            float(os.getenv('TELEGRAM_READ_TIMEOUT', '10')))
+
+@lru_cache(maxsize=1)
+def get_api_base_url() -> str:
+    """URL base da API do Telegram (permite apontar para um stub local)"""
+    return os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org').rstrip('/')
 
 def send_telegram_alert(message: str, bot_token: str, chat_id: str) -> bool:
     """Envia alerta para Telegram com retry"""
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    url = f"{get_api_base_url()}/bot{bot_token}/sendMessage"
+    session = get_session()
+    timeouts = get_timeouts()
     
     payload = {
         "chat_id": chat_id,
@@ -143,7 +131,7 @@ def send_telegram_alert(message: str, bot_token: str, chat_id: str) -> bool:
     # Retry até 3 tentativas
     for attempt in range(3):
         try:
-            response = requests.post(url, json=payload, timeout=10)
+            response = session.post(url, json=payload, timeout=timeouts)
             
             if response.status_code == 200:
                 logger.info("Alerta enviado com sucesso para Telegram")
@@ -164,21 +152,18 @@ def send_telegram_alert(message: str, bot_token: str, chat_id: str) -> bool:
     logger.error("Falha ao enviar alerta após 3 tentativas")
     return False
 
-def handle_log(event: Dict[str, Any]) -> bool:
-    """
-    Função pública principal para processar eventos de log
-    
-    Args:
-        event: Dicionário com dados do evento de log
-        
-    Returns:
-        bool: True se enviou alerta, False se ignorou ou erro
-    """
-    # Verificar se é evento de Drop
+def should_alert(event: Dict[str, Any]) -> bool:
+    """Verifica se o evento gera alerta: é Drop e não vem de uma rede marcada com "ignore" (networks.txt)"""
     if not is_drop_event(event):
         logger.debug("Evento ignorado - não é Drop")
         return False
-    
+    if get_classifier().is_ignored(event):
+        logger.debug("Evento ignorado - rede ignorada")
+        return False
+    return True
+
+def send_alert(event: Dict[str, Any]) -> bool:
+    """Formata e envia o alerta de um evento que já passou por ``should_alert``"""
     # Obter configurações do .env
     bot_token, chat_id = get_env_vars()
     if not bot_token or not chat_id:
@@ -200,16 +185,106 @@ def handle_log(event: Dict[str, Any]) -> bool:
         logger.error(f"Erro ao processar evento: {e}")
         return False
 
+def handle_log(event: Dict[str, Any]) -> bool:
+    """
+    Função pública principal para processar eventos de log
+    
+    Args:
+        event: Dicionário com dados do evento de log
+        
+    Returns:
+        bool: True se enviou alerta, False se ignorou ou erro
+    """
+    return should_alert(event) and send_alert(event)
+
+def iter_events(stream: TextIO, stats: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+    """Lê eventos NDJSON de um stream, um por linha, sem carregar o arquivo inteiro"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        stats['lines'] += 1
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            stats['invalid'] += 1
+            continue
+        if not isinstance(event, dict):
+            stats['invalid'] += 1
+            continue
+        yield event
+
+def stream_events(stream: TextIO, concurrency: int = 4) -> Dict[str, Any]:
+    """
+    Processa um stream NDJSON com configuração e sessão HTTP compartilhadas
+    
+    Eventos que não são Drop (ou de redes ignoradas) são descartados na thread
+    principal; os envios rodam em um pool de threads com no máximo
+    ``concurrency`` envios em andamento, sem filtrar de novo. A sessão HTTP é
+    criada antes do pool.
+    
+    Returns:
+        Dict com contadores e vazão do processamento
+    """
+    stats = {'lines': 0, 'invalid': 0, 'ignored': 0, 'sent': 0, 'failed': 0}
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(concurrency)
+    
+    def on_done(future):
+        try:
+            success = future.result()
+        except Exception as e:
+            logger.error(f"Erro ao processar evento: {e}")
+            success = False
+        with lock:
+            stats['sent' if success else 'failed'] += 1
+        in_flight.release()
+    
+    get_session()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for event in iter_events(stream, stats):
+            if not should_alert(event):
+                stats['ignored'] += 1
+                continue
+            in_flight.acquire()
+            executor.submit(send_alert, event).add_done_callback(on_done)
+    
+    elapsed = time.perf_counter() - started
+    stats['elapsed_seconds'] = round(elapsed, 3)
+    stats['events_per_second'] = round(stats['lines'] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
+
 def main():
-    """CLI simples para teste"""
-    if len(sys.argv) != 2:
-        print("Uso: python alerts.py '<json_event>'")
-        print("Exemplo: python alerts.py '{\"action\":\"Drop\",\"message\":\"teste\"}'")
+    """CLI para teste (um evento) ou processamento em stream (NDJSON)"""
+    parser = argparse.ArgumentParser(
+        description="Alertas Mikrotik via Telegram",
+        epilog="Exemplo: python alerts.py '{\"action\":\"Drop\",\"message\":\"teste\"}'"
+    )
+    parser.add_argument('event', nargs='?', help="evento JSON único")
+    parser.add_argument('--stream', nargs='?', const='-', metavar='ARQUIVO',
+                        help="lê eventos NDJSON do arquivo (ou stdin se omitido/'-')")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="envios simultâneos no modo stream (padrão: 4)")
+    args = parser.parse_args()
+    
+    if args.stream is not None:
+        if args.stream == '-':
+            stats = stream_events(sys.stdin, args.concurrency)
+        else:
+            with open(args.stream, encoding='utf-8') as f:
+                stats = stream_events(f, args.concurrency)
+        print(f"Linhas: {stats['lines']} | Inválidas: {stats['invalid']} | Ignoradas: {stats['ignored']} | "
+              f"Enviadas: {stats['sent']} | Falhas: {stats['failed']}")
+        print(f"Tempo: {stats['elapsed_seconds']}s | Vazão: {stats['events_per_second']} eventos/s")
+        sys.exit(0 if stats['failed'] == 0 else 1)
+    
+    if args.event is None:
+        parser.print_usage()
         sys.exit(1)
     
     try:
-        event_json = sys.argv[1]
-        event = json.loads(event_json)
+        event = json.loads(args.event)
         
         result = handle_log(event)
         print(f"Resultado: {'Enviado' if result else 'Não enviado'}")
@@ -1,31 +1,226 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
-import httpx
+from fastapi.responses import JSONResponse, Response
+import asyncio
+import logging
 import os
 import time
-from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from pydantic import BaseModel, Field, ValidationError
 import hashlib
-from collections import defaultdict, deque
-from datetime import datetime
+from collections import defaultdict
+from contextlib import asynccontextmanager
 from config import *
+import codec
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from telegram_client import SendResult, TelegramClient
+from destinations import Destination, load_router
+from digest import DigestAggregator
+from drain import TemplateMiner
+from enrichment import load_enricher
+from es_indexer import BulkIndexer, event_document
+from heavy_hitters import HeavyHitters
+from networks import load_classifier
+from routeros import parse_line
+from rules import RuleEngine
+from scan_detector import ScanDetector
+from send_queue import PRIORITIES, PRIORITY_INDEX, SendQueue, event_priority
+from spool import Spool, open_spool
+from state import create_state_backend
+from syslog_listener import SyslogListener
+from templates import extract_rule_name, render as render_template
+from timeseries import TimeSeriesStore, finite, parse_step, parse_time
 
-app = FastAPI(title="Mikrotik Logs Telegram Bridge", version="1.0.0")
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger("telegram_bridge")
+# httpx logs every request URL at INFO, and Bot API URLs contain the token
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+metrics = Registry()
+EVENTS_RECEIVED = metrics.counter("bridge_events_received_total", "Events received", ["source"])
+EVENTS_SKIPPED = metrics.counter("bridge_events_skipped_total", "Events skipped before sending", ["reason"])
+EVENTS_DEDUPLICATED = metrics.counter("bridge_events_deduplicated_total", "Events dropped as duplicates")
+EVENTS_RATE_LIMITED = metrics.counter("bridge_events_rate_limited_total", "Events rejected by the rate limit")
+EVENTS_AGGREGATED = metrics.counter("bridge_events_aggregated_total", "Events added to the digest")
+EVENTS_QUEUED = metrics.counter("bridge_events_queued_total", "Events written to the outbound spool")
+EVENTS_SPOOL_FULL = metrics.counter("bridge_events_spool_full_total", "Events rejected because the spool is full")
+MESSAGES_SENT = metrics.counter("bridge_messages_sent_total", "Messages delivered to Telegram")
+MESSAGES_FAILED = metrics.counter("bridge_messages_failed_total", "Messages that failed to send")
+TELEGRAM_RESPONSES = metrics.counter("bridge_telegram_responses_total", "Telegram API responses", ["status_code"])
+DEDUP_TEMPLATES = metrics.gauge("bridge_dedup_templates", "Message templates held for deduplication")
+DEDUP_TEMPLATE_LOOKUPS = metrics.counter("bridge_dedup_template_lookups_total", "Template lookups since start",
+                                         ["result"])
+SPOOL_PENDING = metrics.gauge("bridge_spool_pending", "Messages waiting in the outbound spool")
+DESTINATION_MESSAGES = metrics.counter("bridge_destination_messages_total", "Sends per destination",
+                                       ["destination", "result"])
+DESTINATION_RATE = metrics.gauge("bridge_destination_rate", "Current adaptive rate limit (messages per minute)",
+                                 ["destination"])
+ENRICHMENT_LOOKUPS = metrics.counter("bridge_enrichment_lookups_total", "Enrichment cache lookups since start",
+                                     ["source", "result"])
+RDNS_SECONDS = metrics.histogram("bridge_rdns_duration_seconds", "Reverse DNS resolution latency")
+SCANS_DETECTED = metrics.counter("bridge_scans_detected_total", "Port scans and sweeps detected", ["kind"])
+SCAN_SOURCES = metrics.gauge("bridge_scan_sources", "Sources tracked by the scan detector")
+SERIES_KEYS = metrics.gauge("bridge_series_keys", "Live time series held in memory (/series)")
+RULE_HITS = metrics.gauge("bridge_rule_hits", "Events decided by each filter rule since load", ["scope", "rule"])
+RULE_EVAL_SECONDS = metrics.gauge("bridge_rule_avg_eval_seconds", "Sampled average evaluation time per rule",
+                                  ["scope", "rule"])
+SEND_QUEUE_DEPTH = metrics.gauge("bridge_send_queue_depth", "Messages waiting in the send queue", ["priority"])
+SEND_QUEUE_WAIT = metrics.histogram("bridge_send_queue_wait_seconds", "Time from enqueue to send", ["priority"])
+SEND_QUEUE_SHED = metrics.counter("bridge_send_queue_shed_total", "Messages dropped by load shedding",
+                                  ["priority", "reason"])
+SEND_QUEUE_FAILED = metrics.counter("bridge_send_queue_failed_total",
+                                    "Queued messages answered with 202 that no destination accepted", ["priority"])
+ES_INDEX_DOCUMENTS = metrics.counter("bridge_es_index_documents_total",
+                                     "Documents seen by the Elasticsearch indexer since start", ["result"])
+ES_INDEX_PENDING = metrics.gauge("bridge_es_index_pending", "Documents buffered or in flight to Elasticsearch")
+ES_INDEX_REQUESTS = metrics.counter("bridge_es_index_requests_total", "_bulk requests since start", ["result"])
+STAGE_SECONDS = metrics.histogram("bridge_stage_duration_seconds", "Latency per pipeline stage", ["stage"])
+
+telegram_client = TelegramClient(
+    TELEGRAM_BOT_TOKEN,
+    base_url=TELEGRAM_API_BASE_URL,
+    connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+    read_timeout=TELEGRAM_READ_TIMEOUT,
+    max_connections=TELEGRAM_MAX_CONNECTIONS,
+    max_keepalive=TELEGRAM_MAX_KEEPALIVE,
+    keepalive_expiry=TELEGRAM_KEEPALIVE_EXPIRY,
+    http2=TELEGRAM_HTTP2
+)
+
+syslog_listener: Optional[SyslogListener] = None
+# One spool and sender per destination, so a throttled chat only delays itself
+spools: Dict[str, Spool] = {}
+spool_wakeups: Dict[str, asyncio.Event] = {}
+# Without the spool: accepted messages wait here for the send workers (SEND_QUEUE_ENABLED)
+send_queue: Optional[SendQueue] = None
+# ES_INDEX_ENABLED: lines and events written to Elasticsearch by the bridge itself
+indexer: Optional[BulkIndexer] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled Telegram client on startup and close it on shutdown"""
+    global syslog_listener, send_queue, indexer
+    await telegram_client.start()
+    await router.start()
+    digest_task = asyncio.create_task(digest_loop()) if DIGEST_ENABLED else None
+    spool_tasks = []
+    if SPOOL_ENABLED:
+        for destination in router.destinations:
+            # The single default chat keeps the spool directory of earlier versions
+            directory = SPOOL_DIR if not DESTINATIONS_FILE else os.path.join(SPOOL_DIR, destination.name)
+            spool = spools[destination.name] = open_spool(directory, segment_bytes=SPOOL_SEGMENT_BYTES,
+                                                          max_bytes=SPOOL_MAX_BYTES, fsync=SPOOL_FSYNC)
+            spool_wakeups[destination.name] = asyncio.Event()
+            if len(spool):
+                logger.info("Spool %s: %d messages left from the last run", spool.directory, len(spool))
+            spool_tasks.append(asyncio.create_task(spool_loop(destination)))
+    elif SEND_QUEUE_ENABLED:
+        send_queue = SendQueue(send_queued, maxsize=SEND_QUEUE_SIZE, workers=SEND_QUEUE_WORKERS,
+                               max_age=SEND_QUEUE_MAX_AGE, on_shed=shed_queued, on_failed=failed_queued,
+                               observe_wait=SEND_QUEUE_WAIT.observe)
+        await send_queue.start()
+    if ES_INDEX_ENABLED:
+        indexer = BulkIndexer(ELASTICSEARCH_URL, index_prefix=ES_INDEX_PREFIX, batch_size=ES_INDEX_BATCH_SIZE,
+                              batch_bytes=ES_INDEX_BATCH_BYTES, flush_interval=ES_INDEX_FLUSH_INTERVAL,
+                              max_pending=ES_INDEX_MAX_PENDING, workers=ES_INDEX_WORKERS,
+                              retry_base=ES_INDEX_RETRY_BASE, retry_max=ES_INDEX_RETRY_MAX,
+                              compresslevel=ES_INDEX_GZIP_LEVEL)
+        await indexer.start()
+        logger.info("Indexing %s into %s (%s-*)", ",".join(sorted(ES_INDEX_SOURCES)), ELASTICSEARCH_URL,
+                    ES_INDEX_PREFIX)
+    if SYSLOG_ENABLED:
+        syslog_listener = SyslogListener(
+            process_syslog_event,
+            host=SYSLOG_HOST,
+            port=SYSLOG_PORT,
+            queue_size=SYSLOG_QUEUE_SIZE,
+            workers=SYSLOG_WORKERS,
+            reuse_port=SYSLOG_REUSEPORT,
+            rcvbuf=SYSLOG_RCVBUF,
+            on_line=index_syslog_line if indexer is not None and "syslog" in ES_INDEX_SOURCES else None
+        )
+        await syslog_listener.start()
+    try:
+        yield
+    finally:
+        if syslog_listener is not None:
+            await syslog_listener.stop()
+        if digest_task is not None:
+            digest_task.cancel()
+            await flush_digest()
+        # Unsent messages stay on disk for the next start
+        for task in spool_tasks:
+            task.cancel()
+        for spool in spools.values():
+            spool.close()
+        spools.clear()
+        if indexer is not None:
+            # Flushes the buffered documents (the listener is stopped, nothing new arrives)
+            await indexer.close()
+            indexer = None
+        if send_queue is not None:
+            # Gives queued messages a few seconds to go out before the clients close
+            await send_queue.close()
+            send_queue = None
+        await router.close()
+        await telegram_client.close()
+        enricher.close()
+        state.close()
+
+app = FastAPI(title="Mikrotik Logs Telegram Bridge", version="1.0.0", lifespan=lifespan)
 
 # Configuration from config.py
 # TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID are already imported
 
-if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-    raise ValueError("TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set")
+if not DESTINATIONS_FILE and (not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID):
+    raise ValueError("TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set (or DESTINATIONS_FILE)")
+
+# Chats/webhooks and the routing rules that pick them; without DESTINATIONS_FILE
+# everything goes to TELEGRAM_CHAT_ID
+router = load_router(DESTINATIONS_FILE, telegram_client, TELEGRAM_CHAT_ID, rate=DESTINATION_RATE_LIMIT,
+                     burst=DESTINATION_BURST, bot_rate=TELEGRAM_BOT_RATE, client_options={
+                         "base_url": TELEGRAM_API_BASE_URL,
+                         "connect_timeout": TELEGRAM_CONNECT_TIMEOUT,
+                         "read_timeout": TELEGRAM_READ_TIMEOUT,
+                         "max_connections": TELEGRAM_MAX_CONNECTIONS,
+                         "max_keepalive": TELEGRAM_MAX_KEEPALIVE,
+                         "keepalive_expiry": TELEGRAM_KEEPALIVE_EXPIRY,
+                         "http2": TELEGRAM_HTTP2
+                     })
 
 # Rate limiting and deduplication
 RATE_LIMIT = 20  # messages per minute
 DEDUP_WINDOW = 60  # seconds
-MIN_SEVERITY = "info"
 
-# In-memory storage for rate limiting and deduplication
-message_queue = deque()
-message_hashes = defaultdict(float)
+# Rate limiting and deduplication state (shared between workers with STATE_BACKEND=sqlite)
+state = create_state_backend(STATE_BACKEND, RATE_LIMIT, DEDUP_WINDOW, DEDUP_MAX_ENTRIES, path=STATE_PATH)
+
+# Message templates for DEDUP_KEY=template (ports, lengths, MACs... masked)
+template_miner = TemplateMiner(max_templates=DEDUP_MAX_TEMPLATES, similarity=DEDUP_TEMPLATE_SIMILARITY)
+
+# Digest mode: alerts are aggregated and sent as one summary per window
+digest = DigestAggregator(max_groups=DIGEST_MAX_GROUPS)
+
+# Top drop sources/ports/interfaces/MACs per window, in fixed memory
+heavy_hitters = HeavyHitters(capacity=HEAVY_HITTERS_CAPACITY)
+
+# Per-second/per-minute counts per host, interface and alert_type for live Grafana panels (/series)
+series = TimeSeriesStore(seconds=SERIES_SECONDS, minutes=SERIES_MINUTES, max_keys=SERIES_MAX_KEYS)
+
+# Distinct dstip:dstport per source over SCAN_WINDOW, in bounded memory
+scan_detector = ScanDetector(window=SCAN_WINDOW, threshold=SCAN_THRESHOLD, max_sources=SCAN_MAX_SOURCES,
+                             precision=SCAN_PRECISION, cooldown=SCAN_COOLDOWN) if SCAN_DETECTION else None
+
+# Filters of /notify, the syslog listener and /drop-forward (RULES_FILE or the built-in rules)
+alert_rules = RuleEngine(RULES_FILE)
+
+# srcip/dstip -> tags (ignore, internal, multicast, ...), loaded once at startup
+networks = load_classifier(NETWORKS_FILE, NETWORKS_CACHE_SIZE)
+
+# MAC vendor, source country/ASN (offline databases) and cached reverse DNS
+enricher = load_enricher(ENRICH_OUI_FILE, ENRICH_IP_FILES, rdns=ENRICH_RDNS, rdns_ttl=ENRICH_RDNS_TTL,
+                         rdns_negative_ttl=ENRICH_RDNS_NEGATIVE_TTL, rdns_cache_size=ENRICH_RDNS_CACHE_SIZE,
+                         rdns_workers=ENRICH_RDNS_WORKERS, cache_size=ENRICH_CACHE_SIZE,
+                         observe=RDNS_SECONDS.observe)
 
 class LogMessage(BaseModel):
     timestamp: str = Field(alias="@timestamp")
@@ -45,277 +240,582 @@ class LogMessage(BaseModel):
     in_interface: Optional[str] = None
     conn_state: Optional[str] = None
 
-def check_rate_limit() -> bool:
-    """Check if we're within rate limit"""
-    current_time = time.time()
-    
-    # Remove old messages from queue
-    while message_queue and current_time - message_queue[0] > 60:
-        message_queue.popleft()
-    
-    return len(message_queue) < RATE_LIMIT
+def check_dedup_key():
+    """Fail at startup on a DEDUP_KEY/DEDUP_FIELDS typo instead of silently merging every message's key"""
+    if DEDUP_KEY not in ("template", "exact"):
+        raise ValueError(f"unknown DEDUP_KEY: {DEDUP_KEY} (expected template or exact)")
+    # An unknown name reads as empty for every message, so it would not separate anything
+    unknown = sorted(set(DEDUP_FIELDS) - set(LogMessage.model_fields))
+    if unknown:
+        raise ValueError(f"unknown DEDUP_FIELDS {unknown}; known fields: {', '.join(LogMessage.model_fields)}")
+
+check_dedup_key()
+
+def rule_rejection(scope: str, event: Dict[str, Any]) -> Optional[str]:
+    """Skip reason when the rules of ``scope`` reject the event, None when it passes"""
+    accepted, rule = alert_rules.decide(scope, event)
+    if accepted:
+        return None
+    return f"ignored by rule {rule.name}" if rule is not None else "no matching rule"
 
-def check_deduplication(message_hash: str) -> bool:
+def index_event(source: str, event: Dict[str, Any]):
+    """Buffer an accepted /notify or /drop-forward event for Elasticsearch when ``source`` is indexed.
+
+    A full indexer buffer only counts the document as rejected: alerts are
+    never refused because Elasticsearch is slow.
+    """
+    if indexer is not None and source in ES_INDEX_SOURCES:
+        indexer.add(event_document(event))
+
+def index_syslog_line(line: str, host: str, event: Optional[Dict[str, Any]]):
+    """Every line of the syslog listener goes to Elasticsearch, as the Logstash udp input does"""
+    indexer.add_line(line, host, event)
+
+def validation_errors(error: ValidationError) -> List[Dict[str, Any]]:
+    return error.errors(include_url=False, include_input=False, include_context=False)
+
+async def check_deduplication(message_hash: str) -> bool:
     """Check if message is duplicate within dedup window"""
-    current_time = time.time()
-    
-    if message_hash in message_hashes:
-        if current_time - message_hashes[message_hash] < DEDUP_WINDOW:
-            return False  # Duplicate found
-        else:
-            del message_hashes[message_hash]  # Remove old entry
-    
-    message_hashes[message_hash] = current_time
-    return True
+    return await state.check_deduplication(message_hash)
 
 def create_message_hash(log_data: LogMessage) -> str:
     """Create hash for deduplication"""
-    # Create hash based on key fields to identify similar messages
-    hash_string = f"{log_data.host}:{log_data.topic}:{log_data.severity}:{log_data.message}"
+    if DEDUP_KEY == "exact":
+        # Create hash based on key fields to identify similar messages
+        hash_string = f"{log_data.host}:{log_data.topic}:{log_data.severity}:{log_data.message}"
+    else:
+        # Lines of one flood share a template even though ports/lengths differ
+        fields = log_data.__dict__
+        hash_string = f"{template_miner.match(log_data.message)}:" + ":".join(
+            str(fields.get(field) or "") for field in DEDUP_FIELDS)
     return hashlib.md5(hash_string.encode()).hexdigest()
 
+def top_context(srcip: Optional[str]) -> Dict[str, Any]:
+    """Template fields with the source's rank among the top drop sources"""
+    if not srcip or not TOP_CONTEXT_MAX_RANK:
+        return {}
+    ranked = heavy_hitters.rank("srcip", str(srcip), TOP_CONTEXT_WINDOW)
+    # A single drop is not worth a ranking line
+    if ranked is None or ranked[0] > TOP_CONTEXT_MAX_RANK or ranked[1] < 2:
+        return {}
+    return {"src_rank": ranked[0], "src_rank_count": ranked[1], "src_rank_window": TOP_CONTEXT_WINDOW}
+
 def format_telegram_message(log_data: LogMessage) -> str:
     """Format log message for Telegram"""
-    # Parse and format timestamp
-    timestamp = log_data.timestamp
-    try:
-        # Parse ISO timestamp and format to Brazilian time
-        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        formatted_time = dt.strftime("%d/%m/%Y %H:%M:%S")
-    except Exception as e:
-        print(f"Error parsing timestamp {timestamp}: {e}")
-        formatted_time = timestamp[:19] if len(timestamp) > 19 else timestamp
-    
-    # Clean severity (remove duplicates)
-    severity = log_data.severity
-    if ',' in severity:
-        severity_parts = [s.strip() for s in severity.split(',')]
-        severity = severity_parts[0]  # Take first part only
-    
-    # Determine alert emoji based on priority/type
-    if log_data.priority == "high" or log_data.alert_type == "firewall_drop":
-        header_emoji = "🔥"
-        priority_emoji = "🔴"
-    elif log_data.priority == "critical":
-        header_emoji = "🚨"
-        priority_emoji = "🔴"
-    else:
-        header_emoji = "⚠️"
-        priority_emoji = "🟡"
-    
-    # Base message with improved formatting
-    message_parts = [
-        f"{header_emoji} **FIREWALL BLOCKED**",
-        f"🕐 {formatted_time}",
-        ""
-    ]
+    event = log_data.__dict__
+    return render_template("notify", {**event, **networks.template_fields(event), **enricher.template_fields(event),
+                                      **top_context(log_data.srcip)})
+
+async def send_telegram_message(message: str, destinations: Optional[Sequence[Destination]] = None,
+                                max_wait: Optional[float] = DESTINATION_MAX_WAIT) -> bool:
+    """Send message to its destinations concurrently (catch-all ones by default); True if any accepted it"""
+    if destinations is None:
+        destinations = router.catch_all or router.destinations
+    results = await asyncio.gather(*(deliver_message(destination, message, max_wait)
+                                     for destination in destinations))
+    return any(result.ok for result in results)
+
+def enqueue_message(message: str, destinations: Sequence[Destination], priority: int,
+                    slot: Optional[Any] = None) -> bool:
+    """Hand a formatted alert to the send workers; False if load shedding dropped it"""
+    return send_queue.put((message, destinations, slot), priority)
+
+async def send_queued(payload: Tuple[str, Sequence[Destination], Optional[Any]]) -> bool:
+    """Send worker: deliver one queued message, waiting for the destination limits as long as needed.
+
+    Waiting here only holds a worker; while they are all busy the queue
+    fills and sheds its lowest-priority messages.
+    """
+    message, destinations, _ = payload
+    return await send_telegram_message(message, destinations, max_wait=None)
+
+def failed_queued(payload: Tuple[str, Sequence[Destination], Optional[Any]], priority: int):
+    """A queued message was not delivered: it was already answered with 202, so count it and free its slot"""
+    message, destinations, slot = payload
+    SEND_QUEUE_FAILED.inc(PRIORITIES[priority])
+    logger.error("Send queue: failed to deliver a %s message to %s", PRIORITIES[priority],
+                 ", ".join(destination.name for destination in destinations))
+    if slot is not None:
+        state.release_send(slot)
+
+def shed_queued(payload: Tuple[str, Sequence[Destination], Optional[Any]], priority: int, reason: str):
+    """A queued message was dropped (queue full, too old or shutting down): count it and free its slot"""
+    message, destinations, slot = payload
+    SEND_QUEUE_SHED.inc(PRIORITIES[priority], reason)
+    logger.warning("Send queue: shed a %s message (%s) for %s", PRIORITIES[priority], reason,
+                   ", ".join(destination.name for destination in destinations))
+    if slot is not None:
+        state.release_send(slot)
+
+async def deliver_message(destination: Destination, message: str,
+                          max_wait: Optional[float] = DESTINATION_MAX_WAIT) -> SendResult:
+    """Send message to one destination within its rate limit and return the API result.
+
+    Waits for the destination's token bucket up to max_wait seconds (None:
+    as long as needed); past that the message counts as rate limited.
+    """
+    wait = destination.reserve(max_wait)
+    if wait is None:
+        DESTINATION_MESSAGES.inc(destination.name, "rate_limited")
+        logger.warning("Destination %s rate limited, message not sent", destination.name)
+        return SendResult(False, error="destination rate limit")
+    if wait:
+        await asyncio.sleep(wait)
     
-    # Firewall Drop specific format
-    if log_data.action == "Drop":
-        # Extract rule name from message for better context
-        rule_name = "Default Deny"
-        if "[" in log_data.message and "]" in log_data.message:
-            try:
-                rule_part = log_data.message.split("[")[1].split("]")[0]
-                if ":" in rule_part:
-                    rule_name = rule_part.split(":", 1)[1].strip()
-            except:
-                pass
-        
-        # Connection info with better formatting
-        if log_data.srcip and log_data.dstip:
-            src_info = f"📤 **Origem:** {log_data.srcip}:{log_data.srcport or '0'}"
-            dst_info = f"📥 **Destino:** {log_data.dstip}:{log_data.dstport or '0'}"
+    started = time.perf_counter()
+    result = await destination.send(message)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "send")
+    destination.record(result)
+    if destination.kind == "telegram":
+        TELEGRAM_RESPONSES.inc(str(result.status_code) if result.status_code else "error")
+    
+    if result.ok:
+        MESSAGES_SENT.inc()
+        DESTINATION_MESSAGES.inc(destination.name, "sent")
+        return result
+    
+    MESSAGES_FAILED.inc()
+    DESTINATION_MESSAGES.inc(destination.name, "failed")
+    if result.status_code is None:
+        logger.error("Error sending to %s: %s", destination.name, result.error)
+    else:
+        logger.error("%s API error: %s - %s", destination.name, result.status_code, result.error)
+    return result
+
+def spool_message(message: str, destinations: Sequence[Destination]) -> bool:
+    """Write a formatted alert to the spool of each destination; False if every spool is full"""
+    payload = codec.dumps({"text": message, "queued": time.time()})
+    queued = False
+    for destination in destinations:
+        spool = spools[destination.name]
+        if not spool.append(payload):
+            logger.error("Spool %s full (%d bytes pending), alert rejected", destination.name, spool.pending_bytes)
+            continue
+        queued = True
+        spool_wakeups[destination.name].set()
+    if not queued:
+        EVENTS_SPOOL_FULL.inc()
+        return False
+    EVENTS_QUEUED.inc()
+    return True
+
+async def spool_loop(destination: Destination):
+    """Send one destination's spooled alerts in order within the rate limits, retrying with backoff.
+
+    The global RATE_LIMIT slot was taken once per message when it was
+    spooled (queue_log); here each message only waits for the
+    destination's token bucket.
+
+    A message is only removed from the spool once the destination accepted
+    it. Failures back off exponentially from SPOOL_RETRY_BASE up to
+    SPOOL_RETRY_MAX, or wait the retry_after of a 429.
+    """
+    spool = spools[destination.name]
+    wakeup = spool_wakeups[destination.name]
+    delay = SPOOL_RETRY_BASE
+    while True:
+        try:
+            payload = spool.peek()
+            if payload is None:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
             
-            message_parts.extend([
-                f"🚫 **Regra:** {rule_name}",
-                f"🌐 **Protocolo:** {log_data.proto or 'UDP'}",
-                f"🔌 **Interface:** {log_data.in_interface or 'Unknown'}",
-                "",
-                src_info,
-                dst_info
-            ])
+            result = await deliver_message(destination, codec.loads(payload)["text"], max_wait=None)
+            if result.ok:
+                spool.ack()
+                delay = SPOOL_RETRY_BASE
+                continue
             
-            # Add MAC if available
-            if log_data.src_mac and log_data.src_mac != "unknown":
-                message_parts.append(f"🏷️ **MAC:** {log_data.src_mac}")
-                
-            # Add broadcast/multicast detection
-            if log_data.dstip == "255.255.255.255":
-                message_parts.append("📢 **Tipo:** Broadcast")
-            elif log_data.dstip.startswith("224."):
-                message_parts.append("📡 **Tipo:** Multicast")
-        
-    else:
-        # Other alert types
-        message_parts.extend([
-            f"📋 **{log_data.topic.upper()}**",
-            f"⚠️ {severity.title()}"
-        ])
-        
-        if log_data.priority:
-            message_parts.append(f"{priority_emoji} {log_data.priority.upper()}")
+            # e.g. Telegram's 400: this text will never be accepted, retrying would block the spool
+            if destination.permanent_failure(result):
+                logger.error("Dropping spooled message rejected by %s: %s", destination.name, result.error)
+                spool.ack()
+                continue
+            
+            wait = result.retry_after if result.retry_after else delay
+            delay = min(delay * 2, SPOOL_RETRY_MAX)
+            logger.warning("Spool %s: send failed, retrying in %.1fs (%d pending)",
+                           destination.name, wait, len(spool))
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error in spool sender %s: %s", destination.name, e)
+            await asyncio.sleep(delay)
+
+async def emit_scan_alert(scan: Dict[str, Any]) -> bool:
+    """Send a synthesized scan alert to its destinations.
+
+    It skips deduplication and the global rate limit: the detector already
+    emits at most one alert per source per SCAN_COOLDOWN.
+    """
+    SCANS_DETECTED.inc(scan["alert_type"])
+    logger.warning("Scan detected: %s from %s, ~%d targets", scan["alert_type"], scan["srcip"],
+                   scan["distinct_targets"])
+    destinations = router.route(scan)
+    if not destinations:
+        EVENTS_SKIPPED.inc("unrouted")
+        return False
+    message = render_template("scan", {**scan, **networks.template_fields(scan), **enricher.template_fields(scan)})
+    if spools:
+        return spool_message(message, destinations)
+    if send_queue is not None:
+        return enqueue_message(message, destinations, PRIORITY_INDEX["high"])
+    return await send_telegram_message(message, destinations)
+
+def add_to_digest(log_data: LogMessage):
+    """Count an accepted alert in the current digest window"""
+    digest.add(log_data.host, extract_rule_name(log_data.message),
+               log_data.srcip, log_data.dstport, time.time())
+
+async def flush_digest() -> bool:
+    """Send the pending digest as a single message if the rate limit allows it"""
+    global digest
     
-    # Add compact footer
-    message_parts.extend([
-        "",
-        f"🔍 **Log:** {log_data.message[:80]}..." if len(log_data.message) > 80 else f"🔍 **Log:** {log_data.message}"
-    ])
+    # While rate limited the events keep accumulating for the next window
+    if not len(digest):
+        return False
+    slot = await state.acquire_send()
+    if slot is None:
+        return False
     
-    return "\n".join(message_parts)
+    pending, digest = digest, DigestAggregator(max_groups=DIGEST_MAX_GROUPS)
+    success = await send_telegram_message(pending.format_message(DIGEST_WINDOW, DIGEST_TOP_N))
+    if not success:
+        state.release_send(slot)
+        pending.merge(digest)
+        digest = pending
+    return success
 
-async def send_telegram_message(message: str) -> bool:
-    """Send message to Telegram"""
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    
-    async with httpx.AsyncClient() as client:
+async def digest_loop():
+    """Flush the digest once per DIGEST_WINDOW"""
+    while True:
+        await asyncio.sleep(DIGEST_WINDOW)
         try:
-            response = await client.post(url, json={
-                "chat_id": TELEGRAM_CHAT_ID,
-                "text": message
-            })
-            
-            if response.status_code == 200:
-                return True
-            else:
-                print(f"Telegram API error: {response.status_code} - {response.text}")
-                return False
-                
+            await flush_digest()
         except Exception as e:
-            print(f"Error sending to Telegram: {e}")
-            return False
+            logger.error("Error flushing digest: %s", e)
 
-@app.post("/notify")
-async def notify_telegram(log_data: LogMessage):
-    """Receive log data and send to Telegram if conditions are met"""
+async def process_log(log_data: LogMessage) -> Tuple[Dict[str, Any], int]:
+    """Run one log through network filter, dedup, rate limit, format and send.
+
+    Callers apply the filter rules of their scope first. Returns the
+    response body and HTTP status code used by /notify.
+    """
+    logger.debug("Received log - topic: %s, severity: %s, action: %s",
+                 log_data.topic, log_data.severity, log_data.action)
     
-    print(f"DEBUG: Received log - topic: {log_data.topic}, severity: {log_data.severity}, action: {log_data.action}")
+    # Known-noise networks are dropped before they use dedup and rate limit budget
+    if networks.is_ignored(log_data.__dict__):
+        logger.debug("Skipping ignored network - %s -> %s", log_data.srcip, log_data.dstip)
+        EVENTS_SKIPPED.inc("network")
+        return {"status": "skipped", "reason": "ignored network"}, 200
     
-    # Check severity filter
-    severity_levels = ["critical", "error", "warning", "info", "system", "firewall"]
-    try:
-        current_severity_index = severity_levels.index(log_data.severity.lower())
-        min_severity_index = severity_levels.index(MIN_SEVERITY.lower())
-        
-        if current_severity_index > min_severity_index:
-            print(f"DEBUG: Skipping due to severity - {log_data.severity}")
-            return JSONResponse(content={"status": "skipped", "reason": "severity too low"})
-    except ValueError:
-        # If severity not in list, allow it
-        print(f"DEBUG: Severity not in list, allowing - {log_data.severity}")
-        pass
-    
-    # Check rate limit
-    if not check_rate_limit():
-        print("DEBUG: Rate limited")
-        return JSONResponse(content={"status": "rate_limited"}, status_code=429)
+    # Counted before digest/rate limit/dedup so /series, /top and the scan detector see the whole attack
+    series.add(log_data.__dict__)
+    if log_data.action == "Drop":
+        heavy_hitters.add(log_data.__dict__)
+        scan = scan_detector.add(log_data.__dict__) if scan_detector is not None else None
+        if scan is not None:
+            await emit_scan_alert(scan)
+    
+    if DIGEST_ENABLED:
+        add_to_digest(log_data)
+        EVENTS_AGGREGATED.inc()
+        return {"status": "aggregated"}, 200
+    
+    destinations = router.route(log_data.__dict__)
+    if not destinations:
+        logger.debug("No destination for %s/%s from %s", log_data.topic, log_data.severity, log_data.host)
+        EVENTS_SKIPPED.inc("unrouted")
+        return {"status": "skipped", "reason": "no destination"}, 200
+    
+    if spools:
+        content, status_code = await queue_log(log_data, destinations)
+        if content["status"] == "rate_limited":
+            EVENTS_RATE_LIMITED.inc()
+        elif content["status"] == "duplicate":
+            EVENTS_DEDUPLICATED.inc()
+        elif content["status"] == "format_error":
+            EVENTS_SKIPPED.inc("format_error")
+        return content, status_code
+    
+    # Check rate limit (reserves the slot; released below if nothing is sent)
+    slot = await state.acquire_send()
+    if slot is None:
+        logger.debug("Rate limited")
+        EVENTS_RATE_LIMITED.inc()
+        return {"status": "rate_limited"}, 429
     
     # Check deduplication
+    started = time.perf_counter()
     message_hash = create_message_hash(log_data)
-    if not check_deduplication(message_hash):
-        print("DEBUG: Duplicate message")
-        return JSONResponse(content={"status": "duplicate"})
+    is_new = await check_deduplication(message_hash)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "dedup")
+    if not is_new:
+        state.release_send(slot)
+        logger.debug("Duplicate message")
+        EVENTS_DEDUPLICATED.inc()
+        return {"status": "duplicate"}, 200
     
-    print("DEBUG: Formatting message for Telegram")
     # Format message
+    started = time.perf_counter()
     try:
         telegram_message = format_telegram_message(log_data)
-        print(f"DEBUG: Formatted message: {telegram_message[:100]}...")
     except Exception as e:
-        print(f"ERROR: Failed to format message: {e}")
-        return JSONResponse(content={"status": "format_error", "error": str(e)}, status_code=500)
+        state.release_send(slot)
+        logger.error("Failed to format message: %s", e)
+        EVENTS_SKIPPED.inc("format_error")
+        return {"status": "format_error", "error": str(e)}, 500
+    STAGE_SECONDS.observe(time.perf_counter() - started, "format")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Formatted message: %s...", telegram_message[:100])
+    
+    # Answer right away; a send worker delivers it (the slot is released there if it fails)
+    if send_queue is not None:
+        if not enqueue_message(telegram_message, destinations, event_priority(log_data.__dict__), slot):
+            return {"status": "shed", "reason": "send queue full"}, 200
+        return {"status": "queued"}, 202
     
-    # Send to Telegram
-    print("DEBUG: Sending to Telegram")
-    success = await send_telegram_message(telegram_message)
+    # Send to every destination the event routes to
+    success = await send_telegram_message(telegram_message, destinations)
     
     if success:
-        # Add to rate limit queue
-        message_queue.append(time.time())
-        print("DEBUG: Message sent successfully")
-        return JSONResponse(content={"status": "sent"})
+        logger.debug("Message sent successfully")
+        return {"status": "sent"}, 200
     else:
-        print("DEBUG: Failed to send to Telegram")
-        return JSONResponse(content={"status": "failed"}, status_code=500)
+        state.release_send(slot)
+        logger.debug("Failed to send to Telegram")
+        return {"status": "failed"}, 500
+
+async def queue_log(log_data: LogMessage, destinations: Sequence[Destination]) -> Tuple[Dict[str, Any], int]:
+    """Rate limit, dedup, format and spool one log; the destination limits are applied by the spool senders.
+
+    Like the direct path, the message takes one slot of the global
+    RATE_LIMIT however many destinations it fans out to. Rate limits,
+    duplicates and format errors are counted by the caller, process_log.
+    """
+    slot = await state.acquire_send()
+    if slot is None:
+        return {"status": "rate_limited"}, 429
+    
+    started = time.perf_counter()
+    is_new = await check_deduplication(create_message_hash(log_data))
+    STAGE_SECONDS.observe(time.perf_counter() - started, "dedup")
+    if not is_new:
+        state.release_send(slot)
+        return {"status": "duplicate"}, 200
+    
+    started = time.perf_counter()
+    try:
+        telegram_message = format_telegram_message(log_data)
+    except Exception as e:
+        state.release_send(slot)
+        logger.error("Failed to format message: %s", e)
+        return {"status": "format_error", "error": str(e)}, 500
+    STAGE_SECONDS.observe(time.perf_counter() - started, "format")
+    
+    if not spool_message(telegram_message, destinations):
+        state.release_send(slot)
+        return {"status": "spool_full"}, 503
+    return {"status": "queued"}, 202
+
+async def process_event(event: Any, parse_started: Optional[float] = None) -> Tuple[Dict[str, Any], int]:
+    """Index, filter, validate and process one decoded /notify event (or /notify/batch item).
+
+    With ``parse_started`` the time since then is observed as the "parse" stage.
+    """
+    if not isinstance(event, dict):
+        EVENTS_SKIPPED.inc("invalid")
+        return {"status": "invalid", "detail": "expected a JSON object"}, 422
+    index_event("notify", event)
+    
+    reason = rule_rejection("notify", event)
+    if reason is not None:
+        logger.debug("Skipping %s/%s - %s", event.get("topic"), event.get("severity"), reason)
+        EVENTS_SKIPPED.inc("rule")
+        return {"status": "skipped", "reason": reason}, 200
+    
+    try:
+        log_data = LogMessage.model_validate(event)
+    except ValidationError as e:
+        EVENTS_SKIPPED.inc("invalid")
+        return {"status": "invalid", "detail": validation_errors(e)}, 422
+    if parse_started is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - parse_started, "parse")
+    
+    return await process_log(log_data)
+
+@app.post("/notify")
+async def notify_telegram(request: Request):
+    """Receive log data and send to Telegram if conditions are met"""
+    EVENTS_RECEIVED.inc("notify")
+    
+    # Fast path: decode the raw body once and apply the filter rules before
+    # paying for the pydantic model
+    started = time.perf_counter()
+    try:
+        event = codec.loads(await request.body())
+    except codec.JSONDecodeError as e:
+        EVENTS_SKIPPED.inc("invalid")
+        return JSONResponse(content={"detail": f"invalid JSON: {e}"}, status_code=400)
+    
+    content, status_code = await process_event(event, started)
+    return JSONResponse(content=content, status_code=status_code)
+
+async def process_syslog_event(event: Dict[str, Any], source: str = "syslog"):
+    """Feed an event from the syslog listener (or /ingest) into the /notify path"""
+    # "syslog" rules; the defaults are the condition of the Logstash http output
+    if rule_rejection("syslog", event) is not None:
+        return
+    EVENTS_RECEIVED.inc(source)
+    await process_log(LogMessage.model_validate(event))
+
+@app.post("/ingest")
+async def ingest_lines(request: Request, host: Optional[str] = None):
+    """Raw RouterOS syslog lines over HTTP, one per line: indexed and alerted on like syslog datagrams.
+
+    ``host`` defaults to the client address. When the Elasticsearch buffer
+    cannot take the whole request it is refused with 429 and Retry-After,
+    so the shipper backs off and resends it.
+    """
+    text = (await request.body()).decode("utf-8", errors="replace")
+    lines = [line for line in text.splitlines() if line.strip()]
+    host = host or (request.client.host if request.client else "")
+    use_index = indexer is not None and "ingest" in ES_INDEX_SOURCES
+    if use_index and not indexer.has_room(len(lines)):
+        indexer.rejected += len(lines)
+        return JSONResponse(content={"status": "busy", "reason": "index buffer full"}, status_code=429,
+                            headers={"Retry-After": str(indexer.retry_after())})
+    
+    alerts = 0
+    for line in lines:
+        event = parse_line(line, host)
+        if use_index:
+            indexer.add_line(line, host, event)
+        if event is not None:
+            alerts += 1
+            await process_syslog_event(event, "ingest")
+    return JSONResponse(content={"status": "accepted", "lines": len(lines), "events": alerts,
+                                 "indexed": len(lines) if use_index else 0}, status_code=202)
+
+def parse_batch_body(body: bytes) -> List[Any]:
+    """Decode a JSON array or NDJSON body into a list of raw items.
+
+    NDJSON lines that fail to decode are returned as ValueError instances so
+    the caller can report them per item instead of rejecting the whole batch.
+    """
+    body = body.strip()
+    if not body:
+        return []
+    if body[:1] == b"[":
+        items = codec.loads(body)
+        if not isinstance(items, list):
+            raise ValueError("expected a JSON array")
+        return items
+    items = []
+    for line in body.split(b"\n"):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(codec.loads(line))
+        except codec.JSONDecodeError as e:
+            items.append(ValueError(f"invalid JSON: {e}"))
+    return items
+
+@app.post("/notify/batch")
+async def notify_telegram_batch(request: Request):
+    """Receive a JSON array or NDJSON stream of logs and run each through the /notify path.
+
+    Items are processed concurrently, at most NOTIFY_BATCH_CONCURRENCY at a
+    time; each result is the body /notify would have answered for it.
+    """
+    started = time.perf_counter()
+    try:
+        items = parse_batch_body(await request.body())
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "parse")
+    EVENTS_RECEIVED.inc("batch", amount=len(items))
+    
+    results: List[Dict[str, Any]] = [{"index": i} for i in range(len(items))]
+    semaphore = asyncio.Semaphore(NOTIFY_BATCH_CONCURRENCY)
+    
+    async def process_item(result: Dict[str, Any], item: Any):
+        if isinstance(item, ValueError):
+            EVENTS_SKIPPED.inc("invalid")
+            result.update(status="invalid", detail=str(item))
+            return
+        async with semaphore:
+            content, _ = await process_event(item)
+        result.update(content)
+    
+    await asyncio.gather(*(process_item(result, item) for result, item in zip(results, items)))
+    
+    summary: Dict[str, int] = defaultdict(int)
+    for result in results:
+        summary[result["status"]] += 1
+    
+    return JSONResponse(content={
+        "status": "processed",
+        "count": len(items),
+        "summary": summary,
+        "results": results
+    })
 
 @app.post("/drop-forward")
 async def forward_drop_logs(request: Request):
     """Endpoint para encaminhar logs brutos que contenham 'Drop' para o Telegram"""
+    EVENTS_RECEIVED.inc("drop_forward")
     try:
-        # Receber dados como dict
-        log_data = await request.json()
-        
-        # Verificar se é um log com Drop
-        log_message = log_data.get("message", "")
-        log_action = log_data.get("action", "")
-        
-        # Verifica se contém "Drop" em qualquer campo
-        contains_drop = False
-        for value in log_data.values():
-            if isinstance(value, str) and "drop" in value.lower():
-                contains_drop = True
-                break
+        # Receber dados como dict (decodificação direta dos bytes)
+        started = time.perf_counter()
+        log_data = codec.loads(await request.body())
+        STAGE_SECONDS.observe(time.perf_counter() - started, "parse")
+        if isinstance(log_data, dict):
+            index_event("drop_forward", log_data)
         
-        if not contains_drop:
+        # Regras do escopo "drop_forward" (padrão: "drop" em action, message e campos conhecidos)
+        if not isinstance(log_data, dict) or rule_rejection("drop_forward", log_data) is not None:
+            EVENTS_SKIPPED.inc("no_drop")
             return JSONResponse(content={"status": "ignored", "reason": "no drop detected"})
         
-        # Formatar mensagem no estilo original do Telegram
-        timestamp = log_data.get("timestamp", log_data.get("@timestamp", ""))
-        host = log_data.get("host", "")
-        topic = log_data.get("topic", log_data.get("alert_type", ""))
-        severity = log_data.get("severity", "")
-        priority = log_data.get("priority", "")
-        action = log_data.get("action", "")
-        protocol = log_data.get("protocol", log_data.get("proto", ""))
-        src_ip = log_data.get("source.ip", log_data.get("srcip", ""))
-        src_port = log_data.get("source.port", log_data.get("srcport", ""))
-        dst_ip = log_data.get("destination.ip", log_data.get("dstip", ""))
-        dst_port = log_data.get("destination.port", log_data.get("dstport", ""))
-        mac = log_data.get("src-mac", log_data.get("src_mac", ""))
-        interface = log_data.get("interface", log_data.get("in_interface", ""))
-        details = log_data.get("message", "")
-        
-        # Formatar timestamp
-        try:
-            if timestamp:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                formatted_time = dt.strftime("%d/%m/%Y %H:%M:%S")
-            else:
-                formatted_time = "N/A"
-        except Exception as e:
-            print(f"Error parsing timestamp in drop-forward {timestamp}: {e}")
-            formatted_time = timestamp[:19] if timestamp and len(timestamp) > 19 else timestamp or "N/A"
-        
-        # Formatar mensagem no novo estilo
-        message_parts = [
-            "🔥 **MIKROTIK ALERT**",
-            f"📅 {formatted_time}",
-            "",
-            "🛡️ **FIREWALL DROP**"
-        ]
-        
-        if protocol and interface:
-            message_parts.append(f"📍 {protocol} • {interface}")
-        elif protocol:
-            message_parts.append(f"📍 {protocol}")
+        # Redes marcadas com "ignore" (networks.txt) não geram alerta
+        if networks.is_ignored(log_data):
+            EVENTS_SKIPPED.inc("network")
+            return JSONResponse(content={"status": "ignored", "reason": "ignored network"})
+        series.add(log_data)
+        heavy_hitters.add(log_data)
         
-        if src_ip and dst_ip:
-            src_info = f"{src_ip}:{src_port}" if src_port else src_ip
-            dst_info = f"{dst_ip}:{dst_port}" if dst_port else dst_ip
-            message_parts.append(f"🔗 {src_info} → {dst_info}")
+        # Destinos conforme as regras de roteamento (host, alert_type, severity, interface)
+        destinations = router.route(log_data)
+        if not destinations:
+            EVENTS_SKIPPED.inc("unrouted")
+            return JSONResponse(content={"status": "ignored", "reason": "no destination"})
         
-        if mac:
-            message_parts.append(f"🏷️ {mac}")
+        # Formatar mensagem no estilo original do Telegram (com tags de rede e ranking da origem, se houver)
+        started = time.perf_counter()
+        telegram_message = render_template("drop_forward", {**log_data, **networks.template_fields(log_data),
+                                                            **enricher.template_fields(log_data),
+                                                            **top_context(log_data.get("srcip"))})
+        STAGE_SECONDS.observe(time.perf_counter() - started, "format")
         
-        message_parts.extend([
-            "─" * 25,
-            f"💬 {details}"
-        ])
+        # Com o spool ativo o envio (e as novas tentativas) fica com o sender em segundo plano
+        if spools:
+            if not spool_message(telegram_message, destinations):
+                return JSONResponse(content={"status": "spool_full"}, status_code=503)
+            return JSONResponse(content={"status": "queued", "format": "original"}, status_code=202)
         
-        telegram_message = "\n".join(message_parts)
+        # Sem spool: resposta imediata e envio pelos workers da fila, por prioridade
+        if send_queue is not None:
+            if not enqueue_message(telegram_message, destinations, event_priority(log_data)):
+                return JSONResponse(content={"status": "shed", "reason": "send queue full"})
+            return JSONResponse(content={"status": "queued", "format": "original"}, status_code=202)
         
-        # Enviar para Telegram
-        success = await send_telegram_message(telegram_message)
+        # Enviar para os destinos (em paralelo)
+        success = await send_telegram_message(telegram_message, destinations)
         
         if success:
             return JSONResponse(content={"status": "sent", "format": "original"})
@@ -323,7 +823,7 @@ async def forward_drop_logs(request: Request):
             return JSONResponse(content={"status": "failed"}, status_code=500)
             
     except Exception as e:
-        print(f"Error in /drop-forward endpoint: {e}")
+        logger.error("Error in /drop-forward endpoint: %s", e)
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/health")
@@ -331,25 +831,233 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": time.time()}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics"""
+    template_stats = template_miner.stats()
+    DEDUP_TEMPLATES.set(template_stats["templates"])
+    DEDUP_TEMPLATE_LOOKUPS.set_total(template_stats["hits"], "hit")
+    DEDUP_TEMPLATE_LOOKUPS.set_total(template_stats["misses"], "miss")
+    SPOOL_PENDING.set(sum(len(spool) for spool in spools.values()))
+    if send_queue is not None:
+        for priority, depth in send_queue.depth().items():
+            SEND_QUEUE_DEPTH.set(depth, priority)
+    SERIES_KEYS.set(len(series))
+    SCAN_SOURCES.set(len(scan_detector) if scan_detector is not None else 0)
+    for scope, rule_set in alert_rules.scopes.items():
+        for rule in rule_set.rules:
+            RULE_HITS.set(rule.hits, scope, rule.name)
+            if rule.samples:
+                RULE_EVAL_SECONDS.set(rule.sample_ns / rule.samples / 1e9, scope, rule.name)
+    if indexer is not None:
+        index_stats = indexer.stats()
+        for result in ("accepted", "indexed", "failed", "rejected"):
+            ES_INDEX_DOCUMENTS.set_total(index_stats[result], result)
+        ES_INDEX_PENDING.set(index_stats["pending"])
+        ES_INDEX_REQUESTS.set_total(index_stats["requests"], "sent")
+        ES_INDEX_REQUESTS.set_total(index_stats["retries"], "retried")
+        ES_INDEX_REQUESTS.set_total(index_stats["throttled"], "throttled")
+    for destination in router.destinations:
+        DESTINATION_RATE.set(destination.bucket.rate * 60, destination.name)
+    enrichment_stats = enricher.stats()
+    for source in ("oui", "ip"):
+        if enrichment_stats[source]:
+            ENRICHMENT_LOOKUPS.set_total(enrichment_stats[source]["cache_hits"], source, "cache_hit")
+            ENRICHMENT_LOOKUPS.set_total(enrichment_stats[source]["cache_misses"], source, "cache_miss")
+    if enrichment_stats["rdns"]:
+        for result in ("hits", "negative_hits", "misses", "dropped"):
+            ENRICHMENT_LOOKUPS.set_total(enrichment_stats["rdns"][result], "rdns", result)
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/top")
+async def get_top(window: str = "5m", field: Optional[str] = None, n: int = 10):
+    """Top drop sources, ports, interfaces and MACs over a sliding window"""
+    if window not in HeavyHitters.WINDOWS:
+        return JSONResponse(content={"detail": f"window must be one of {list(HeavyHitters.WINDOWS)}"},
+                            status_code=400)
+    if field is not None and field not in HeavyHitters.FIELDS:
+        return JSONResponse(content={"detail": f"field must be one of {list(HeavyHitters.FIELDS)}"},
+                            status_code=400)
+    
+    current_time = time.time()
+    top = {}
+    for name in (field,) if field else HeavyHitters.FIELDS:
+        top[name] = [
+            {"key": key, "count": count, "error": error}
+            for key, count, error in heavy_hitters.top(name, window, max(n, 0), current_time)
+        ]
+    return {
+        "window": window,
+        "drops": heavy_hitters.total(window, current_time),
+        "top": top,
+        "timestamp": current_time
+    }
+
+@app.get("/scans")
+async def get_scans(n: int = 10):
+    """Sources with the most distinct dstip:dstport targets in the scan window"""
+    current_time = time.time()
+    if scan_detector is None:
+        return {"enabled": False, "timestamp": current_time}
+    return {
+        "enabled": True,
+        "window": SCAN_WINDOW,
+        "threshold": SCAN_THRESHOLD,
+        "top": scan_detector.suspects(max(n, 0), current_time),
+        "timestamp": current_time
+    }
+
+def series_response(target: str, start: float, end: float, step: float, rate: bool) -> List[Dict[str, Any]]:
+    """Grafana JSON datasource timeseries: [{"target": ..., "datapoints": [[value, ms], ...]}]"""
+    keys = series.keys(target) if any(char in target for char in "*?[") else [target]
+    return [
+        {"target": key, "datapoints": [[value, timestamp] for timestamp, value in
+                                       series.query(key, start, end, step, rate)]}
+        for key in keys
+    ]
+
+@app.get("/series")
+async def get_series(target: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                     step: Optional[str] = None, rate: bool = False, format: str = "timeseries"):
+    """Live event counts per host/interface/alert_type from the in-memory ring buffers.
+
+    Without ``target`` lists the series names (also the datasource health
+    check). ``target`` may be a shell pattern (``host:*``); ``start``/``end``
+    accept epoch seconds or milliseconds or ISO 8601 and default to the last
+    five minutes; ``step`` is seconds or a Grafana interval (``15s``, ``1m``).
+    ``format=table`` returns flat rows for the Infinity datasource.
+    """
+    current_time = time.time()
+    if target is None:
+        return series.keys()
+    try:
+        range_start = parse_time(start, current_time - 300)
+        range_end = parse_time(end, current_time)
+        step_seconds = parse_step(step)
+    except ValueError as e:
+        return JSONResponse(content={"detail": f"invalid time or step: {e}"}, status_code=400)
+    response = [item for name in target.split(",") if name
+                for item in series_response(name, range_start, range_end, step_seconds, rate)]
+    if format == "table":
+        return [{"time": timestamp, "series": item["target"], "value": value}
+                for item in response for value, timestamp in item["datapoints"]]
+    return response
+
+@app.post("/series/search")
+async def search_series(request: Request):
+    """Grafana JSON datasource metric names, optionally filtered by a pattern in "target" """
+    try:
+        body = codec.loads(await request.body() or b"{}")
+    except codec.JSONDecodeError:
+        body = {}
+    pattern = body.get("target") if isinstance(body, dict) else None
+    return series.keys(f"*{pattern}*" if pattern and not any(char in pattern for char in "*?[") else pattern)
+
+@app.post("/series/query")
+async def query_series(request: Request):
+    """Grafana JSON datasource query: range, intervalMs and targets in, one timeseries per target out"""
+    try:
+        body = codec.loads(await request.body())
+        time_range = body.get("range") or {}
+        current_time = time.time()
+        range_start = parse_time(time_range.get("from"), current_time - 300)
+        range_end = parse_time(time_range.get("to"), current_time)
+        step = finite((body.get("intervalMs") or 0) / 1000)
+        # "payload": {"rate": true} on a target returns events per second instead of counts
+        targets = [(item["target"], bool((item.get("payload") or {}).get("rate")))
+                   for item in body.get("targets", [])
+                   if isinstance(item, dict) and item.get("target") and not item.get("hide")]
+    except (codec.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+        return JSONResponse(content={"detail": f"invalid query: {e}"}, status_code=400)
+    return [item for target, rate in targets
+            for item in series_response(target, range_start, range_end, step, rate)]
+
+@app.get("/rules")
+async def get_rules():
+    """Filter rules per scope in evaluation order, with hit counters and sampled cost"""
+    return {**alert_rules.stats(), "timestamp": time.time()}
+
+@app.post("/rules/reload")
+async def reload_rules():
+    """Compile RULES_FILE again; on any error the current rules stay in place"""
+    try:
+        counts = alert_rules.reload()
+    except Exception as e:
+        logger.error("Rules reload failed, keeping the current rules: %s", e)
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    return {"status": "reloaded", "rules": counts, "timestamp": time.time()}
+
+@app.get("/templates")
+async def get_templates(n: int = 20):
+    """Largest message templates learned for deduplication"""
+    return {
+        "key": DEDUP_KEY,
+        "top": template_miner.top(max(n, 0)),
+        **template_miner.stats(),
+        "timestamp": time.time()
+    }
+
+@app.get("/spool")
+async def get_spool():
+    """Outbound spool backlog and sender counters"""
+    current_time = time.time()
+    if not spools:
+        return {"enabled": False, "timestamp": current_time}
+    destinations = {}
+    for name, spool in spools.items():
+        payload = spool.peek()
+        oldest = codec.loads(payload)["queued"] if payload is not None else None
+        destinations[name] = {
+            **spool.stats(),
+            "oldest_age": round(current_time - oldest, 3) if oldest is not None else None
+        }
+    return {
+        "enabled": True,
+        "pending": sum(len(spool) for spool in spools.values()),
+        "destinations": destinations,
+        "timestamp": current_time
+    }
+
 @app.get("/stats")
 async def get_stats():
     """Get current statistics"""
     current_time = time.time()
-    
-    # Clean up old hashes
-    active_hashes = {k: v for k, v in message_hashes.items() 
-                     if current_time - v < DEDUP_WINDOW}
+    dedup_stats = await state.dedup_stats()
     
     return {
+        "state_backend": state.name,
         "rate_limit": {
-            "current": len(message_queue),
+            "current": await state.rate_count(current_time),
             "limit": RATE_LIMIT,
             "window": "60 seconds"
         },
         "deduplication": {
-            "active_hashes": len(active_hashes),
-            "window": f"{DEDUP_WINDOW} seconds"
+            "active_hashes": dedup_stats["size"],
+            "window": f"{DEDUP_WINDOW} seconds",
+            "key": DEDUP_KEY,
+            "fields": list(DEDUP_FIELDS) if DEDUP_KEY != "exact" else [],
+            "templates": template_miner.stats(),
+            **dedup_stats
+        },
+        "digest": {
+            "enabled": DIGEST_ENABLED,
+            "pending_events": len(digest),
+            "groups": len(digest.groups),
+            "window": f"{DIGEST_WINDOW} seconds"
         },
+        "spool": {name: spool.stats() for name, spool in spools.items()} if spools else {"enabled": False},
+        "send_queue": send_queue.stats() if send_queue is not None else {"enabled": False},
+        "routing": router.stats(),
+        "heavy_hitters": heavy_hitters.stats(),
+        "series": series.stats(),
+        "scan": scan_detector.stats() if scan_detector else {"enabled": False},
+        "rules": alert_rules.stats(),
+        "networks": networks.stats(),
+        "enrichment": enricher.stats(),
+        "syslog": syslog_listener.stats() if syslog_listener else {"enabled": False},
+        "es_index": ({"sources": sorted(ES_INDEX_SOURCES), **indexer.stats()} if indexer is not None
+                     else {"enabled": False}),
+        "telegram": telegram_client.stats(),
         "timestamp": current_time
     }
 
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: memory of the dedup store under a replay of unique events.
+
+Replays N unique message hashes at a simulated rate and samples the traced
+memory every 10% of the run, comparing the old unbounded defaultdict with
+DedupCache. Usage:
+
+    python bench/bench_dedup.py [--events 1000000] [--rate 5000] [--max-entries 100000]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DedupCache  # noqa: E402
+
+DEDUP_WINDOW = 60
+
+
+def legacy_check(store, message_hash, current_time):
+    """Copy of the original check_deduplication over a defaultdict"""
+    if message_hash in store:
+        if current_time - store[message_hash] < DEDUP_WINDOW:
+            return False
+        del store[message_hash]
+    store[message_hash] = current_time
+    return True
+
+
+def replay(name, check, size, events, rate):
+    samples = []
+    step = max(events // 10, 1)
+    start_clock = 1_700_000_000.0
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(events):
+        message_hash = hashlib.md5(f"10.0.0.1:firewall:info:drop len={i}".encode()).hexdigest()
+        check(message_hash, start_clock + i / rate)
+        if (i + 1) % step == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            samples.append((i + 1, size(), current))
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    print(f"\n{name}")
+    print(f"{'events':>10} {'entries':>10} {'memory MB':>10}")
+    for count, entries, memory in samples:
+        print(f"{count:>10,} {entries:>10,} {memory / 1e6:>10.1f}")
+    print(f"per-event cost (incl. md5 + tracing): {elapsed / events * 1e6:.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--rate", type=float, default=5000, help="simulated events per second")
+    parser.add_argument("--max-entries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    legacy = defaultdict(float)
+    replay("legacy defaultdict (unbounded)",
+           lambda h, t: legacy_check(legacy, h, t), lambda: len(legacy), args.events, args.rate)
+    del legacy
+
+    cache = DedupCache(DEDUP_WINDOW, max_entries=args.max_entries)
+    replay(f"DedupCache (ttl={DEDUP_WINDOW}s, max_entries={args.max_entries:,})",
+           cache.check, lambda: len(cache), args.events, args.rate)
+    print(f"stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
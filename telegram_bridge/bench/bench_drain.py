@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: template-based dedup keys vs the exact message hash.
+
+Replays synthetic RouterOS traffic (bench/traffic.py) and a single-source
+flood, and counts how many distinct dedup keys, i.e. Telegram sends within
+one dedup window, each key produces. Also reports the cost of one template
+match and the template table's hit ratio. Usage:
+
+    python bench/bench_drain.py [--events 100000] [--sources 2000]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from drain import TemplateMiner  # noqa: E402
+from traffic import TrafficGenerator  # noqa: E402
+
+FIELDS = ("host", "topic", "severity", "srcip")
+
+
+def exact_key(event):
+    return hashlib.md5(f"{event['host']}:{event['topic']}:{event['severity']}:{event['message']}".encode()).hexdigest()
+
+
+def template_key(miner, event):
+    hash_string = f"{miner.match(event['message'])}:" + ":".join(str(event.get(f) or "") for f in FIELDS)
+    return hashlib.md5(hash_string.encode()).hexdigest()
+
+
+def run(name, events):
+    miner = TemplateMiner()
+    started = time.perf_counter()
+    exact = {exact_key(event) for event in events}
+    exact_us = (time.perf_counter() - started) / len(events) * 1e6
+    started = time.perf_counter()
+    template = {template_key(miner, event) for event in events}
+    template_us = (time.perf_counter() - started) / len(events) * 1e6
+    stats = miner.stats()
+    print(f"{name}: {len(events):,} events")
+    print(f"  exact keys:    {len(exact):>7,}  ({exact_us:.2f} us/event)")
+    print(f"  template keys: {len(template):>7,}  ({template_us:.2f} us/event, "
+          f"{stats['templates']} templates, hit ratio {stats['hit_ratio']:.3f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--sources", type=int, default=2000)
+    args = parser.parse_args()
+
+    generator = TrafficGenerator(sources=args.sources)
+    mixed = [payload for _, _, payload in generator.events(args.events)]
+    run("mixed traffic", mixed)
+
+    # One scanner hitting one router: only ports, lengths and flags change
+    flood = TrafficGenerator(seed=1, drop_ratio=1.0, sources=1)
+    run("single-source flood", [payload for _, _, payload in flood.events(args.events // 10)])
+
+
+if __name__ == "__main__":
+    main()
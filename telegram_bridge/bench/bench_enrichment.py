@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: offline enrichment lookups (MAC vendor and IP country/ASN).
+
+Writes synthetic databases the size of the real ones (--ranges iptoasn-style
+ranges, --ouis Wireshark manuf entries) to a temporary directory, loads them
+and measures per-event enrichment for repeated sources (cached) and for
+all-distinct sources (bisect and hash lookups only). Usage:
+
+    python bench/bench_enrichment.py [--ranges 500000] [--ouis 30000] [--lookups 200000]
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enrichment import Enricher, IpRangeTable, OuiTable  # noqa: E402
+
+COUNTRIES = ("BR", "US", "CN", "RU", "DE", "NL", "IN", "VN", "KR", "FR")
+
+
+def write_ranges(path, rng, count):
+    starts = sorted(rng.sample(range(1 << 24, 224 << 24), count))
+    with open(path, "w") as f:
+        for i, start in enumerate(starts):
+            end = min(start + rng.randrange(256, 65536), starts[i + 1] - 1 if i + 1 < count else start + 256)
+            asn = rng.randrange(1, 400000)
+            f.write(f"{ipaddress.IPv4Address(start)}\t{ipaddress.IPv4Address(end)}\t{asn}\t"
+                    f"{rng.choice(COUNTRIES)}\tAS-{asn}-NET\n")
+
+
+def write_manuf(path, rng, count):
+    with open(path, "w") as f:
+        f.write("# synthetic manuf\n")
+        for prefix in rng.sample(range(1 << 24), count):
+            f.write(f"{prefix >> 16:02X}:{prefix >> 8 & 0xFF:02X}:{prefix & 0xFF:02X}\tV{prefix:06X}\t"
+                    f"Vendor {prefix:06X} Inc\n")
+
+
+def measure(func, events):
+    started = time.perf_counter()
+    for event in events:
+        func(event)
+    return (time.perf_counter() - started) / len(events) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ranges", type=int, default=500_000)
+    parser.add_argument("--ouis", type=int, default=30_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        ranges_path = os.path.join(directory, "ip2asn-v4.tsv")
+        manuf_path = os.path.join(directory, "manuf")
+        write_ranges(ranges_path, rng, args.ranges)
+        write_manuf(manuf_path, rng, args.ouis)
+
+        started = time.perf_counter()
+        ip_table = IpRangeTable()
+        ip_table.load(ranges_path)
+        ip_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        oui = OuiTable()
+        oui.load(manuf_path)
+        oui_seconds = time.perf_counter() - started
+
+    def random_event():
+        mac = rng.getrandbits(48)
+        return {"srcip": str(ipaddress.IPv4Address(rng.randrange(1 << 24, 224 << 24))),
+                "src_mac": ":".join(f"{mac >> shift & 0xFF:02x}" for shift in range(40, -8, -8))}
+
+    distinct = [random_event() for _ in range(args.lookups)]
+    hot = distinct[:2000]
+    repeated = [rng.choice(hot) for _ in range(args.lookups)]
+
+    uncached = Enricher(oui, [ip_table], cache_size=0)
+    uncached_us = measure(uncached.template_fields, distinct)
+    cached = Enricher(oui, [ip_table], cache_size=65536)
+    for event in hot:
+        cached.template_fields(event)
+    cached_us = measure(cached.template_fields, repeated)
+    matched = sum(1 for event in distinct[:10000] if "src_asn" in cached.template_fields(event)) / 100
+
+    print(f"IP ranges: {len(ip_table):,} loaded in {ip_seconds:.2f}s; OUI prefixes: {oui.entries:,} "
+          f"loaded in {oui_seconds:.2f}s")
+    print(f"sources inside a range:              {matched:.0f}%")
+    print(f"enrich, repeated sources (cached):   {cached_us:.2f} us")
+    print(f"enrich, distinct sources:            {uncached_us:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
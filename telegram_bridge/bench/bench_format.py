@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-event formatting cost, hand-written formatters vs compiled templates.
+
+The "before" functions are copies of the formatters as they were before the
+template engine (extract_field re-splitting dotted paths on every call).
+Usage:
+
+    python bench/bench_format.py [--events 50000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from templates import get_template  # noqa: E402
+
+EVENT = {
+    "@timestamp": "2025-09-21T10:00:00.123Z",
+    "host": {"ip": "192.168.88.1"},
+    "topic": "firewall_drop",
+    "severity": "info,info",
+    "action": "Drop",
+    "priority": "high",
+    "alert_type": "firewall_drop",
+    "proto": "TCP",
+    "srcip": "203.0.113.5",
+    "srcport": "51514",
+    "dstip": "192.168.88.1",
+    "dstport": "22",
+    "src_mac": "00:11:22:33:44:55",
+    "in_interface": "ether1",
+    "message": "input: in:ether1 out:(unknown 0), src-mac 00:11:22:33:44:55, proto TCP (SYN), "
+               "203.0.113.5:51514->192.168.88.1:22, len 60 [input: DROP WAN]",
+}
+NOTIFY_EVENT = {key: value for key, value in EVENT.items() if key != "@timestamp"}
+NOTIFY_EVENT.update(host="192.168.88.1", timestamp=EVENT["@timestamp"])
+
+
+def legacy_extract_field(event, field_paths):
+    for path in field_paths:
+        value = event.get(path)
+        if value:
+            return str(value)
+        if '.' in path:
+            keys = path.split('.')
+            temp_value = event
+            try:
+                for key in keys:
+                    temp_value = temp_value[key]
+                if temp_value:
+                    return str(temp_value)
+            except (KeyError, TypeError):
+                continue
+    return "—"
+
+
+def legacy_format_alert_message(event):
+    timestamp = legacy_extract_field(event, ["timestamp", "@timestamp", "time"])
+    if timestamp and timestamp != "—":
+        try:
+            if 'T' in timestamp:
+                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                timestamp = dt.strftime('%Y-%m-%d %H:%M:%S')
+        except Exception:
+            pass
+    host_ip = legacy_extract_field(event, ["host.ip", "host", "src_host", "device_ip"])
+    alert_type = legacy_extract_field(event, ["alert_type", "type", "topic"])
+    severity = legacy_extract_field(event, ["severity", "level"])
+    parts = [part.strip() for part in severity.split(',')]
+    severity = list(dict.fromkeys(parts))[0].upper()
+    priority = legacy_extract_field(event, ["priority", "prio"]).upper()
+    action = legacy_extract_field(event, ["action", "act"])
+    protocol = legacy_extract_field(event, ["protocol", "proto"])
+    src_ip = legacy_extract_field(event, ["source.ip", "srcip", "src_ip"])
+    src_port = legacy_extract_field(event, ["source.port", "srcport", "src_port"])
+    dst_ip = legacy_extract_field(event, ["destination.ip", "dstip", "dst_ip"])
+    dst_port = legacy_extract_field(event, ["destination.port", "dstport", "dst_port"])
+    mac = legacy_extract_field(event, ["src-mac", "src_mac", "mac", "source_mac"])
+    interface = legacy_extract_field(event, ["interface", "in_interface", "iface"])
+    details = legacy_extract_field(event, ["message", "details", "description"])
+    return f"""🚨 MIKROTIK ALERT
+📅 {timestamp}
+🖥️ Host: {host_ip}
+⚠️ Tipo: {alert_type} | Sev: {severity} | Prio: {priority}
+❌ Ação: {action} | 🌐 {protocol}
+📤 {src_ip}:{src_port} → 📥 {dst_ip}:{dst_port}
+🔗 MAC: {mac} | 🔌 Iface: {interface}
+💬 {details}"""
+
+
+def legacy_format_drop_forward(log_data):
+    timestamp = log_data.get("timestamp", log_data.get("@timestamp", ""))
+    protocol = log_data.get("protocol", log_data.get("proto", ""))
+    src_ip = log_data.get("source.ip", log_data.get("srcip", ""))
+    src_port = log_data.get("source.port", log_data.get("srcport", ""))
+    dst_ip = log_data.get("destination.ip", log_data.get("dstip", ""))
+    dst_port = log_data.get("destination.port", log_data.get("dstport", ""))
+    mac = log_data.get("src-mac", log_data.get("src_mac", ""))
+    interface = log_data.get("interface", log_data.get("in_interface", ""))
+    details = log_data.get("message", "")
+    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    message_parts = ["🔥 **MIKROTIK ALERT**", f"📅 {dt.strftime('%d/%m/%Y %H:%M:%S')}", "", "🛡️ **FIREWALL DROP**"]
+    if protocol and interface:
+        message_parts.append(f"📍 {protocol} • {interface}")
+    elif protocol:
+        message_parts.append(f"📍 {protocol}")
+    if src_ip and dst_ip:
+        src_info = f"{src_ip}:{src_port}" if src_port else src_ip
+        dst_info = f"{dst_ip}:{dst_port}" if dst_port else dst_ip
+        message_parts.append(f"🔗 {src_info} → {dst_info}")
+    if mac:
+        message_parts.append(f"🏷️ {mac}")
+    message_parts.extend(["─" * 25, f"💬 {details}"])
+    return "\n".join(message_parts)
+
+
+def legacy_format_telegram_message(event):
+    log_data = SimpleNamespace(**event)
+    dt = datetime.fromisoformat(log_data.timestamp.replace('Z', '+00:00'))
+    formatted_time = dt.strftime("%d/%m/%Y %H:%M:%S")
+    severity = log_data.severity
+    if ',' in severity:
+        severity = [s.strip() for s in severity.split(',')][0]
+    if log_data.priority == "high" or log_data.alert_type == "firewall_drop":
+        header_emoji, priority_emoji = "🔥", "🔴"
+    elif log_data.priority == "critical":
+        header_emoji, priority_emoji = "🚨", "🔴"
+    else:
+        header_emoji, priority_emoji = "⚠️", "🟡"
+    message_parts = [f"{header_emoji} **FIREWALL BLOCKED**", f"🕐 {formatted_time}", ""]
+    if log_data.action == "Drop":
+        rule_name = "Default Deny"
+        if "[" in log_data.message and "]" in log_data.message:
+            rule_part = log_data.message.split("[")[1].split("]")[0]
+            if ":" in rule_part:
+                rule_name = rule_part.split(":", 1)[1].strip()
+        if log_data.srcip and log_data.dstip:
+            message_parts.extend([
+                f"🚫 **Regra:** {rule_name}",
+                f"🌐 **Protocolo:** {log_data.proto or 'UDP'}",
+                f"🔌 **Interface:** {log_data.in_interface or 'Unknown'}",
+                "",
+                f"📤 **Origem:** {log_data.srcip}:{log_data.srcport or '0'}",
+                f"📥 **Destino:** {log_data.dstip}:{log_data.dstport or '0'}"
+            ])
+            if log_data.src_mac and log_data.src_mac != "unknown":
+                message_parts.append(f"🏷️ **MAC:** {log_data.src_mac}")
+            if log_data.dstip == "255.255.255.255":
+                message_parts.append("📢 **Tipo:** Broadcast")
+            elif log_data.dstip.startswith("224."):
+                message_parts.append("📡 **Tipo:** Multicast")
+    else:
+        message_parts.extend([f"📋 **{log_data.topic.upper()}**", f"⚠️ {severity.title()}"])
+        if log_data.priority:
+            message_parts.append(f"{priority_emoji} {log_data.priority.upper()}")
+    message_parts.extend([
+        "",
+        f"🔍 **Log:** {log_data.message[:80]}..." if len(log_data.message) > 80 else f"🔍 **Log:** {log_data.message}"
+    ])
+    return "\n".join(message_parts)
+
+
+def measure(func, event, events):
+    func(event)  # warm-up (and template compilation)
+    started = time.perf_counter()
+    for _ in range(events):
+        func(event)
+    return (time.perf_counter() - started) / events * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50_000)
+    args = parser.parse_args()
+
+    cases = [
+        ("alert (alerts.py)", legacy_format_alert_message, get_template("alert").render, EVENT),
+        ("drop_forward (/drop-forward)", legacy_format_drop_forward, get_template("drop_forward").render, EVENT),
+        ("notify (/notify)", legacy_format_telegram_message, get_template("notify").render, NOTIFY_EVENT),
+    ]
+    print(f"{'template':<30} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for name, before, after, event in cases:
+        after_us = measure(after, event, args.events)
+        before_us = measure(before, event, args.events)
+        print(f"{name:<30} {before_us:>10.2f} {after_us:>10.2f} {before_us / after_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
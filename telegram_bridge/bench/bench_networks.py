@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: longest-prefix lookups in the network classifier.
+
+Loads --prefixes random IPv4/IPv6 prefixes (lengths weighted towards /24
+and /32, like real block lists) and measures lookups of addresses that
+repeat the way drop sources do (cached), of all-distinct addresses
+(uncached), and a linear ipaddress scan over 1,000 prefixes for reference.
+Usage:
+
+    python bench/bench_networks.py [--prefixes 100000] [--lookups 200000]
+"""
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from networks import NetworkClassifier  # noqa: E402
+
+V4_LENGTHS = (16, 16, 20, 22, 24, 24, 24, 28, 32, 32, 32, 32)
+V6_LENGTHS = (32, 48, 56, 64, 64, 128)
+
+
+def random_prefixes(rng, count):
+    prefixes = {}
+    i = 0
+    while len(prefixes) < count:
+        i += 1
+        if i % 10 == 9:
+            length = rng.choice(V6_LENGTHS)
+            address = ipaddress.IPv6Address(rng.getrandbits(128))
+        else:
+            length = rng.choice(V4_LENGTHS)
+            address = ipaddress.IPv4Address(rng.getrandbits(32))
+        network = ipaddress.ip_network(f"{address}/{length}", strict=False)
+        prefixes[str(network)] = (rng.choice(("ignore", "internal", "guest", "scanner")),)
+    return list(prefixes.items())
+
+
+def measure(func, addresses):
+    started = time.perf_counter()
+    for address in addresses:
+        func(address)
+    return (time.perf_counter() - started) / len(addresses) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefixes", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    prefixes = random_prefixes(rng, args.prefixes)
+
+    started = time.perf_counter()
+    classifier = NetworkClassifier(cache_size=65536)
+    for prefix, tags in prefixes:
+        classifier.add(prefix, tags)
+    load_seconds = time.perf_counter() - started
+
+    # Half of the addresses fall inside a loaded prefix
+    def address_in(prefix):
+        network = ipaddress.ip_network(prefix)
+        return str(network.network_address + rng.randrange(network.num_addresses))
+
+    distinct = [address_in(rng.choice(prefixes)[0]) if rng.random() < 0.5
+                else str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(args.lookups)]
+    hot = distinct[:2000]
+    repeated = [rng.choice(hot) for _ in range(args.lookups)]
+    matched = sum(1 for address in distinct[:10000] if classifier.lookup(address)) / 100
+
+    uncached_us = measure(classifier._lookup, distinct)
+    for address in hot:
+        classifier.lookup(address)
+    cached_us = measure(classifier.lookup, repeated)
+
+    small = [(ipaddress.ip_network(prefix), tags) for prefix, tags in prefixes[:1000]]
+
+    def linear(address):
+        ip = ipaddress.ip_address(address)
+        best = None
+        for network, tags in small:
+            if ip.version == network.version and ip in network:
+                if best is None or network.prefixlen > best[0].prefixlen:
+                    best = (network, tags)
+        return best
+
+    linear_us = measure(linear, distinct[:2000])
+
+    stats = classifier.stats()
+    print(f"prefixes: {stats['prefixes']:,} ({stats['prefix_lengths']['ipv4']} IPv4 and "
+          f"{stats['prefix_lengths']['ipv6']} IPv6 lengths), loaded in {load_seconds:.2f}s")
+    print(f"addresses matching a prefix:        {matched:.0f}%")
+    print(f"lookup, repeated addresses (cached): {cached_us:.2f} us")
+    print(f"lookup, distinct addresses:          {uncached_us:.2f} us")
+    print(f"linear ipaddress scan, 1k prefixes:  {linear_us:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: live time series (ring buffers) update and query cost.
+
+Feeds --events events spread over --hosts hosts, 8 interfaces and 4 alert
+types at --rate events per simulated second, then times the queries a live
+Grafana panel makes: the last 5 minutes per second, the last hour per
+minute and the last 24 hours in 15-minute steps, for one series and for
+every host (``host:*``). Usage:
+
+    python bench/bench_series.py [--events 1000000] [--hosts 200] [--rate 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeseries import TimeSeriesStore  # noqa: E402
+
+INTERFACES = ("ether1", "ether2", "pppoe-out1", "bridge", "wlan1", "vlan10", "vlan20", "sfp1")
+ALERT_TYPES = ("firewall_drop", "login_failure", "system", "scan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=2000.0, help="events per simulated second")
+    parser.add_argument("--max-keys", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    hosts = [f"10.{i >> 8}.{i & 255}.1" for i in range(args.hosts)]
+    events = [{"host": rng.choice(hosts), "in_interface": rng.choice(INTERFACES),
+               "alert_type": rng.choice(ALERT_TYPES)} for _ in range(min(args.events, 100_000))]
+
+    end = time.time()
+    start = end - args.events / args.rate
+    store = TimeSeriesStore(max_keys=args.max_keys)
+    started = time.perf_counter()
+    for i in range(args.events):
+        store.add(events[i % len(events)], start + i / args.rate)
+    add_us = (time.perf_counter() - started) / args.events * 1e6
+
+    def timed(key, seconds, step, repeat=200):
+        begin = time.perf_counter()
+        for _ in range(repeat):
+            if key.endswith("*"):
+                points = [store.query(name, end - seconds, end, step) for name in store.keys(key)]
+            else:
+                points = store.query(key, end - seconds, end, step)
+        return (time.perf_counter() - begin) / repeat * 1e3, points
+
+    stats = store.stats()
+    print(f"{args.events:,} events, {stats['series']} series, {stats['buffer_bytes'] / 2 ** 20:.1f} MiB of buffers")
+    print(f"update:                          {add_us:8.2f} us/event")
+    for label, key, seconds, step in (
+        ("5m per second, one host", hosts[0], 300, 1),
+        ("1h per minute, one host", hosts[0], 3600, 60),
+        ("24h per 15 minutes, total", "total", 86400, 900),
+        ("5m per second, host:*", "host:*", 300, 1),
+    ):
+        key = key if key == "total" or key.endswith("*") else f"host:{key}"
+        ms, points = timed(key, seconds, step, repeat=20 if key.endswith("*") else 200)
+        count = sum(len(item) for item in points) if key.endswith("*") else len(points)
+        print(f"query {label + ':':<26} {ms:8.3f} ms ({count:,} points)")
+
+
+if __name__ == "__main__":
+    main()
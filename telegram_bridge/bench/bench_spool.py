@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: outbound spool append/drain throughput and restart cost.
+
+Appends formatted-size alerts to a fresh spool, reopens it with the whole
+backlog on disk (what a restart after a Telegram outage looks like), then
+drains it with peek/ack. Reports per-message cost of each phase, the
+segments created and the process RSS, which should not grow with the
+backlog. Usage:
+
+    python bench/bench_spool.py [--messages 200000] [--size 600] [--fsync]
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spool import Spool  # noqa: E402
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--size", type=int, default=600, help="bytes per message (a typical alert)")
+    parser.add_argument("--fsync", action="store_true")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_spool_")
+    payload = b"x" * args.size
+    try:
+        spool = Spool(directory, max_bytes=1 << 40, fsync=args.fsync)
+        started = time.perf_counter()
+        for _ in range(args.messages):
+            spool.append(payload)
+        append_s = time.perf_counter() - started
+        segments = spool.stats()["segments"]
+        spool.close()
+
+        started = time.perf_counter()
+        spool = Spool(directory, max_bytes=1 << 40)
+        open_s = time.perf_counter() - started
+        assert len(spool) == args.messages
+
+        started = time.perf_counter()
+        while spool.peek() is not None:
+            spool.ack()
+        drain_s = time.perf_counter() - started
+        stats = spool.stats()
+        spool.close()
+    finally:
+        shutil.rmtree(directory)
+
+    mb = args.messages * args.size / 1e6
+    print(f"{args.messages:,} messages x {args.size} bytes ({mb:.0f} MB, {segments} segments)")
+    print(f"  append: {append_s / args.messages * 1e6:6.2f} us/message{' (fsync)' if args.fsync else ''}")
+    print(f"  reopen: {open_s * 1e3:6.1f} ms with the full backlog")
+    print(f"  drain:  {drain_s / args.messages * 1e6:6.2f} us/message, {stats['acked']:,} acked")
+    print(f"  max RSS: {rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
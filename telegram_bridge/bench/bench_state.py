@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: state backend contention with 1/4/8 worker processes.
+
+Every process runs the per-event state path of /notify against the same
+backend (acquire_send, check_deduplication, release_send for duplicates)
+at the bridge's default RATE_LIMIT and reports aggregate throughput and
+per-operation latency. The memory backend is measured once per process as
+the unshared baseline. Usage:
+
+    python bench/bench_state.py [--events 20000] [--workers 1 4 8] [--path /tmp/bench_state.db]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state import create_state_backend  # noqa: E402
+
+RATE_LIMIT = 20  # the bridge default
+DUPLICATE_EVERY = 4  # one in four events repeats an earlier hash
+
+
+async def run_events(state, worker, events):
+    latencies = []
+    for i in range(events):
+        key = f"{worker}:{i - 1 if i % DUPLICATE_EVERY == 0 else i}"
+        t0 = time.perf_counter()
+        slot = await state.acquire_send()
+        if not await state.check_deduplication(key) and slot is not None:
+            state.release_send(slot)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def run_worker(backend, path, worker, events, start_barrier, results):
+    state = create_state_backend(backend, RATE_LIMIT, 60, 100000, path=path)
+    start_barrier.wait()
+    started = time.perf_counter()
+    latencies = asyncio.run(run_events(state, worker, events))
+    results.put((time.perf_counter() - started, latencies))
+    state.close()
+
+
+def run(backend, path, workers, events):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    create_state_backend(backend, RATE_LIMIT, 60, 100000, path=path).close()
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=run_worker, args=(backend, path, w, events, barrier, results))
+                 for w in range(workers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    elapsed = max(duration for duration, _ in collected)
+    latencies = sorted(latency for _, worker_latencies in collected for latency in worker_latencies)
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    return workers * events / elapsed, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20_000, help="events per worker")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--path", default=os.path.join(tempfile.gettempdir(), "bench_state.db"))
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'workers':>7} {'events/s':>12} {'p50 us':>8} {'p99 us':>8}")
+    for backend in ("memory", "sqlite"):
+        for workers in args.workers:
+            throughput, p50, p99 = run(backend, args.path, workers, args.events)
+            print(f"{backend:<8} {workers:>7} {throughput:>12,.0f} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Elasticsearch's _bulk API.
+
+Accepts gzip'd or plain NDJSON bodies, keeps per-index document counts
+(and the last --keep documents) in memory and replies after a configurable
+latency. Injects whole-request 429s, per-item 429s (es_rejected_execution)
+and 5xx responses at the given ratios. GET /stats returns the counters and
+GET /documents the kept ones. Point the bridge at it with
+ELASTICSEARCH_URL=http://127.0.0.1:<port>. Usage:
+
+    python bench/fake_elasticsearch.py --port 19200 --latency-ms 20 \\
+        --ratio-429 0.2 --ratio-item-429 0.05 --ratio-5xx 0.01
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import random
+import sys
+from collections import Counter, deque
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec  # noqa: E402
+
+REJECTED = {"type": "es_rejected_execution_exception", "reason": "rejected execution of coordinating operation"}
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 20.0
+    ratio_429: float = 0.0
+    ratio_item_429: float = 0.0
+    ratio_5xx: float = 0.0
+    keep: int = 1000
+    seed: int = 42
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    stub = FastAPI(title="Fake Elasticsearch")
+    rng = random.Random(config.seed)
+    counters: Counter = Counter()
+    indices: Counter = Counter()
+    kept: deque = deque(maxlen=config.keep)
+
+    @stub.post("/_bulk")
+    async def bulk(request: Request):
+        body = await request.body()
+        counters["requests"] += 1
+        counters["bytes"] += len(body)
+        if request.headers.get("content-encoding") == "gzip":
+            counters["gzip_requests"] += 1
+            body = gzip.decompress(body)
+        if config.latency_ms > 0:
+            await asyncio.sleep(config.latency_ms / 1000)
+
+        roll = rng.random()
+        if roll < config.ratio_429:
+            counters["429"] += 1
+            return JSONResponse(status_code=429, content={"error": REJECTED, "status": 429})
+        if roll < config.ratio_429 + config.ratio_5xx:
+            counters["5xx"] += 1
+            return JSONResponse(status_code=503, content={"error": {"type": "unavailable"}, "status": 503})
+
+        lines = [line for line in body.split(b"\n") if line.strip()]
+        items = []
+        errors = False
+        for action, source in zip(lines[::2], lines[1::2]):
+            index = codec.loads(action)["index"]["_index"]
+            if rng.random() < config.ratio_item_429:
+                counters["item_429"] += 1
+                errors = True
+                items.append({"index": {"status": 429, "error": REJECTED}})
+                continue
+            document = codec.loads(source)
+            indices[index] += 1
+            counters["documents"] += 1
+            kept.append({"_index": index, "_source": document})
+            items.append({"index": {"status": 201}})
+        # Shaped like filter_path=errors,items.*.status,items.*.error
+        return {"errors": errors, "items": items}
+
+    @stub.get("/stats")
+    async def stats():
+        return {**counters, "indices": dict(indices)}
+
+    @stub.get("/documents")
+    async def documents(n: int = 10):
+        return list(kept)[-n:]
+
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=19200)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--ratio-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--ratio-item-429", type=float, default=0.0, help="fraction of documents rejected with 429")
+    parser.add_argument("--ratio-5xx", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--keep", type=int, default=1000, help="last documents kept for GET /documents")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = StubConfig(args.latency_ms, args.ratio_429, args.ratio_item_429, args.ratio_5xx, args.keep, args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
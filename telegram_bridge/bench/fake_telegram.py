@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for api.telegram.org/bot<token>/sendMessage.
+
+Replies after a configurable latency and injects 429 (with
+parameters.retry_after, like the real Bot API) and 5xx responses at the
+given ratios. GET /stats returns the counters. Point the bridge at it with
+TELEGRAM_API_BASE_URL=http://127.0.0.1:<port>. Usage:
+
+    python bench/fake_telegram.py --port 18999 --latency-ms 50 --jitter-ms 20 \\
+        --ratio-429 0.05 --retry-after 3 --ratio-5xx 0.01
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    ratio_429: float = 0.0
+    retry_after: int = 3
+    ratio_5xx: float = 0.0
+    seed: int = 42
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    stub = FastAPI(title="Fake Telegram Bot API")
+    rng = random.Random(config.seed)
+    counters: Counter = Counter()
+
+    @stub.post("/bot{token}/sendMessage")
+    async def send_message(token: str, request: Request):
+        await request.body()
+        counters["requests"] += 1
+        delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        roll = rng.random()
+        if roll < config.ratio_429:
+            counters["429"] += 1
+            return JSONResponse(status_code=429, content={
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {config.retry_after}",
+                "parameters": {"retry_after": config.retry_after}
+            })
+        if roll < config.ratio_429 + config.ratio_5xx:
+            counters["5xx"] += 1
+            return JSONResponse(status_code=502, content={
+                "ok": False, "error_code": 502, "description": "Bad Gateway"
+            })
+
+        counters["200"] += 1
+        return {"ok": True, "result": {"message_id": counters["200"], "chat": {"id": 0}}}
+
+    @stub.get("/stats")
+    async def stats():
+        return dict(counters)
+
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18999)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--ratio-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=3, help="retry_after sent with each 429 (seconds)")
+    parser.add_argument("--ratio-5xx", type=float, default=0.0, help="fraction of requests answered with 502")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.ratio_429, args.retry_after,
+                        args.ratio_5xx, args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
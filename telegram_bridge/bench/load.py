@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Load test: replay synthetic RouterOS events at a target rate and report.
+
+Targets are /notify and /drop-forward on a running bridge (HTTP), and
+alerts.handle_log called in-process from a thread pool. Events are sent
+open-loop on a fixed schedule, and latency is measured from the scheduled
+time, so a stalled bridge shows up in the percentiles instead of slowing
+the generator down. The report has throughput, p50/p95/p99 latency, RSS
+growth of the process under test and the count of each outcome.
+
+With --spawn the fake Telegram API and the bridge are started locally:
+
+    python bench/load.py --spawn --target notify drop-forward alerts --rate 200 --duration 30
+    python bench/load.py --bridge-url http://127.0.0.1:8081 --bridge-pid 1234 --target notify
+
+--max-p99-ms / --max-rss-growth-mb make the exit status fail on a regression.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BRIDGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BRIDGE_DIR)
+
+import codec  # noqa: E402
+from traffic import TrafficGenerator  # noqa: E402
+
+HTTP_TARGETS = {"notify": "/notify", "drop-forward": "/drop-forward"}
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident set size of ``pid`` in MiB (Linux /proc)"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Run:
+    """Latencies, outcomes and RSS samples of one target"""
+
+    def __init__(self, target: str, pid: Optional[int]):
+        self.target = target
+        self.pid = pid
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.rss_start = rss_mb(pid)
+        self.rss_peak = self.rss_start
+        self.started = 0.0
+        self.finished = 0.0
+
+    def record(self, scheduled: float, outcome: str):
+        now = time.perf_counter()
+        self.latencies.append(now - scheduled)
+        self.outcomes[outcome] += 1
+        self.finished = now
+
+    def sample_rss(self):
+        rss = rss_mb(self.pid)
+        if rss is not None and (self.rss_peak is None or rss > self.rss_peak):
+            self.rss_peak = rss
+
+    def report(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        elapsed = self.finished - self.started
+        rss_end = rss_mb(self.pid)
+        growth = rss_end - self.rss_start if rss_end is not None and self.rss_start is not None else None
+        return {
+            "target": self.target,
+            "events": len(latencies),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "rss_start_mb": round(self.rss_start, 1) if self.rss_start is not None else None,
+            "rss_peak_mb": round(self.rss_peak, 1) if self.rss_peak is not None else None,
+            "rss_growth_mb": round(growth, 1) if growth is not None else None,
+            "outcomes": dict(self.outcomes.most_common())
+        }
+
+
+async def drive(run: Run, payloads: List[Any], rate: float, max_in_flight: int, send):
+    """Call ``send(payload)`` on an open-loop schedule of ``rate`` events/s"""
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def one(payload, scheduled):
+        async with in_flight:
+            try:
+                outcome = await send(payload)
+            except Exception as e:
+                outcome = f"error:{type(e).__name__}"
+        run.record(scheduled, outcome)
+
+    tasks = []
+    run.started = start = time.perf_counter()
+    next_sample = start
+    for i, payload in enumerate(payloads):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if scheduled >= next_sample:
+            run.sample_rss()
+            next_sample = scheduled + 0.5
+        tasks.append(asyncio.create_task(one(payload, scheduled)))
+    await asyncio.gather(*tasks)
+    run.sample_rss()
+
+
+async def run_http(target: str, bridge_url: str, pid: Optional[int], payloads: List[bytes],
+                   rate: float, max_in_flight: int) -> Run:
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=bridge_url, limits=limits, timeout=30.0) as client:
+        path = HTTP_TARGETS[target]
+
+        async def send(body: bytes) -> str:
+            response = await client.post(path, content=body, headers={"content-type": "application/json"})
+            try:
+                status = response.json().get("status")
+            except ValueError:
+                status = None
+            return f"{response.status_code}:{status}" if status else str(response.status_code)
+
+        run = Run(target, pid)
+        await drive(run, payloads, rate, max_in_flight, send)
+        return run
+
+
+async def run_alerts(payloads: List[Dict[str, Any]], rate: float, max_in_flight: int) -> Run:
+    # Same pool size as the in-flight limit; failures are counted in the report
+    os.environ.setdefault("TELEGRAM_MAX_CONNECTIONS", str(max_in_flight))
+    import alerts
+    alerts.logger.setLevel(logging.CRITICAL)
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    alerts.get_session()
+
+    async def send(event: Dict[str, Any]) -> str:
+        if not alerts.should_alert(event):
+            return "ignored"
+        sent = await loop.run_in_executor(executor, alerts.send_alert, event)
+        return "sent" if sent else "failed"
+
+    run = Run("alerts", os.getpid())
+    try:
+        await drive(run, payloads, rate, max_in_flight, send)
+    finally:
+        executor.shutdown()
+    return run
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def spawn(args) -> List[subprocess.Popen]:
+    """Start the fake Telegram API and the bridge, pointing at each other"""
+    log = open(args.log, "ab")
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stub = subprocess.Popen([
+        sys.executable, os.path.join(BRIDGE_DIR, "bench", "fake_telegram.py"),
+        "--port", str(args.stub_port), "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms), "--ratio-429", str(args.ratio_429),
+        "--retry-after", str(args.retry_after), "--ratio-5xx", str(args.ratio_5xx)
+    ], stdout=log, stderr=subprocess.STDOUT)
+    processes = [stub]
+    wait_ready(f"{stub_url}/stats", stub)
+
+    os.environ.update(TELEGRAM_BOT_TOKEN="bench", TELEGRAM_CHAT_ID="0", TELEGRAM_API_BASE_URL=stub_url)
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    bridge = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+        "--port", str(args.bridge_port), "--log-level", "warning", "--no-access-log"
+    ], cwd=BRIDGE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    processes.append(bridge)
+    args.bridge_url = f"http://127.0.0.1:{args.bridge_port}"
+    args.bridge_pid = bridge.pid
+    wait_ready(f"{args.bridge_url}/health", bridge)
+    return processes
+
+
+def print_report(reports: List[Dict[str, Any]]):
+    print(f"{'target':<14} {'events':>7} {'ev/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'rss MB':>8} {'growth':>7}")
+    for r in reports:
+        rss = f"{r['rss_peak_mb']:.1f}" if r["rss_peak_mb"] is not None else "-"
+        growth = f"{r['rss_growth_mb']:+.1f}" if r["rss_growth_mb"] is not None else "-"
+        print(f"{r['target']:<14} {r['events']:>7} {r['throughput']:>8.1f} {r['p50_ms']:>8.2f} "
+              f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f} {rss:>8} {growth:>7}")
+    for r in reports:
+        outcomes = ", ".join(f"{name}={count}" for name, count in r["outcomes"].items())
+        print(f"  {r['target']}: {outcomes}")
+
+
+async def main_async(args) -> List[Dict[str, Any]]:
+    generator = TrafficGenerator(args.seed, args.drop_ratio, args.dns_ratio)
+    count = int(args.rate * args.duration)
+    events = [payload for _, _, payload in generator.events(count)]
+    bodies = [codec.dumps(event) for event in events]
+
+    reports = []
+    for target in args.target:
+        if target == "alerts":
+            run = await run_alerts(events, args.rate, args.max_in_flight)
+        else:
+            run = await run_http(target, args.bridge_url, args.bridge_pid, bodies,
+                                 args.rate, args.max_in_flight)
+        reports.append(run.report())
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", nargs="+", default=["notify"], choices=[*HTTP_TARGETS, "alerts"])
+    parser.add_argument("--rate", type=float, default=100.0, help="events per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of traffic per target")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--drop-ratio", type=float, default=0.7)
+    parser.add_argument("--dns-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bridge-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--bridge-pid", type=int, help="bridge process id, for RSS (set by --spawn)")
+    parser.add_argument("--json", metavar="FILE", help="also write the report as JSON")
+    parser.add_argument("--max-p99-ms", type=float, help="fail if any target's p99 exceeds this")
+    parser.add_argument("--max-rss-growth-mb", type=float, help="fail if RSS grows more than this")
+    spawn_group = parser.add_argument_group("--spawn (local fake Telegram API + bridge)")
+    spawn_group.add_argument("--spawn", action="store_true")
+    spawn_group.add_argument("--bridge-port", type=int, default=18080)
+    spawn_group.add_argument("--stub-port", type=int, default=18999)
+    spawn_group.add_argument("--log", default=os.path.join(tempfile.gettempdir(), "bench_load.log"),
+                             help="output of the spawned processes")
+    spawn_group.add_argument("--latency-ms", type=float, default=50.0)
+    spawn_group.add_argument("--jitter-ms", type=float, default=10.0)
+    spawn_group.add_argument("--ratio-429", type=float, default=0.0)
+    spawn_group.add_argument("--retry-after", type=int, default=3)
+    spawn_group.add_argument("--ratio-5xx", type=float, default=0.0)
+    args = parser.parse_args()
+
+    processes = spawn(args) if args.spawn else []
+    try:
+        reports = asyncio.run(main_async(args))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+    print_report(reports)
+    if args.spawn:
+        print(f"bridge/stub log: {args.log}")
+    if args.json:
+        with open(args.json, "wb") as f:
+            f.write(codec.dumps({"args": vars(args), "reports": reports}))
+
+    failed = False
+    for r in reports:
+        if args.max_p99_ms is not None and r["p99_ms"] > args.max_p99_ms:
+            print(f"FAIL {r['target']}: p99 {r['p99_ms']} ms > {args.max_p99_ms} ms")
+            failed = True
+        if (args.max_rss_growth_mb is not None and r["rss_growth_mb"] is not None
+                and r["rss_growth_mb"] > args.max_rss_growth_mb):
+            print(f"FAIL {r['target']}: RSS grew {r['rss_growth_mb']} MB > {args.max_rss_growth_mb} MB")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Synthetic RouterOS traffic: firewall/DNS syslog lines and the matching /notify payloads.
+
+Drop and DNS lines are turned into payloads with routeros.parse_line, so they
+carry exactly the fields Logstash (or the syslog listener) would send. Other
+firewall lines (accept/forward) become payloads without the Drop tagging, to
+exercise the non-Drop paths. Source addresses follow a skewed distribution so
+a few sources dominate, like a real scan. Usage:
+
+    python bench/traffic.py --events 10000 --drop-ratio 0.7 > payloads.ndjson
+    python bench/traffic.py --events 10000 --lines > syslog.txt
+"""
+import argparse
+import os
+import random
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec  # noqa: E402
+from routeros import parse_line, utc_timestamp  # noqa: E402
+
+ROUTERS = ("192.168.88.1", "192.168.88.2", "10.10.0.1")
+WAN_INTERFACES = ("ether1", "pppoe-out1", "lte1")
+LAN_INTERFACES = ("bridge", "ether2", "wlan1")
+# RouterOS log-prefix; Logstash only tags lines where "drop" is a whole word
+DROP_PREFIXES = ("DROP-WAN", "drop-invalid", "DROP-BRUTEFORCE", "")
+ACCEPT_PREFIXES = ("accept_lan", "accept_established", "fwd_lan")
+SERVICE_PORTS = (22, 23, 53, 80, 443, 445, 3389, 8291, 8728, 5060)
+DNS_NAMES = ("example.com", "api.telegram.org", "updates.mikrotik.com", "time.cloudflare.com")
+
+
+def random_mac(rng: random.Random) -> str:
+    return ":".join(f"{rng.randrange(256):02X}" for _ in range(6))
+
+
+def random_public_ip(rng: random.Random) -> str:
+    return f"{rng.choice((45, 89, 103, 185, 193, 203))}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+
+
+class TrafficGenerator:
+    """Deterministic (seeded) generator of RouterOS syslog lines and payloads"""
+
+    def __init__(self, seed: int = 42, drop_ratio: float = 0.7, dns_ratio: float = 0.1,
+                 sources: int = 2000):
+        self.rng = random.Random(seed)
+        self.drop_ratio = drop_ratio
+        self.dns_ratio = dns_ratio
+        self.sources = [random_public_ip(self.rng) for _ in range(sources)]
+        self.macs = [random_mac(self.rng) for _ in range(64)]
+        # Zipf-like weights: the first sources send most of the traffic
+        self.weights = [1.0 / (rank + 1) for rank in range(sources)]
+
+    def _connection(self, proto: str, srcip: str, dstip: str) -> str:
+        rng = self.rng
+        srcport = rng.randrange(1024, 65535)
+        if proto == "ICMP":
+            return f"proto ICMP (type 8, code 0), {srcip}->{dstip}, len 84"
+        flags = " (SYN)" if proto == "TCP" else ""
+        dstport = rng.choice(SERVICE_PORTS) if rng.random() < 0.8 else rng.randrange(1, 65535)
+        return f"proto {proto}{flags}, {srcip}:{srcport}->{dstip}:{dstport}, len {rng.randrange(40, 1500)}"
+
+    def drop_line(self) -> str:
+        rng = self.rng
+        srcip = rng.choices(self.sources, self.weights)[0]
+        prefix = rng.choice(DROP_PREFIXES)
+        chain = rng.choice(("input", "forward"))
+        proto = rng.choices(("TCP", "UDP", "ICMP"), (70, 25, 5))[0]
+        return (f"firewall,info {prefix + ' ' if prefix else 'drop '}{chain}: "
+                f"in:{rng.choice(WAN_INTERFACES)} out:(unknown 0), src-mac {rng.choice(self.macs)}, "
+                f"{self._connection(proto, srcip, rng.choice(ROUTERS))}")
+
+    def accept_line(self) -> str:
+        rng = self.rng
+        srcip = f"192.168.88.{rng.randrange(10, 250)}"
+        proto = rng.choice(("TCP", "UDP"))
+        return (f"firewall,info {rng.choice(ACCEPT_PREFIXES)} forward: "
+                f"in:{rng.choice(LAN_INTERFACES)} out:{rng.choice(WAN_INTERFACES)}, "
+                f"src-mac {rng.choice(self.macs)}, {self._connection(proto, srcip, random_public_ip(rng))}")
+
+    def dns_line(self) -> str:
+        rng = self.rng
+        return (f"dns,packet --- got query from 192.168.88.{rng.randrange(10, 250)}:{rng.randrange(1024, 65535)}: "
+                f"question: {rng.choice(DNS_NAMES)}:A:IN")
+
+    def line(self) -> Tuple[str, str]:
+        """Return (kind, line) with kind in drop/accept/dns"""
+        roll = self.rng.random()
+        if roll < self.drop_ratio:
+            return "drop", self.drop_line()
+        if roll < self.drop_ratio + self.dns_ratio:
+            return "dns", self.dns_line()
+        return "accept", self.accept_line()
+
+    def payload(self, line: str, host: str) -> Dict[str, Any]:
+        """The /notify payload for a line (Logstash http output mapping)"""
+        event = parse_line(line, host)
+        if event is not None:
+            return event
+        # Untagged firewall line: forwarded as a generic, non-Drop event
+        return {"@timestamp": utc_timestamp(), "host": host, "topic": "firewall",
+                "severity": "info", "message": line.strip()}
+
+    def events(self, count: int) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """Yield (kind, syslog line, /notify payload)"""
+        for _ in range(count):
+            kind, line = self.line()
+            host = self.rng.choice(ROUTERS)
+            yield kind, line, self.payload(line, host)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--drop-ratio", type=float, default=0.7)
+    parser.add_argument("--dns-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--lines", action="store_true", help="print raw syslog lines instead of payloads")
+    args = parser.parse_args()
+
+    generator = TrafficGenerator(args.seed, args.drop_ratio, args.dns_ratio)
+    out = sys.stdout.buffer
+    for _, line, payload in generator.events(args.events):
+        out.write(line.encode() + b"\n" if args.lines else codec.dumps(payload) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,130 @@ import os
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
+# Telegram HTTP Client Configuration
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org")
+TELEGRAM_HTTP2 = os.getenv("TELEGRAM_HTTP2", "false").lower() == "true"
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", "5"))  # seconds
+TELEGRAM_READ_TIMEOUT = float(os.getenv("TELEGRAM_READ_TIMEOUT", "10"))  # seconds
+TELEGRAM_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_CONNECTIONS", "10"))
+TELEGRAM_MAX_KEEPALIVE = int(os.getenv("TELEGRAM_MAX_KEEPALIVE", "5"))
+TELEGRAM_KEEPALIVE_EXPIRY = float(os.getenv("TELEGRAM_KEEPALIVE_EXPIRY", "30"))  # seconds
+
+# Destinations Configuration (several chats/webhooks with routing rules, see destinations.example.json)
+DESTINATIONS_FILE = os.getenv("DESTINATIONS_FILE", "")  # empty: everything goes to TELEGRAM_CHAT_ID
+DESTINATION_RATE_LIMIT = float(os.getenv("DESTINATION_RATE_LIMIT", "20"))  # messages per minute per chat
+DESTINATION_BURST = float(os.getenv("DESTINATION_BURST", "5"))  # messages sent back to back before pacing
+DESTINATION_MAX_WAIT = float(os.getenv("DESTINATION_MAX_WAIT", "2"))  # seconds a direct send waits for its limit
+TELEGRAM_BOT_RATE = float(os.getenv("TELEGRAM_BOT_RATE", "30"))  # messages per second per bot, all chats
+
 # Rate Limiting Configuration
 RATE_LIMIT = int(os.getenv("RATE_LIMIT", "2"))   # messages per minute
 DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", "60"))  # seconds
 MIN_SEVERITY = os.getenv("MIN_SEVERITY", "info")
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "100000"))  # hard cap on remembered hashes
+NOTIFY_BATCH_CONCURRENCY = int(os.getenv("NOTIFY_BATCH_CONCURRENCY", "32"))  # /notify/batch items in flight
+
+# Deduplication Key Configuration (template = Drain-style message template + DEDUP_FIELDS, exact = whole message)
+DEDUP_KEY = os.getenv("DEDUP_KEY", "template")
+DEDUP_FIELDS = tuple(f.strip() for f in os.getenv("DEDUP_FIELDS", "host,topic,severity,srcip").split(",") if f.strip())
+DEDUP_MAX_TEMPLATES = int(os.getenv("DEDUP_MAX_TEMPLATES", "1000"))
+DEDUP_TEMPLATE_SIMILARITY = float(os.getenv("DEDUP_TEMPLATE_SIMILARITY", "0.5"))  # share of equal tokens to merge
+
+# State Backend Configuration (memory = per process, sqlite = shared by all workers)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_PATH = os.getenv("STATE_PATH", "/data/bridge_state.db")
+
+# Spool Configuration (accepted alerts are written to disk and sent by a background sender with retries)
+SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "false").lower() == "true"
+SPOOL_DIR = os.getenv("SPOOL_DIR", "/data/spool")
+SPOOL_SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(256 * 1024 * 1024)))  # new alerts get 503 beyond this
+SPOOL_FSYNC = os.getenv("SPOOL_FSYNC", "false").lower() == "true"  # fsync every append (survives power loss)
+SPOOL_RETRY_BASE = float(os.getenv("SPOOL_RETRY_BASE", "1"))  # seconds, doubled per failed attempt
+SPOOL_RETRY_MAX = float(os.getenv("SPOOL_RETRY_MAX", "300"))  # seconds
+
+# Send Queue Configuration (without the spool: endpoints answer 202 and a worker pool sends by priority)
+SEND_QUEUE_ENABLED = os.getenv("SEND_QUEUE_ENABLED", "true").lower() == "true"
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "1000"))  # messages waiting; lowest priority shed beyond this
+SEND_QUEUE_WORKERS = int(os.getenv("SEND_QUEUE_WORKERS", "4"))  # concurrent sends
+SEND_QUEUE_MAX_AGE = float(os.getenv("SEND_QUEUE_MAX_AGE", "300"))  # seconds, older messages are shed (0 = never)
+
+# Rollup Worker Configuration (rollup.py: per-minute drop counts in mikrotik-rollup-YYYY.MM for Grafana)
+ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL", "http://elasticsearch:9200")
+ROLLUP_SOURCE_INDEX = os.getenv("ROLLUP_SOURCE_INDEX", "mikrotik-firewall-*")
+ROLLUP_INDEX_PREFIX = os.getenv("ROLLUP_INDEX_PREFIX", "mikrotik-rollup")
+ROLLUP_CHECKPOINT = os.getenv("ROLLUP_CHECKPOINT", "/data/rollup_checkpoint.json")
+ROLLUP_INTERVAL = int(os.getenv("ROLLUP_INTERVAL", "60"))  # seconds between incremental runs
+ROLLUP_LAG = int(os.getenv("ROLLUP_LAG", "120"))  # seconds, minutes newer than this wait for late events
+ROLLUP_INITIAL_LOOKBACK = int(os.getenv("ROLLUP_INITIAL_LOOKBACK", "3600"))  # seconds, first run without checkpoint
+ROLLUP_CHUNK_MINUTES = int(os.getenv("ROLLUP_CHUNK_MINUTES", "60"))  # minutes counted in memory at a time
+ROLLUP_PAGE_SIZE = int(os.getenv("ROLLUP_PAGE_SIZE", "5000"))  # raw documents per search_after page
+ROLLUP_BULK_SIZE = int(os.getenv("ROLLUP_BULK_SIZE", "5000"))  # rollup documents per _bulk request
+
+# Direct Indexing Configuration (es_indexer.py: the bridge writes the Logstash documents to ELASTICSEARCH_URL)
+ES_INDEX_ENABLED = os.getenv("ES_INDEX_ENABLED", "false").lower() == "true"
+ES_INDEX_PREFIX = os.getenv("ES_INDEX_PREFIX", "mikrotik-firewall")  # daily <prefix>-YYYY.MM.dd, as Logstash
+# syslog = every line of the listener, ingest = POST /ingest, notify = /notify and /notify/batch, drop_forward
+ES_INDEX_SOURCES = {s.strip() for s in os.getenv("ES_INDEX_SOURCES", "syslog,ingest").split(",") if s.strip()}
+ES_INDEX_BATCH_SIZE = int(os.getenv("ES_INDEX_BATCH_SIZE", "1000"))  # documents per _bulk request
+ES_INDEX_BATCH_BYTES = int(os.getenv("ES_INDEX_BATCH_BYTES", str(5 * 1024 * 1024)))  # uncompressed NDJSON
+ES_INDEX_FLUSH_INTERVAL = float(os.getenv("ES_INDEX_FLUSH_INTERVAL", "1"))  # seconds a partial batch waits
+ES_INDEX_MAX_PENDING = int(os.getenv("ES_INDEX_MAX_PENDING", "50000"))  # documents held while ES throttles
+ES_INDEX_WORKERS = int(os.getenv("ES_INDEX_WORKERS", "2"))  # concurrent _bulk requests (pooled connections)
+ES_INDEX_RETRY_BASE = float(os.getenv("ES_INDEX_RETRY_BASE", "0.5"))  # seconds, doubled per 429/5xx
+ES_INDEX_RETRY_MAX = float(os.getenv("ES_INDEX_RETRY_MAX", "30"))  # seconds
+ES_INDEX_GZIP_LEVEL = int(os.getenv("ES_INDEX_GZIP_LEVEL", "1"))  # 0 sends the body uncompressed
+
+# Digest Configuration (aggregate alerts into one message per window)
+DIGEST_ENABLED = os.getenv("DIGEST_ENABLED", "false").lower() == "true"
+DIGEST_WINDOW = int(os.getenv("DIGEST_WINDOW", "60"))  # seconds
+DIGEST_MAX_GROUPS = int(os.getenv("DIGEST_MAX_GROUPS", "5000"))
+DIGEST_TOP_N = int(os.getenv("DIGEST_TOP_N", "5"))
+
+# Heavy Hitters Configuration (top drop sources/ports over 1m/5m/1h, served by /top)
+HEAVY_HITTERS_CAPACITY = int(os.getenv("HEAVY_HITTERS_CAPACITY", "100"))  # keys per window slot
+TOP_CONTEXT_WINDOW = os.getenv("TOP_CONTEXT_WINDOW", "5m")  # 1m, 5m or 1h
+TOP_CONTEXT_MAX_RANK = int(os.getenv("TOP_CONTEXT_MAX_RANK", "3"))  # rank shown in messages, 0 disables
+
+# Live Time Series (/series: per-second and per-minute counts per host, interface and alert_type)
+SERIES_SECONDS = int(os.getenv("SERIES_SECONDS", "900"))  # one-second buckets kept (15 minutes)
+SERIES_MINUTES = int(os.getenv("SERIES_MINUTES", "1440"))  # one-minute buckets kept (24 hours)
+SERIES_MAX_KEYS = int(os.getenv("SERIES_MAX_KEYS", "1000"))  # series held, least recently updated evicted
+
+# Scan Detection (distinct dstip:dstport per source, synthesized "scan detected" alerts)
+SCAN_DETECTION = os.getenv("SCAN_DETECTION", "true").lower() == "true"
+SCAN_WINDOW = int(os.getenv("SCAN_WINDOW", "300"))  # seconds
+SCAN_THRESHOLD = int(os.getenv("SCAN_THRESHOLD", "50"))  # distinct targets within the window
+SCAN_COOLDOWN = int(os.getenv("SCAN_COOLDOWN", str(SCAN_WINDOW)))  # seconds between alerts for one source
+SCAN_MAX_SOURCES = int(os.getenv("SCAN_MAX_SOURCES", "100000"))  # tracked sources, least recent evicted
+SCAN_PRECISION = int(os.getenv("SCAN_PRECISION", "7"))  # 2^p HyperLogLog registers (~1.04/sqrt(2^p) error)
+
+# Filter Rules (JSON or YAML rules per scope: notify, syslog, drop_forward, alerts; empty = built-in rules)
+RULES_FILE = os.getenv("RULES_FILE", "")
+
+# Network Classification (CIDR prefixes -> tags such as ignore, internal, multicast)
+NETWORKS_FILE = os.getenv("NETWORKS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "networks.txt"))
+NETWORKS_CACHE_SIZE = int(os.getenv("NETWORKS_CACHE_SIZE", "65536"))  # cached address lookups
+
+# Enrichment Configuration (MAC vendor, source country/ASN and reverse DNS in alerts)
+ENRICH_OUI_FILE = os.getenv("ENRICH_OUI_FILE", "")  # Wireshark manuf, IEEE oui.txt or oui.csv
+# iptoasn.com ip2asn-*.tsv and/or DB-IP lite CSVs, comma separated; later files win on overlapping fields
+ENRICH_IP_FILES = [path.strip() for path in os.getenv("ENRICH_IP_FILES", "").split(",") if path.strip()]
+ENRICH_CACHE_SIZE = int(os.getenv("ENRICH_CACHE_SIZE", "65536"))  # cached MAC/address lookups
+ENRICH_RDNS = os.getenv("ENRICH_RDNS", "false").lower() == "true"
+ENRICH_RDNS_TTL = int(os.getenv("ENRICH_RDNS_TTL", "3600"))  # seconds a resolved name is cached
+ENRICH_RDNS_NEGATIVE_TTL = int(os.getenv("ENRICH_RDNS_NEGATIVE_TTL", "300"))  # seconds a failure is cached
+ENRICH_RDNS_CACHE_SIZE = int(os.getenv("ENRICH_RDNS_CACHE_SIZE", "10000"))
+ENRICH_RDNS_WORKERS = int(os.getenv("ENRICH_RDNS_WORKERS", "4"))  # concurrent PTR lookups
+
+# Syslog Listener Configuration (direct RouterOS -> bridge alert path)
+SYSLOG_ENABLED = os.getenv("SYSLOG_ENABLED", "false").lower() == "true"
+SYSLOG_HOST = os.getenv("SYSLOG_HOST", "0.0.0.0")
+SYSLOG_PORT = int(os.getenv("SYSLOG_PORT", "5514"))
+SYSLOG_QUEUE_SIZE = int(os.getenv("SYSLOG_QUEUE_SIZE", "10000"))  # datagrams buffered before dropping
+SYSLOG_WORKERS = int(os.getenv("SYSLOG_WORKERS", "1"))
+SYSLOG_REUSEPORT = os.getenv("SYSLOG_REUSEPORT", "true").lower() == "true"
+SYSLOG_RCVBUF = int(os.getenv("SYSLOG_RCVBUF", "0"))  # bytes, 0 = system default
 
 # Server Configuration
 HOST = os.getenv("HOST", "0.0.0.0")
@@ -0,0 +1,76 @@
+"""Bounded TTL store for message deduplication"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class DedupCache:
+    """Remembers message hashes for ``ttl`` seconds, holding at most ``max_entries``.
+
+    Entries live in an OrderedDict in insertion order. Every entry has the same
+    TTL, so insertion order is also expiry order: expired entries are always at
+    the front and are popped in amortized O(1) on each access. When the cap is
+    reached the oldest entry is evicted (LRU by insertion), so memory stays
+    bounded even when every drop line is unique.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop expired entries from the front of the queue"""
+        if now is None:
+            now = time.time()
+        entries = self._entries
+        cutoff = now - self.ttl
+        removed = 0
+        while entries:
+            key, timestamp = next(iter(entries.items()))
+            if timestamp > cutoff:
+                break
+            entries.popitem(last=False)
+            removed += 1
+        self.expirations += removed
+        return removed
+
+    def check(self, key: str, now: Optional[float] = None) -> bool:
+        """Return True if ``key`` is new (and remember it), False if it is a duplicate"""
+        if now is None:
+            now = time.time()
+        self.expire(now)
+
+        if key in self._entries:
+            self.hits += 1
+            return False
+
+        self.misses += 1
+        self._entries[key] = now
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions
+        }
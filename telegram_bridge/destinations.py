@@ -0,0 +1,357 @@
+"""Alert destinations (Telegram chats, webhooks), routing rules and per-destination rate limits"""
+import fnmatch
+import json
+import logging
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import httpx
+
+from telegram_client import SendResult, TelegramClient
+
+logger = logging.getLogger(__name__)
+
+# Routing keys and their aliases, like the template field specs
+ROUTE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "host": ("host", "host.ip", "host.name", "device_ip"),
+    "alert_type": ("alert_type", "topic", "type"),
+    "severity": ("severity", "level"),
+    "interface": ("in_interface", "interface", "iface"),
+}
+NAME_RE = re.compile(r"^[A-Za-z][\w-]*$")
+ENV_REF_RE = re.compile(r"\$\{[^}]*\}")
+
+
+def _field(event: Mapping[str, Any], fields: Tuple[str, ...]) -> str:
+    for field in fields:
+        value = event.get(field)
+        if not value and "." in field:
+            head, tail = field.split(".", 1)
+            nested = event.get(head)
+            value = nested.get(tail) if isinstance(nested, dict) else None
+        if value and not isinstance(value, dict):
+            return str(value)
+    return ""
+
+
+def _expand(value: Any, unresolved: List[str]) -> Any:
+    """os.path.expandvars on every string, inside nested objects and lists too.
+
+    ``${...}`` references left after expansion (unset variables) are
+    collected in ``unresolved``.
+    """
+    if isinstance(value, str):
+        value = os.path.expandvars(value)
+        unresolved.extend(ENV_REF_RE.findall(value))
+        return value
+    if isinstance(value, dict):
+        return {key: _expand(item, unresolved) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_expand(item, unresolved) for item in value]
+    return value
+
+
+class TokenBucket:
+    """Token bucket that hands out send times instead of rejecting.
+
+    ``reserve`` always takes a token and returns how long the caller must
+    wait for it; tokens may go negative, which queues reservations in
+    arrival order without a lock or a polling loop. A 429 calls ``penalize``:
+    nothing is handed out before ``retry_after`` has passed and the rate is
+    halved, then every successful send adds back a tenth of the configured
+    rate (AIMD) until it is reached again.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, max_wait: Optional[float] = None, now: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait before sending, or None (nothing taken) if that exceeds ``max_wait``"""
+        if now is None:
+            now = time.monotonic()
+        self._refill(now)
+        wait = max((1 - self.tokens) / self.rate if self.tokens < 1 else 0.0, self.blocked_until - now, 0.0)
+        if max_wait is not None and wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def refund(self):
+        """Give back a reservation that was not used"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def penalize(self, retry_after: Optional[float], now: Optional[float] = None):
+        if now is None:
+            now = time.monotonic()
+        self._refill(now)
+        self.throttled += 1
+        self.rate = max(self.rate / 2, self.base_rate / 16)
+        self.tokens = min(self.tokens, 0.0)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def succeeded(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 10)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_minute": round(self.rate * 60, 3),
+            "configured_per_minute": round(self.base_rate * 60, 3),
+            "burst": self.burst,
+            "throttled": self.throttled,
+        }
+
+
+class Destination:
+    """A place alerts are delivered to, with its routing rules and rate limit.
+
+    ``match`` maps routing keys (host, alert_type, severity, interface) to
+    accepted values; shell-style patterns (``10.1.*``) are allowed and an
+    empty ``match`` accepts everything. ``buckets`` are acquired together:
+    the destination's own bucket plus any shared one (the per-bot limit of
+    Telegram destinations).
+    """
+
+    kind = "base"
+
+    def __init__(self, name: str, match: Mapping[str, Iterable[str]], bucket: TokenBucket,
+                 shared_buckets: Iterable[TokenBucket] = ()):
+        self.name = name
+        self.match = {key: tuple(str(value).lower() for value in values) for key, values in match.items()}
+        self.bucket = bucket
+        self.buckets = (bucket, *shared_buckets)
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    @property
+    def catch_all(self) -> bool:
+        return not self.match
+
+    def accepts(self, key: Dict[str, str]) -> bool:
+        for field, patterns in self.match.items():
+            value = key.get(field, "")
+            if not any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns):
+                return False
+        return True
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Wait until every bucket of this destination has a token, None if longer than ``max_wait``"""
+        now = time.monotonic()
+        waits = []
+        for bucket in self.buckets:
+            wait = bucket.reserve(max_wait, now)
+            if wait is None:
+                for taken in self.buckets[:len(waits)]:
+                    taken.refund()
+                self.rate_limited += 1
+                return None
+            waits.append(wait)
+        return max(waits)
+
+    def record(self, result: SendResult):
+        """Update counters and adapt the buckets to the API answer"""
+        if result.ok:
+            self.sent += 1
+            for bucket in self.buckets:
+                bucket.succeeded()
+            return
+        self.failed += 1
+        if result.status_code == 429:
+            # retry_after applies to the chat; the shared bot bucket only slows down
+            self.bucket.penalize(result.retry_after)
+            for bucket in self.buckets[1:]:
+                bucket.penalize(None)
+
+    def permanent_failure(self, result: SendResult) -> bool:
+        """True when retrying the same message can never succeed"""
+        return result.status_code == 400
+
+    async def send(self, text: str) -> SendResult:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "type": self.kind,
+            "match": {key: list(values) for key, values in self.match.items()},
+            "sent": self.sent,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            **self.bucket.stats(),
+        }
+
+
+class TelegramDestination(Destination):
+    kind = "telegram"
+
+    def __init__(self, name: str, client: TelegramClient, chat_id: str, **kwargs: Any):
+        super().__init__(name, **kwargs)
+        self.client = client
+        self.chat_id = chat_id
+
+    async def send(self, text: str) -> SendResult:
+        return await self.client.send_message(self.chat_id, text)
+
+
+class WebhookDestination(Destination):
+    """POSTs ``{"destination": name, "text": message}`` as JSON to a URL"""
+
+    kind = "webhook"
+
+    def __init__(self, name: str, client: httpx.AsyncClient, url: str,
+                 headers: Optional[Mapping[str, str]] = None, **kwargs: Any):
+        super().__init__(name, **kwargs)
+        self.client = client
+        self.url = url
+        self.headers = dict(headers or {})
+
+    async def send(self, text: str) -> SendResult:
+        try:
+            response = await self.client.post(self.url, json={"destination": self.name, "text": text},
+                                              headers=self.headers)
+        except httpx.HTTPError as e:
+            return SendResult(False, error=str(e) or e.__class__.__name__)
+        if response.is_success:
+            return SendResult(True, response.status_code)
+        retry_after = None
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            pass
+        return SendResult(False, response.status_code, retry_after, response.text[:200])
+
+    def permanent_failure(self, result: SendResult) -> bool:
+        return result.status_code is not None and 400 <= result.status_code < 500 \
+            and result.status_code not in (408, 429)
+
+
+class Router:
+    """Picks the destinations of an event from its host, alert_type, severity and interface.
+
+    Routing keys repeat heavily (one host, a few alert types), so the
+    destination tuple is cached per key combination.
+    """
+
+    def __init__(self, destinations: List[Destination], clients: Iterable[TelegramClient] = (),
+                 webhook_client: Optional[httpx.AsyncClient] = None, cache_size: int = 4096):
+        self.destinations = destinations
+        self.by_name = {destination.name: destination for destination in destinations}
+        self.clients = list(clients)
+        self.webhook_client = webhook_client
+        self.catch_all = tuple(destination for destination in destinations if destination.catch_all)
+        self._route = lru_cache(maxsize=cache_size)(self._match)
+        self.unrouted = 0
+
+    def _match(self, values: Tuple[str, ...]) -> Tuple[Destination, ...]:
+        key = dict(zip(ROUTE_FIELDS, values))
+        return tuple(destination for destination in self.destinations if destination.accepts(key))
+
+    def route(self, event: Mapping[str, Any]) -> Tuple[Destination, ...]:
+        destinations = self._route(tuple(_field(event, aliases).lower() for aliases in ROUTE_FIELDS.values()))
+        if not destinations:
+            self.unrouted += 1
+        return destinations
+
+    async def start(self):
+        for client in self.clients:
+            await client.start()
+
+    async def close(self):
+        for client in self.clients:
+            await client.close()
+        if self.webhook_client is not None:
+            await self.webhook_client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        cache = self._route.cache_info()
+        return {
+            "destinations": {destination.name: destination.stats() for destination in self.destinations},
+            "unrouted": self.unrouted,
+            "route_cache_hits": cache.hits,
+            "route_cache_misses": cache.misses,
+        }
+
+
+def load_router(path: Optional[str], default_client: TelegramClient, default_chat_id: Optional[str],
+                rate: float = 20, burst: float = 5, bot_rate: float = 30,
+                client_options: Optional[Dict[str, Any]] = None) -> Router:
+    """Router from the destinations file, or a single catch-all chat (TELEGRAM_CHAT_ID) without one.
+
+    ``rate`` is per minute (Telegram allows about 20 messages a minute in a
+    group), ``bot_rate`` per second and shared by all chats of one bot token.
+    String values in the file, nested ones included, may reference
+    environment variables (``"${SECURITY_BOT_TOKEN}"``); an unset one is a
+    startup error. Each destination can override ``rate`` and ``burst``.
+    """
+    bot_buckets: Dict[str, TokenBucket] = {}
+    clients: Dict[str, TelegramClient] = {default_client.bot_token: default_client}
+
+    def bot_bucket(token: str) -> TokenBucket:
+        if token not in bot_buckets:
+            bot_buckets[token] = TokenBucket(bot_rate, bot_rate)
+        return bot_buckets[token]
+
+    if not path:
+        bucket = TokenBucket(rate / 60, burst)
+        destination = TelegramDestination("default", default_client, default_chat_id, match={},
+                                          bucket=bucket, shared_buckets=(bot_bucket(default_client.bot_token),))
+        return Router([destination], clients.values())
+
+    with open(path) as f:
+        config = json.load(f)
+    entries = config.get("destinations", []) if isinstance(config, dict) else config
+    destinations: List[Destination] = []
+    webhook_client = None
+    for entry in entries:
+        unresolved: List[str] = []
+        entry = _expand(entry, unresolved)
+        name = entry.get("name", "")
+        if not NAME_RE.match(name) or any(d.name == name for d in destinations):
+            raise ValueError(f"{path}: destination name {name!r} is invalid or repeated")
+        if unresolved:
+            # Left as text, an unset token or chat_id would only fail later as API errors
+            raise ValueError(f"{path}: destination {name}: unset environment variables {unresolved}")
+        match = entry.get("match") or {}
+        unknown = set(match) - set(ROUTE_FIELDS)
+        if unknown:
+            raise ValueError(f"{path}: destination {name}: unknown match keys {sorted(unknown)}")
+        match = {key: [values] if isinstance(values, str) else values for key, values in match.items()}
+        bucket = TokenBucket(float(entry.get("rate", rate)) / 60, float(entry.get("burst", burst)))
+        kind = entry.get("type", "telegram")
+        if kind == "telegram":
+            token = entry.get("bot_token") or default_client.bot_token
+            if not token:
+                raise ValueError(f"{path}: destination {name} needs a bot_token (or TELEGRAM_BOT_TOKEN)")
+            if token not in clients:
+                clients[token] = TelegramClient(token, **(client_options or {}))
+            chat_id = entry.get("chat_id")
+            if not chat_id:
+                raise ValueError(f"{path}: destination {name} needs a chat_id")
+            destinations.append(TelegramDestination(name, clients[token], str(chat_id), match=match,
+                                                    bucket=bucket, shared_buckets=(bot_bucket(token),)))
+        elif kind == "webhook":
+            if not entry.get("url"):
+                raise ValueError(f"{path}: destination {name} needs a url")
+            if webhook_client is None:
+                webhook_client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=5.0))
+            destinations.append(WebhookDestination(name, webhook_client, entry["url"], entry.get("headers"),
+                                                   match=match, bucket=bucket))
+        else:
+            raise ValueError(f"{path}: destination {name}: unknown type {kind!r}")
+    logger.info("Loaded %d destinations from %s", len(destinations), path)
+    return Router(destinations, clients.values(), webhook_client)
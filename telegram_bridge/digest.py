@@ -0,0 +1,109 @@
+"""Coalescing digest: aggregate alerts per window into one Telegram message"""
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+TELEGRAM_MAX_LENGTH = 4096
+
+# (host, rule, srcip, dstport)
+GroupKey = Tuple[str, str, str, str]
+OVERFLOW_KEY: GroupKey = ("*", "*", "*", "*")
+
+
+class DigestAggregator:
+    """Counts events per (host, rule, source, destination port).
+
+    The group table is capped at ``max_groups``; once full, events for new
+    groups are still counted in the totals and per-dimension tallies but land
+    in a single overflow group, so the digest never under-reports a storm.
+    """
+
+    def __init__(self, max_groups: int = 5000):
+        self.max_groups = max_groups
+        self.reset()
+
+    def reset(self):
+        self.groups: Dict[GroupKey, int] = {}
+        self.sources: Counter = Counter()
+        self.ports: Counter = Counter()
+        self.rules: Counter = Counter()
+        self.total = 0
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self.total
+
+    def add(self, host: str, rule: str, srcip: str, dstport: str, timestamp: float, count: int = 1):
+        key = (host or "—", rule or "—", srcip or "—", dstport or "—")
+        if key in self.groups:
+            self.groups[key] += count
+        elif len(self.groups) < self.max_groups:
+            self.groups[key] = count
+        else:
+            self.groups[OVERFLOW_KEY] = self.groups.get(OVERFLOW_KEY, 0) + count
+
+        self.sources[key[2]] += count
+        self.ports[key[3]] += count
+        self.rules[key[1]] += count
+        self.total += count
+        if self.first_seen is None:
+            self.first_seen = timestamp
+        self.last_seen = timestamp
+
+    def merge(self, other: "DigestAggregator"):
+        """Fold another aggregator into this one (used to requeue an unsent digest)"""
+        for (host, rule, srcip, dstport), count in other.groups.items():
+            key = (host, rule, srcip, dstport)
+            if key in self.groups:
+                self.groups[key] += count
+            elif len(self.groups) < self.max_groups:
+                self.groups[key] = count
+            else:
+                self.groups[OVERFLOW_KEY] = self.groups.get(OVERFLOW_KEY, 0) + count
+        self.sources.update(other.sources)
+        self.ports.update(other.ports)
+        self.rules.update(other.rules)
+        self.total += other.total
+        if other.first_seen is not None:
+            if self.first_seen is None or other.first_seen < self.first_seen:
+                self.first_seen = other.first_seen
+            if self.last_seen is None or other.last_seen > self.last_seen:
+                self.last_seen = other.last_seen
+
+    def format_message(self, window: int, top_n: int = 5, limit: int = TELEGRAM_MAX_LENGTH) -> str:
+        """Build the summary text, truncating the group list to fit ``limit``"""
+        lines = [
+            f"📊 **RESUMO DE ALERTAS** ({window}s)",
+            f"🔢 {self.total:,} drops • {len(self.sources):,} origens • {len(self.groups):,} grupos",
+            ""
+        ]
+
+        def top(title: str, counter: Counter):
+            lines.append(title)
+            for value, count in counter.most_common(top_n):
+                lines.append(f"  • {value}: {count:,}")
+
+        top("📤 **Top origens:**", self.sources)
+        top("🎯 **Top portas:**", self.ports)
+        top("🚫 **Top regras:**", self.rules)
+        lines.extend(["", "📋 **Grupos (host • regra • origem → porta):**"])
+
+        text = "\n".join(lines)
+        size = utf16_len(text)
+        groups = sorted(self.groups.items(), key=lambda item: item[1], reverse=True)
+        for shown, ((host, rule, srcip, dstport), count) in enumerate(groups):
+            line = f"\n{host} • {rule} • {srcip} → {dstport}: {count:,}"
+            footer = f"\n… e mais {len(groups) - shown:,} grupos"
+            line_size = utf16_len(line)
+            if size + line_size + utf16_len(footer) > limit:
+                text += footer
+                break
+            text += line
+            size += line_size
+
+        return text
+
+
+def utf16_len(text: str) -> int:
+    """Message length as counted by Telegram (UTF-16 code units)"""
+    return len(text.encode("utf-16-le")) // 2
@@ -0,0 +1,153 @@
+"""Drain-style log template miner used to build fuzzy deduplication keys"""
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+WILDCARD = "<*>"
+
+# Variable parts of RouterOS lines, masked before clustering. MACs come before
+# IPv6 so "00:11:22:33:44:55" is not read as an address; ports are the numbers
+# after an address ("1.2.3.4:51234->5.6.7.8:22").
+MASK_RE = re.compile(
+    r"(?P<MAC>(?<![\w:])(?:[0-9A-Fa-f]{2}[:-]){5}[0-9A-Fa-f]{2}(?![\w:]))"
+    r"|(?P<IP>(?<![\w.])\d{1,3}(?:\.\d{1,3}){3}(?![\w.]))"
+    r"|(?P<IP6>(?<![\w:])(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}(?![\w:])"
+    r"|(?<![\w:])(?:[0-9A-Fa-f]{1,4}:){1,6}:(?:[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4})*)?(?![\w:]))"
+    r"|(?P<HEX>\b0x[0-9A-Fa-f]+\b)"
+    r"|(?P<NUM>(?<![\w.-])\d+(?![\w.]|-(?!>)))"
+)
+MASKS = {"MAC": "<MAC>", "IP": "<IP>", "IP6": "<IP>", "HEX": "<NUM>", "NUM": "<NUM>"}
+
+
+def mask(message: str) -> str:
+    """Replace MACs, addresses, ports, lengths and counters with placeholders"""
+    return MASK_RE.sub(lambda m: MASKS[m.lastgroup], message)
+
+
+class Template:
+    """One cluster of similar lines; ``tokens`` generalize to ``<*>`` as lines merge"""
+    __slots__ = ("id", "tokens", "size", "leaf")
+
+    def __init__(self, template_id: int, tokens: List[str], leaf: List["Template"]):
+        self.id = template_id
+        self.tokens = tokens
+        self.size = 1
+        self.leaf = leaf
+
+    def __str__(self) -> str:
+        return " ".join(self.tokens)
+
+
+class TemplateMiner:
+    """Online log template clustering (Drain), bounded to ``max_templates``.
+
+    A masked line is routed down a fixed-depth prefix tree: first by token
+    count, then by its first ``depth - 2`` tokens. The leaf holds a short list
+    of templates; the line joins the most similar one (share of identical
+    non-wildcard tokens >= ``similarity``), turning the differing positions
+    into ``<*>``, or starts a new template. Template ids never change once
+    assigned, so they can be used as dedup keys while templates generalize.
+
+    Lines of a flood are identical once masked, so masked text is also looked
+    up in a bounded exact-match table before walking the tree. Templates are
+    evicted least recently used beyond ``max_templates``.
+    """
+
+    def __init__(self, max_templates: int = 1000, similarity: float = 0.5,
+                 depth: int = 4, max_children: int = 100):
+        self.max_templates = max_templates
+        self.similarity = similarity
+        self.prefix_depth = max(depth - 2, 1)
+        self.max_children = max_children
+        self._root: Dict[Any, Any] = {}
+        self._templates: "OrderedDict[int, Template]" = OrderedDict()
+        self._exact: Dict[str, Template] = {}
+        self._next_id = 1
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def match(self, message: str) -> int:
+        """Template id for ``message``, learning a new template if none is similar enough"""
+        masked = mask(message)
+        template = self._exact.get(masked)
+        if template is None or self._templates.get(template.id) is not template:
+            template = self._add(masked)
+            if len(self._exact) >= self.max_templates * 4:
+                self._exact.clear()
+            self._exact[masked] = template
+        else:
+            self.hits += 1
+            template.size += 1
+            self._templates.move_to_end(template.id)
+        return template.id
+
+    def template(self, template_id: int) -> Optional[str]:
+        template = self._templates.get(template_id)
+        return str(template) if template is not None else None
+
+    def _leaf(self, tokens: List[str]) -> List[Template]:
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[:self.prefix_depth]:
+            if any(c.isdigit() for c in token):
+                token = WILDCARD
+            child = node.get(token)
+            if child is None:
+                if len(node) >= self.max_children:
+                    token = WILDCARD
+                child = node.setdefault(token, {})
+            node = child
+        return node.setdefault(None, [])
+
+    def _add(self, masked: str) -> Template:
+        tokens = masked.split()
+        leaf = self._leaf(tokens)
+
+        best, best_similarity, best_wildcards = None, -1.0, -1
+        for template in leaf:
+            same = wildcards = 0
+            for template_token, token in zip(template.tokens, tokens):
+                if template_token == WILDCARD:
+                    wildcards += 1
+                elif template_token == token:
+                    same += 1
+            similarity = same / len(tokens) if tokens else 1.0
+            if similarity > best_similarity or (similarity == best_similarity and wildcards > best_wildcards):
+                best, best_similarity, best_wildcards = template, similarity, wildcards
+
+        if best is not None and best_similarity >= self.similarity:
+            self.hits += 1
+            best.size += 1
+            best.tokens = [t if t == token else WILDCARD for t, token in zip(best.tokens, tokens)]
+            self._templates.move_to_end(best.id)
+            return best
+
+        self.misses += 1
+        template = Template(self._next_id, tokens, leaf)
+        self._next_id += 1
+        leaf.append(template)
+        self._templates[template.id] = template
+        if len(self._templates) > self.max_templates:
+            _, evicted = self._templates.popitem(last=False)
+            evicted.leaf.remove(evicted)
+            self.evictions += 1
+        return template
+
+    def top(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Largest templates, for inspection"""
+        templates = sorted(self._templates.values(), key=lambda t: t.size, reverse=True)[:n]
+        return [{"id": t.id, "size": t.size, "template": str(t)} for t in templates]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "templates": len(self._templates),
+            "max_templates": self.max_templates,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
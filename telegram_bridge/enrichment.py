@@ -0,0 +1,405 @@
+"""Offline alert enrichment: MAC vendor (OUI), IP country/ASN and optional reverse DNS"""
+import csv
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Same alias lists as the template field specs
+MAC_FIELDS = ("src_mac", "src-mac", "mac", "source_mac")
+SRC_FIELDS = ("srcip", "src_ip", "source.ip")
+
+HEX_RE = re.compile(r"[^0-9A-Fa-f]")
+IEEE_REGISTRIES = {"MA-L": 24, "MA-M": 28, "MA-S": 36}
+
+
+def _field(event: Mapping[str, Any], fields: Tuple[str, ...]) -> str:
+    for field in fields:
+        value = event.get(field)
+        if not value and "." in field:
+            head, tail = field.split(".", 1)
+            nested = event.get(head)
+            value = nested.get(tail) if isinstance(nested, dict) else None
+        if value:
+            return str(value)
+    return ""
+
+
+def _ip_value(address: str) -> Optional[Tuple[int, int]]:
+    """(family bits, integer value) of an address string, None if it does not parse"""
+    try:
+        if ":" in address:
+            return 128, int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big")
+        return 32, int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+    except (OSError, TypeError):
+        return None
+
+
+class OuiTable:
+    """MAC prefix -> vendor, from Wireshark ``manuf`` or IEEE ``oui.txt``/``oui.csv`` files.
+
+    Assignments are /24 (MA-L), /28 (MA-M) or /36 (MA-S); like the network
+    classifier, each length has its own hash table keyed by the prefix bits
+    and a lookup tries /36, /28 and /24 in turn, so the most specific
+    assignment wins.
+    """
+
+    LENGTHS = (36, 28, 24)
+
+    def __init__(self):
+        self._tables: Dict[int, Dict[int, str]] = {length: {} for length in self.LENGTHS}
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, prefix: str, vendor: str):
+        length = 24
+        if "/" in prefix:
+            prefix, bits = prefix.split("/", 1)
+            length = int(bits)
+        digits = HEX_RE.sub("", prefix)
+        if length not in self._tables or len(digits) * 4 < length:
+            raise ValueError(f"unsupported OUI prefix {prefix}/{length}")
+        key = int(digits[:length // 4], 16)
+        table = self._tables[length]
+        if key not in table:
+            self.entries += 1
+        table[key] = vendor.strip()
+
+    def load(self, path: str) -> int:
+        loaded = 0
+        with open(path, encoding="utf-8", errors="replace", newline="") as f:
+            if path.endswith(".csv"):
+                # IEEE oui/mam/oui36.csv: Registry,Assignment,Organization Name,Organization Address
+                rows: Iterable[Tuple[str, str]] = (
+                    (f"{row[1]}/{IEEE_REGISTRIES[row[0]]}", row[2])
+                    for row in csv.reader(f) if len(row) >= 3 and row[0] in IEEE_REGISTRIES)
+            else:
+                rows = _text_rows(f)
+            for prefix, vendor in rows:
+                try:
+                    self.add(prefix, vendor)
+                except ValueError:
+                    continue
+                loaded += 1
+        return loaded
+
+    def lookup(self, mac: str) -> Optional[str]:
+        digits = HEX_RE.sub("", mac)
+        if len(digits) != 12:
+            return None
+        value = int(digits, 16)
+        for length in self.LENGTHS:
+            vendor = self._tables[length].get(value >> (48 - length))
+            if vendor is not None:
+                self.hits += 1
+                return vendor
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": self.entries, "hits": self.hits, "misses": self.misses}
+
+
+def _text_rows(lines: Iterable[str]) -> Iterable[Tuple[str, str]]:
+    for line in lines:
+        if not line.strip() or line.startswith("#"):
+            continue
+        if "(hex)" in line:
+            # IEEE oui.txt: "00-00-0C   (hex)\t\tCISCO SYSTEMS, INC."
+            prefix, _, vendor = line.partition("(hex)")
+            yield prefix.strip(), vendor.strip()
+        elif "\t" in line:
+            # Wireshark manuf: "00:00:0C\tCisco\tCisco Systems, Inc" or "00:1B:C5:00:00:00/36\t..."
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 2:
+                yield fields[0].strip(), (fields[2] if len(fields) > 2 and fields[2] else fields[1])
+
+
+class IpRangeTable:
+    """Address ranges -> country/ASN, kept in sorted arrays and searched with bisect.
+
+    Reads the free offline databases: iptoasn.com TSV (``start end asn
+    country description``) and DB-IP lite CSV, either country
+    (``start,end,country``) or ASN (``start,end,asn,organization``). Range
+    starts and ends live in ``array`` columns (IPv4) or lists (IPv6); the
+    values are deduplicated and referenced by index, so a million ranges
+    cost a few tens of MB.
+    """
+
+    def __init__(self):
+        self._starts: Dict[int, Any] = {32: array("I"), 128: []}
+        self._ends: Dict[int, Any] = {32: array("I"), 128: []}
+        self._refs: Dict[int, array] = {32: array("I"), 128: array("I")}
+        self._values: List[Dict[str, str]] = []
+        self._value_ids: Dict[Tuple, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._refs[32]) + len(self._refs[128])
+
+    def load(self, path: str) -> int:
+        rows: List[Tuple[int, int, int, int]] = []
+        with open(path, encoding="utf-8", errors="replace", newline="") as f:
+            delimiter = "\t" if "\t" in f.readline() else ","
+            f.seek(0)
+            for row in csv.reader(f, delimiter=delimiter):
+                if len(row) < 3:
+                    continue
+                start, end = _ip_value(row[0].strip()), _ip_value(row[1].strip())
+                if start is None or end is None or start[0] != end[0]:
+                    continue
+                value = self._parse_value(row)
+                if value:
+                    rows.append((start[0], start[1], end[1], self._value_id(value)))
+        rows.sort()
+        for bits, start, end, ref in rows:
+            self._starts[bits].append(start)
+            self._ends[bits].append(end)
+            self._refs[bits].append(ref)
+        return len(rows)
+
+    @staticmethod
+    def _parse_value(row: List[str]) -> Dict[str, str]:
+        value: Dict[str, str] = {}
+        if len(row) >= 5:  # iptoasn: asn, country, description
+            if row[2].strip() not in ("", "0"):
+                value["asn"] = row[2].strip()
+                value["as_name"] = row[4].strip()
+            if row[3].strip() not in ("", "None"):
+                value["country"] = row[3].strip()
+        elif row[2].strip().isdigit():  # DB-IP ASN
+            value["asn"] = row[2].strip()
+            if len(row) > 3:
+                value["as_name"] = row[3].strip()
+        elif len(row[2].strip()) == 2:  # DB-IP country
+            value["country"] = row[2].strip()
+        return value
+
+    def _value_id(self, value: Dict[str, str]) -> int:
+        key = tuple(sorted(value.items()))
+        ref = self._value_ids.get(key)
+        if ref is None:
+            ref = self._value_ids[key] = len(self._values)
+            self._values.append(value)
+        return ref
+
+    def lookup(self, address: str) -> Optional[Dict[str, str]]:
+        parsed = _ip_value(address)
+        if parsed is not None:
+            bits, value = parsed
+            index = bisect_right(self._starts[bits], value) - 1
+            if index >= 0 and value <= self._ends[bits][index]:
+                self.hits += 1
+                return self._values[self._refs[bits][index]]
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ranges": len(self), "hits": self.hits, "misses": self.misses}
+
+
+class ReverseDNS:
+    """Non-blocking PTR lookups with a TTL/LRU cache.
+
+    ``lookup`` only reads the cache: on a miss it queues a resolution on a
+    small thread pool and returns None, so the alert goes out without the
+    name and later alerts for the same address get it. Failures are cached
+    for ``negative_ttl`` so an unresolvable or slow address is not retried
+    on every drop, and at most ``max_pending`` lookups are queued.
+    """
+
+    def __init__(self, ttl: float = 3600, negative_ttl: float = 300, max_entries: int = 10000,
+                 workers: int = 4, max_pending: int = 256,
+                 observe: Optional[Callable[[float], None]] = None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self.observe = observe
+        self._cache: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rdns")
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.resolved = 0
+        self.failed = 0
+        self.dropped = 0
+        self.resolve_seconds = 0.0
+
+    def lookup(self, address: str, now: Optional[float] = None) -> Optional[str]:
+        if now is None:
+            now = time.time()
+        with self._lock:
+            entry = self._cache.get(address)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(address)
+                if entry[1] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if address in self._pending:
+                return None
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return None
+            self._pending.add(address)
+        self._executor.submit(self._resolve, address)
+        return None
+
+    def _resolve(self, address: str):
+        started = time.perf_counter()
+        try:
+            name: Optional[str] = socket.gethostbyaddr(address)[0]
+        except (OSError, UnicodeError):
+            name = None
+        elapsed = time.perf_counter() - started
+        if self.observe is not None:
+            self.observe(elapsed)
+        with self._lock:
+            self._pending.discard(address)
+            self.resolve_seconds += elapsed
+            if name is None:
+                self.failed += 1
+            else:
+                self.resolved += 1
+            ttl = self.ttl if name is not None else self.negative_ttl
+            self._cache[address] = (time.time() + ttl, name)
+            self._cache.move_to_end(address)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        resolutions = self.resolved + self.failed
+        return {
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "resolved": self.resolved,
+            "failed": self.failed,
+            "avg_resolve_ms": round(self.resolve_seconds / resolutions * 1000, 3) if resolutions else 0.0
+        }
+
+
+class Enricher:
+    """Template fields with the vendor of ``src_mac`` and country/ASN/PTR of the source address.
+
+    Database lookups are cached per address in an LRU, like the network
+    classifier; every stage is optional and missing databases just leave
+    their fields out.
+    """
+
+    def __init__(self, oui: Optional[OuiTable] = None, ip_tables: Iterable[IpRangeTable] = (),
+                 rdns: Optional[ReverseDNS] = None, cache_size: int = 65536):
+        self.oui = oui
+        self.ip_tables = [table for table in ip_tables if len(table)]
+        self.rdns = rdns
+        self.vendor = lru_cache(maxsize=cache_size)(self._vendor)
+        self.ip_info = lru_cache(maxsize=cache_size)(self._ip_info)
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.oui or self.ip_tables or self.rdns)
+
+    def _vendor(self, mac: str) -> Optional[str]:
+        return self.oui.lookup(mac) if self.oui else None
+
+    def _ip_info(self, address: str) -> Dict[str, str]:
+        info: Dict[str, str] = {}
+        for table in self.ip_tables:
+            value = table.lookup(address)
+            if value:
+                info.update(value)
+        return info
+
+    def template_fields(self, event: Mapping[str, Any]) -> Dict[str, Any]:
+        """``src_vendor``, ``src_country``, ``src_asn``, ``src_as_name`` and ``src_rdns`` when known"""
+        if not self.enabled:
+            return {}
+        started = time.perf_counter()
+        fields: Dict[str, Any] = {}
+        mac = _field(event, MAC_FIELDS)
+        if mac and self.oui:
+            vendor = self.vendor(mac)
+            if vendor:
+                fields["src_vendor"] = vendor
+        address = _field(event, SRC_FIELDS)
+        if address:
+            if self.ip_tables:
+                for key, value in self.ip_info(address).items():
+                    fields[f"src_{key}"] = value
+            if self.rdns:
+                name = self.rdns.lookup(address)
+                if name:
+                    fields["src_rdns"] = name
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - started
+        return fields
+
+    def close(self):
+        if self.rdns:
+            self.rdns.close()
+
+    def stats(self) -> Dict[str, Any]:
+        vendor_cache = self.vendor.cache_info()
+        ip_cache = self.ip_info.cache_info()
+        return {
+            "enabled": self.enabled,
+            "lookups": self.lookups,
+            "avg_lookup_us": round(self.lookup_seconds / self.lookups * 1e6, 3) if self.lookups else 0.0,
+            "oui": {**self.oui.stats(), "cache_hits": vendor_cache.hits,
+                    "cache_misses": vendor_cache.misses} if self.oui else None,
+            "ip": {"ranges": sum(len(table) for table in self.ip_tables),
+                   "cache_hits": ip_cache.hits, "cache_misses": ip_cache.misses} if self.ip_tables else None,
+            "rdns": self.rdns.stats() if self.rdns else None
+        }
+
+
+def load_enricher(oui_file: Optional[str], ip_files: Iterable[str], rdns: bool = False,
+                  rdns_ttl: float = 3600, rdns_negative_ttl: float = 300, rdns_cache_size: int = 10000,
+                  rdns_workers: int = 4, cache_size: int = 65536,
+                  observe: Optional[Callable[[float], None]] = None) -> Enricher:
+    """Enricher from the database files that exist (missing files are skipped with a warning)"""
+    oui = None
+    if oui_file:
+        if os.path.exists(oui_file):
+            oui = OuiTable()
+            logger.info("Loaded %d OUI prefixes from %s", oui.load(oui_file), oui_file)
+        else:
+            logger.warning("OUI database %s not found, MAC vendors disabled", oui_file)
+    tables = []
+    for path in ip_files:
+        if not os.path.exists(path):
+            logger.warning("IP database %s not found, skipped", path)
+            continue
+        table = IpRangeTable()
+        logger.info("Loaded %d IP ranges from %s", table.load(path), path)
+        tables.append(table)
+    resolver = ReverseDNS(rdns_ttl, rdns_negative_ttl, rdns_cache_size, rdns_workers,
+                          observe=observe) if rdns else None
+    return Enricher(oui, tables, resolver, cache_size)
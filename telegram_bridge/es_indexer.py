@@ -0,0 +1,285 @@
+"""Direct Elasticsearch indexing: buffered, gzip'd _bulk requests to the daily Logstash indices"""
+import asyncio
+import gzip
+import logging
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import httpx
+
+import codec
+from routeros import logstash_document, utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Per-item errors are needed to retry the 429s; "status" keeps items aligned with the batch
+BULK_PATH = "/_bulk?filter_path=errors,items.*.status,items.*.error"
+
+
+def event_document(event: Mapping[str, Any]) -> Dict[str, Any]:
+    """Logstash-shaped document for an event posted to /notify or /drop-forward.
+
+    Accepts the bridge field names (``srcip``, ``in_interface``...) and a
+    ``host`` given as a string or as Logstash's ``{"ip": ...}``.
+    """
+    host = event.get("host")
+    if isinstance(host, dict):
+        host = host.get("ip")
+    timestamp = event.get("@timestamp")
+    if not isinstance(timestamp, str) or timestamp[4:5] != "-" or timestamp[7:8] != "-":
+        timestamp = utc_timestamp()
+    return logstash_document(str(event.get("message") or ""), str(host) if host else None, timestamp, event)
+
+
+class BulkIndexer:
+    """Buffers documents and writes them to ``<prefix>-YYYY.MM.dd`` with gzip'd ``_bulk`` requests.
+
+    A batch is flushed when it holds ``batch_size`` documents or
+    ``batch_bytes`` of NDJSON, or ``flush_interval`` seconds after its first
+    document. ``workers`` batches are in flight at most, over one pooled
+    keep-alive client. A 429 or 5xx answer (or a per-item 429) is retried
+    with exponential backoff, so the buffer grows while Elasticsearch is
+    throttling; once ``max_pending`` documents are waiting ``add`` refuses
+    new ones, which callers turn into a 429 or count as dropped.
+    """
+
+    def __init__(self, url: str, index_prefix: str = "mikrotik-firewall", batch_size: int = 1000,
+                 batch_bytes: int = 5 * 1024 * 1024, flush_interval: float = 1.0, max_pending: int = 50000,
+                 workers: int = 2, retry_base: float = 0.5, retry_max: float = 30.0, compresslevel: int = 1,
+                 timeout: float = 30.0):
+        self.url = url.rstrip("/") + BULK_PATH
+        self.index_prefix = index_prefix
+        self.batch_size = max(batch_size, 1)
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, self.batch_size)
+        self.workers = max(workers, 1)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.compresslevel = compresslevel
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self.lines: List[bytes] = []  # action and source line of each buffered document
+        self.buffer_bytes = 0
+        self.buffer_started = 0.0
+        self.pending = 0  # buffered + in flight + waiting to be retried
+        self.ready = asyncio.Event()
+        self.tasks: List["asyncio.Task[None]"] = []
+        self.closing = False
+        self.backoff_until = 0.0
+        self._actions: Dict[str, bytes] = {}
+        self.accepted = 0
+        self.indexed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.bytes_raw = 0
+        self.last_error: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self.pending
+
+    def has_room(self, count: int = 1) -> bool:
+        return self.pending + count <= self.max_pending
+
+    def retry_after(self) -> int:
+        """Seconds a refused client should wait: the current backoff, at least one"""
+        return max(1, int(self.backoff_until - time.monotonic() + 0.999))
+
+    def _action(self, timestamp: str) -> bytes:
+        day = timestamp[:10]
+        action = self._actions.get(day)
+        if action is None:
+            if len(self._actions) >= 64:
+                self._actions.clear()
+            index = f"{self.index_prefix}-{day.replace('-', '.')}"
+            action = self._actions[day] = codec.dumps({"index": {"_index": index}})
+        return action
+
+    def add(self, document: Mapping[str, Any]) -> bool:
+        """Buffer one document for its daily index; False when the buffer is full"""
+        if self.closing or self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+        action = self._action(document["@timestamp"])
+        source = codec.dumps(document)
+        if not self.lines:
+            self.buffer_started = time.monotonic()
+            self.ready.set()
+        self.lines.append(action)
+        self.lines.append(source)
+        self.buffer_bytes += len(action) + len(source) + 2
+        self.pending += 1
+        self.accepted += 1
+        if len(self.lines) >= 2 * self.batch_size or self.buffer_bytes >= self.batch_bytes:
+            self.ready.set()
+        return True
+
+    def add_line(self, line: str, host: Optional[str], event: Optional[Mapping[str, Any]] = None,
+                 timestamp: Optional[str] = None) -> bool:
+        """Buffer a raw syslog line (with its parse_line event, if it had one); blank lines are skipped"""
+        line = line.strip()
+        if not line:
+            return True
+        if event is not None:
+            timestamp = event["@timestamp"]
+        return self.add(logstash_document(line, host, timestamp or utc_timestamp(), event))
+
+    def _take(self) -> List[bytes]:
+        lines = self.lines
+        self.lines = []
+        self.buffer_bytes = 0
+        return lines
+
+    async def _worker(self):
+        while True:
+            if not self.lines:
+                if self.closing:
+                    return
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            full = len(self.lines) >= 2 * self.batch_size or self.buffer_bytes >= self.batch_bytes
+            wait = self.buffer_started + self.flush_interval - time.monotonic()
+            if not full and not self.closing and wait > 0:
+                self.ready.clear()
+                try:
+                    await asyncio.wait_for(self.ready.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            lines = self._take()
+            if len(lines) > 2 * self.batch_size:
+                # Filled while every worker was busy: send batch_size now, the rest next
+                self.lines = lines[2 * self.batch_size:]
+                self.buffer_bytes = sum(len(line) + 1 for line in self.lines)
+                lines = lines[:2 * self.batch_size]
+            try:
+                await self._send(lines)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._fail(len(lines) // 2, f"{type(e).__name__}: {e}")
+                logger.error("Error indexing %d documents: %s", len(lines) // 2, e)
+
+    def _fail(self, count: int, error: str):
+        self.failed += count
+        self.pending -= count
+        self.last_error = error
+
+    async def _send(self, lines: List[bytes]):
+        """POST one batch until every document is indexed or has failed for good"""
+        attempt = 0
+        while lines:
+            raw = b"\n".join(lines) + b"\n"
+            headers = {"Content-Type": "application/x-ndjson"}
+            if self.compresslevel:
+                # zlib releases the GIL, so big batches do not stall the event loop
+                body = await asyncio.to_thread(gzip.compress, raw, self.compresslevel)
+                headers["Content-Encoding"] = "gzip"
+            else:
+                body = raw
+            self.requests += 1
+            self.bytes_raw += len(raw)
+            self.bytes_sent += len(body)
+            count = len(lines) // 2
+            try:
+                response = await self.client.post(self.url, content=body, headers=headers)
+                status, reason = response.status_code, f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                response, status, reason = None, None, f"{type(e).__name__}: {e}"
+
+            if status == 200:
+                lines, reason = self._retry_items(lines, codec.loads(response.content))
+                if not lines:
+                    return
+            elif status is not None and status != 429 and status < 500:
+                # Malformed request or mapping problem: retrying would fail the same way
+                self._fail(count, f"{reason}: {response.text[:200]}")
+                logger.error("Bulk request rejected (%s): %s", reason, response.text[:200])
+                return
+            elif self.closing and attempt >= 2:
+                self._fail(count, f"{reason} while closing")
+                logger.warning("%d documents not indexed at shutdown: %s", count, reason)
+                return
+
+            if status == 429 or reason == "item 429":
+                self.throttled += 1
+            self.retries += 1
+            delay = min(self.retry_base * 2 ** attempt, self.retry_max)
+            self.backoff_until = max(self.backoff_until, time.monotonic() + delay)
+            attempt += 1
+            self.last_error = reason
+            logger.warning("Elasticsearch %s for %d documents, retrying in %.1fs", reason, len(lines) // 2, delay)
+            await asyncio.sleep(delay)
+
+    def _retry_items(self, lines: List[bytes], body: Dict[str, Any]) -> Tuple[List[bytes], str]:
+        """Account for a 200 bulk answer; the lines of items rejected with 429 are returned for a retry"""
+        count = len(lines) // 2
+        if not body.get("errors"):
+            self.indexed += count
+            self.pending -= count
+            return [], ""
+        retry: List[bytes] = []
+        failed = 0
+        for position, item in enumerate(body.get("items", ())):
+            result = next(iter(item.values()), {})
+            if "error" not in result:
+                continue
+            if result.get("status") == 429:
+                retry.extend(lines[2 * position:2 * position + 2])
+            else:
+                failed += 1
+                self.last_error = str(result["error"])[:200]
+        self.indexed += count - failed - len(retry) // 2
+        self.failed += failed
+        self.pending -= count - len(retry) // 2
+        return retry, "item 429"
+
+    async def start(self):
+        self.closing = False
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers)
+        )
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self, timeout: float = 10.0):
+        """Flush what is buffered within ``timeout`` seconds; documents still pending after that are lost"""
+        self.closing = True
+        self.ready.set()
+        if self.tasks:
+            done, pending = await asyncio.wait(self.tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.tasks = []
+        if self.pending:
+            logger.warning("%d documents not indexed at shutdown", self.pending)
+            self._fail(self.pending, "shutdown")
+        self.lines = []
+        self.buffer_bytes = 0
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index_prefix": self.index_prefix,
+            "pending": self.pending,
+            "buffered": len(self.lines) // 2,
+            "max_pending": self.max_pending,
+            "accepted": self.accepted,
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "backoff_seconds": round(max(0.0, self.backoff_until - time.monotonic()), 3),
+            "compression_ratio": round(self.bytes_raw / self.bytes_sent, 2) if self.bytes_sent else None,
+            "last_error": self.last_error,
+        }
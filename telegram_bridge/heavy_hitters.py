@@ -0,0 +1,256 @@
+"""Fixed-memory heavy-hitter tracking (Space-Saving) over sliding windows"""
+import heapq
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# (key, count, error): the true count is between count - error and count
+TopEntry = Tuple[str, int, int]
+
+
+def _field(event: Mapping[str, Any], fields: Tuple[str, ...]) -> str:
+    """First non-empty alias; dotted names are also tried nested, as in the template field specs"""
+    for field in fields:
+        value = event.get(field)
+        if not value and "." in field:
+            head, tail = field.split(".", 1)
+            nested = event.get(head)
+            value = nested.get(tail) if isinstance(nested, dict) else None
+        if value and not isinstance(value, dict):
+            return str(value)
+    return ""
+
+
+class SpaceSaving:
+    """Space-Saving summary that monitors at most ``capacity`` keys.
+
+    Counts live in a stream-summary: a dict of count -> keys with that count
+    and the current minimum count. Every update increments by one, so the
+    minimum only ever moves to the bucket just above it and both a hit and
+    the replacement of the minimum key are O(1). Any key with a true
+    frequency above total / capacity is guaranteed to be monitored.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.buckets: Dict[int, Dict[str, None]] = {}
+        self.min_count = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, key: str):
+        self.total += 1
+        counts = self.counts
+        buckets = self.buckets
+        count = counts.get(key)
+        if count is None:
+            if len(counts) < self.capacity:
+                self.errors[key] = 0
+                count = 0
+                self.min_count = 0  # bucket 0 is transient, emptied just below
+                buckets.setdefault(0, {})[key] = None
+            else:
+                # Replace a key with the minimum count; the newcomer inherits it as error
+                count = self.min_count
+                bucket = buckets[count]
+                evicted = next(iter(bucket))
+                del bucket[evicted]
+                del counts[evicted]
+                del self.errors[evicted]
+                self.errors[key] = count
+                bucket[key] = None
+
+        # Move the key from bucket ``count`` to ``count + 1``
+        bucket = buckets[count]
+        del bucket[key]
+        if not bucket:
+            del buckets[count]
+            if count == self.min_count:
+                self.min_count = count + 1
+        count += 1
+        counts[key] = count
+        target = buckets.get(count)
+        if target is None:
+            buckets[count] = {key: None}
+        else:
+            target[key] = None
+
+    def clear(self):
+        self.counts.clear()
+        self.errors.clear()
+        self.buckets.clear()
+        self.min_count = 0
+        self.total = 0
+
+
+class WindowedTopK:
+    """Space-Saving over a sliding window made of ``slots`` rotating sub-windows.
+
+    Each slot is its own summary; a slot is reset when the clock comes back to
+    it. Queries merge the live slots, and the merge of the closed ones is
+    cached until the next rotation, so a query only adds the current slot on
+    top of it. Memory is ``slots * capacity`` keys regardless of how many
+    distinct keys are seen.
+    """
+
+    def __init__(self, window: float, slots: int, capacity: int):
+        self.window = window
+        self.slots = slots
+        self.slot_seconds = window / slots
+        self.capacity = capacity
+        self.ring = [SpaceSaving(capacity) for _ in range(slots)]
+        self.epochs = [-1] * slots
+        self._closed_epoch = -1
+        self._closed: Dict[str, List[int]] = {}
+
+    def _slot(self, now: float) -> Tuple[int, SpaceSaving]:
+        epoch = int(now // self.slot_seconds)
+        index = epoch % self.slots
+        if self.epochs[index] != epoch:
+            self.ring[index].clear()
+            self.epochs[index] = epoch
+        return epoch, self.ring[index]
+
+    def add(self, key: str, now: float):
+        epoch = int(now // self.slot_seconds)
+        index = epoch % self.slots
+        if self.epochs[index] != epoch:
+            self.ring[index].clear()
+            self.epochs[index] = epoch
+        self.ring[index].add(key)
+
+    def _closed_counts(self, epoch: int) -> Dict[str, List[int]]:
+        """Merged [count, error] of the live slots other than the current one.
+
+        Only the ``2 * capacity`` largest keys are kept: anything below them
+        cannot reach the top of the window before the next rotation.
+        """
+        if self._closed_epoch != epoch:
+            merged: Dict[str, List[int]] = {}
+            for index, slot_epoch in enumerate(self.epochs):
+                if epoch - self.slots < slot_epoch < epoch:
+                    summary = self.ring[index]
+                    errors = summary.errors
+                    for key, count in summary.counts.items():
+                        entry = merged.get(key)
+                        if entry is None:
+                            merged[key] = [count, errors[key]]
+                        else:
+                            entry[0] += count
+                            entry[1] += errors[key]
+            limit = 2 * self.capacity
+            if len(merged) > limit:
+                merged = dict(heapq.nlargest(limit, merged.items(), key=lambda item: item[1][0]))
+            self._closed = merged
+            self._closed_epoch = epoch
+        return self._closed
+
+    def _entries(self, now: float) -> Iterator[TopEntry]:
+        """(key, count, error) over the whole window, without copying the cached merge"""
+        epoch, current = self._slot(now)
+        closed = self._closed_counts(epoch)
+        counts, errors = current.counts, current.errors
+        for key, (count, error) in closed.items():
+            extra = counts.get(key)
+            if extra is None:
+                yield key, count, error
+            else:
+                yield key, count + extra, error + errors[key]
+        for key, count in counts.items():
+            if key not in closed:
+                yield key, count, errors[key]
+
+    def top(self, n: int, now: float) -> List[TopEntry]:
+        return heapq.nlargest(n, self._entries(now), key=lambda entry: entry[1])
+
+    def rank(self, key: str, now: float) -> Optional[Tuple[int, int]]:
+        """(1-based rank, count) of ``key``, or None if it is not monitored"""
+        epoch, current = self._slot(now)
+        closed = self._closed_counts(epoch)
+        entry = closed.get(key)
+        count = (entry[0] if entry is not None else 0) + current.counts.get(key, 0)
+        if not count:
+            return None
+        return 1 + sum(1 for _, other, _ in self._entries(now) if other > count), count
+
+
+class WindowedCounter:
+    """Plain event count over the same rotating slots as WindowedTopK"""
+
+    def __init__(self, window: float, slots: int):
+        self.slots = slots
+        self.slot_seconds = window / slots
+        self.counts = [0] * slots
+        self.epochs = [-1] * slots
+
+    def add(self, now: float):
+        epoch = int(now // self.slot_seconds)
+        index = epoch % self.slots
+        if self.epochs[index] != epoch:
+            self.counts[index] = 0
+            self.epochs[index] = epoch
+        self.counts[index] += 1
+
+    def total(self, now: float) -> int:
+        epoch = int(now // self.slot_seconds)
+        return sum(count for count, slot_epoch in zip(self.counts, self.epochs)
+                   if epoch - self.slots < slot_epoch <= epoch)
+
+
+class HeavyHitters:
+    """Top drop sources, ports, interfaces and MACs over 1m/5m/1h windows"""
+
+    # Tracked fields and their aliases: bridge names, ECS-style (/drop-forward) and Logstash document names
+    FIELDS: Dict[str, Tuple[str, ...]] = {
+        "srcip": ("srcip", "source.ip", "src_ip", "source_ip", "src"),
+        "dstport": ("dstport", "destination.port", "dst_port", "destination_port"),
+        "in_interface": ("in_interface", "interface", "iface"),
+        "src_mac": ("src_mac", "src-mac", "mac", "source_mac"),
+    }
+    # name -> (window seconds, slots)
+    WINDOWS = {"1m": (60, 6), "5m": (300, 5), "1h": (3600, 12)}
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.trackers: Dict[str, Dict[str, WindowedTopK]] = {
+            field: {name: WindowedTopK(window, slots, capacity)
+                    for name, (window, slots) in self.WINDOWS.items()}
+            for field in self.FIELDS
+        }
+        self.drops = {name: WindowedCounter(window, slots) for name, (window, slots) in self.WINDOWS.items()}
+        self.events = 0
+
+    def add(self, event: Mapping[str, Any], now: Optional[float] = None):
+        """Count one drop event in every window of every tracked field"""
+        if now is None:
+            now = time.time()
+        self.events += 1
+        for counter in self.drops.values():
+            counter.add(now)
+        for field, windows in self.trackers.items():
+            key = _field(event, self.FIELDS[field])
+            if not key or key == "unknown":
+                continue
+            for tracker in windows.values():
+                tracker.add(key, now)
+
+    def top(self, field: str, window: str, n: int = 10, now: Optional[float] = None) -> List[TopEntry]:
+        return self.trackers[field][window].top(n, time.time() if now is None else now)
+
+    def rank(self, field: str, key: str, window: str, now: Optional[float] = None) -> Optional[Tuple[int, int]]:
+        return self.trackers[field][window].rank(key, time.time() if now is None else now)
+
+    def total(self, window: str, now: Optional[float] = None) -> int:
+        """Drop events counted in ``window``"""
+        return self.drops[window].total(time.time() if now is None else now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "capacity": self.capacity,
+            "fields": list(self.FIELDS),
+            "windows": list(self.WINDOWS)
+        }
@@ -0,0 +1,160 @@
+"""Longest-prefix CIDR classifier that tags source/destination addresses"""
+import ipaddress
+import logging
+import os
+import socket
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Tags = Tuple[str, ...]
+
+IGNORE = "ignore"
+
+# Used when no networks file is found; same detection the formatter used to hard-code
+DEFAULT_PREFIXES = (
+    ("255.255.255.255/32", ("broadcast",)),
+    ("224.0.0.0/4", ("multicast",)),
+    ("ff00::/8", ("multicast",)),
+)
+
+# Alias lists, like the template field specs
+SRC_FIELDS = ("srcip", "src_ip", "source.ip")
+DST_FIELDS = ("dstip", "dst_ip", "destination.ip")
+
+
+class NetworkClassifier:
+    """Maps IPv4/IPv6 addresses to the tags of their longest matching prefix.
+
+    Prefixes are stored in one hash table per prefix length, keyed by the
+    network bits (``address >> (bits - length)``). A lookup probes the
+    lengths in use from longest to shortest, so the first hit is the longest
+    match, in at most one probe per distinct length rather than one step per
+    bit as in a binary trie. For IPv4, prefixes of /16 or longer are also
+    indexed by their /16, so an address only probes the lengths that occur
+    inside its own /16 (usually none or one) plus the short prefixes.
+    Results are cached per address string in an LRU, since drop sources
+    repeat heavily.
+    """
+
+    def __init__(self, cache_size: int = 65536):
+        # family bits -> {prefix length: {network bits: tags}}
+        self._tables: Dict[int, Dict[int, Dict[int, Tags]]] = {32: {}, 128: {}}
+        self._probes: Dict[int, List[Tuple[int, Dict[int, Tags]]]] = {32: [], 128: []}
+        # IPv4: /16 -> lengths >= 16 present in it (longest first), and the /0-/15 probes
+        self._v4_index: Dict[int, List[int]] = {}
+        self._v4_short: List[Tuple[int, Dict[int, Tags]]] = []
+        self.prefixes = 0
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def add(self, prefix: str, tags: Iterable[str]):
+        network = ipaddress.ip_network(prefix.strip(), strict=False)
+        bits = network.max_prefixlen
+        length = network.prefixlen
+        table = self._tables[bits].setdefault(length, {})
+        key = int(network.network_address) >> (bits - length)
+        if key not in table:
+            self.prefixes += 1
+        table[key] = tuple(dict.fromkeys(tag.strip().lower() for tag in tags if tag.strip()))
+        self._probes[bits] = sorted(self._tables[bits].items(), reverse=True)
+        if bits == 32:
+            if length >= 16:
+                lengths = self._v4_index.setdefault(int(network.network_address) >> 16, [])
+                if length not in lengths:
+                    lengths.append(length)
+                    lengths.sort(reverse=True)
+            else:
+                self._v4_short = [(n, t) for n, t in self._probes[32] if n < 16]
+        self.lookup.cache_clear()
+
+    def load(self, path: str) -> int:
+        """Load ``<prefix> <tag> [<tag> ...]`` lines; ``#`` starts a comment"""
+        loaded = 0
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                fields = line.split("#", 1)[0].split()
+                if not fields:
+                    continue
+                if len(fields) < 2:
+                    logger.warning("%s:%d: prefix without tags ignored", path, number)
+                    continue
+                try:
+                    self.add(fields[0], fields[1:])
+                except ValueError as e:
+                    logger.warning("%s:%d: %s", path, number, e)
+                    continue
+                loaded += 1
+        return loaded
+
+    def _lookup(self, address: str) -> Tags:
+        try:
+            if ":" in address:
+                value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big")
+                for length, table in self._probes[128]:
+                    tags = table.get(value >> (128 - length))
+                    if tags is not None:
+                        return tags
+                return ()
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+        except (OSError, TypeError):
+            return ()
+        lengths = self._v4_index.get(value >> 16)
+        if lengths:
+            tables = self._tables[32]
+            for length in lengths:
+                tags = tables[length].get(value >> (32 - length))
+                if tags is not None:
+                    return tags
+        for length, table in self._v4_short:
+            tags = table.get(value >> (32 - length))
+            if tags is not None:
+                return tags
+        return ()
+
+    def classify(self, event: Mapping[str, Any]) -> Tuple[Tags, Tags]:
+        """Tags of the event's (source, destination) addresses"""
+        return self.lookup(_address(event, SRC_FIELDS)), self.lookup(_address(event, DST_FIELDS))
+
+    def is_ignored(self, event: Mapping[str, Any]) -> bool:
+        src_tags, dst_tags = self.classify(event)
+        return IGNORE in src_tags or IGNORE in dst_tags
+
+    def template_fields(self, event: Mapping[str, Any]) -> Dict[str, Tags]:
+        """``src_tags``/``dst_tags`` fields read by the message templates"""
+        src_tags, dst_tags = self.classify(event)
+        return {"src_tags": src_tags, "dst_tags": dst_tags}
+
+    def stats(self) -> Dict[str, Any]:
+        info = self.lookup.cache_info()
+        return {
+            "prefixes": self.prefixes,
+            "prefix_lengths": {"ipv4": len(self._probes[32]), "ipv6": len(self._probes[128])},
+            "cache_size": info.currsize,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses
+        }
+
+
+def _address(event: Mapping[str, Any], fields: Tuple[str, ...]) -> str:
+    for field in fields:
+        value = event.get(field)
+        if not value and "." in field:
+            head, tail = field.split(".", 1)
+            nested = event.get(head)
+            value = nested.get(tail) if isinstance(nested, dict) else None
+        if value:
+            return str(value)
+    return ""
+
+
+def load_classifier(path: Optional[str], cache_size: int = 65536) -> NetworkClassifier:
+    """Classifier from ``path``, or the built-in broadcast/multicast prefixes if it does not exist"""
+    classifier = NetworkClassifier(cache_size)
+    if path and os.path.exists(path):
+        loaded = classifier.load(path)
+        logger.info("Loaded %d network prefixes from %s", loaded, path)
+    else:
+        for prefix, tags in DEFAULT_PREFIXES:
+            classifier.add(prefix, tags)
+    return classifier
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Offline backfill/replay of archived RouterOS syslog files into Elasticsearch.
+
+Parses lines with the same rules as logstash.conf (routeros.parse_line) and
+writes documents shaped like the ones Logstash indexes (``protocol``,
+``source_ip``, ``destination_port``, ``interface``, ``mac``...) to the daily
+``mikrotik-firewall-YYYY.MM.dd`` index of each line's own timestamp, instead
+of re-sending gigabytes over UDP.
+
+Plain files are mmap'd and split into chunks at line boundaries; each worker
+process maps its byte range itself, so only offsets cross the process
+boundary. Gzip files are decompressed in the main process and the chunks
+are passed to the workers. Workers parse, build the NDJSON ``_bulk`` body
+and gzip it; the main process keeps at most ``--in-flight`` bulk requests
+open. With ``--alerts`` the drops are also posted to the bridge's
+``/notify/batch``, so its filter, dedup and rate limit still apply.
+
+Accepted line formats (one per line):
+    Sep 21 12:34:56 192.168.88.1 firewall,info drop input: ...      (syslog file)
+    2025-09-21T12:34:56.123-03:00 192.168.88.1 firewall,info ...     (RFC 3339 syslog file)
+    sep/21/2025 12:34:56 firewall,info ...  |  2025-09-21 12:34:56 ... (RouterOS disk log, --host)
+    firewall,info drop input: ...                                    (bare line, --host and --time)
+
+Usage:
+    python replay.py /var/log/mikrotik/*.log.gz --workers 8
+    python replay.py log.0.txt --host 192.168.88.1 --utc-offset=-03:00 --alerts http://localhost:8081/notify/batch
+    python replay.py big.log --dry-run          # parse only, report lines/sec
+"""
+import argparse
+import gzip
+import logging
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+import codec
+from config import ELASTICSEARCH_URL, LOG_FORMAT, LOG_LEVEL
+from routeros import logstash_document, parse_line
+
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger("replay")
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+INDEX_PREFIX = "mikrotik-firewall"
+MONTHS = {name: index for index, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+# Optional <PRI>, then a syslog-file timestamp and host, or a RouterOS disk-log timestamp
+LINE_RE = re.compile(
+    r"^(?:<\d{1,3}>)?(?:"
+    r"(?P<bsd>[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (?P<bsd_host>\S+) "
+    r"|(?P<iso>\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d+)?(?:Z|[+-]\d\d:?\d\d)?) (?P<iso_host>\S+) "
+    r"|(?P<ros>[A-Za-z]{3}/\d\d/\d{4} \d\d:\d\d:\d\d|\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) "
+    r")"
+)
+
+
+class Options(NamedTuple):
+    host: Optional[str]
+    year: int
+    utc_offset: timezone
+    default_time: str
+    alerts: bool
+
+
+class ChunkResult(NamedTuple):
+    lines: int
+    documents: int
+    drops: int
+    bulk: Optional[bytes]  # gzip'd _bulk body
+    alerts: Optional[bytes]  # NDJSON for /notify/batch
+
+
+def format_utc(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class LineParser:
+    """Turns archived lines into Logstash-shaped documents (runs in the worker processes)"""
+
+    def __init__(self, options: Options):
+        self.options = options
+        self._timestamps: Dict[str, str] = {}
+
+    def timestamp(self, kind: str, value: str) -> str:
+        """ISO UTC @timestamp for a line timestamp.
+
+        Offsets are whole minutes, so for second-resolution formats only the
+        minute is converted (and cached) and the seconds are appended as is.
+        """
+        if kind == "iso":
+            cached = self._timestamps.get(value)
+            if cached is None:
+                moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                if moment.tzinfo is None:
+                    moment = moment.replace(tzinfo=self.options.utc_offset)
+                cached = self._cache(value, format_utc(moment))
+            return cached
+
+        # bsd "Sep 21 12:34:56", ros "2025-09-21 12:34:56" or "sep/21/2025 12:34:56"
+        minute, seconds = value[:-3], value[-2:]
+        cached = self._timestamps.get(minute)
+        if cached is None:
+            offset = self.options.utc_offset
+            if kind == "bsd":
+                moment = datetime(self.options.year, MONTHS[value[:3].lower()], int(value[4:6]),
+                                  int(value[7:9]), int(value[10:12]), tzinfo=offset)
+            elif value[4] == "-":
+                moment = datetime(int(value[:4]), int(value[5:7]), int(value[8:10]),
+                                  int(value[11:13]), int(value[14:16]), tzinfo=offset)
+            else:
+                moment = datetime(int(value[7:11]), MONTHS[value[:3].lower()], int(value[4:6]),
+                                  int(value[12:14]), int(value[15:17]), tzinfo=offset)
+            cached = self._cache(minute, format_utc(moment)[:17])
+        return f"{cached}{seconds}.000Z"
+
+    def _cache(self, key: str, value: str) -> str:
+        if len(self._timestamps) >= 100_000:
+            self._timestamps.clear()
+        self._timestamps[key] = value
+        return value
+
+    def parse(self, line: str) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """(Elasticsearch document, /notify event for drops or None) for one line"""
+        host = self.options.host
+        timestamp = self.options.default_time
+        match = LINE_RE.match(line)
+        if match:
+            kind = "bsd" if match.group("bsd") else "iso" if match.group("iso") else "ros"
+            try:
+                timestamp = self.timestamp(kind, match.group(kind))
+            except (KeyError, ValueError):
+                pass
+            host = match.group("bsd_host") or match.group("iso_host") or host
+            line = line[match.end():]
+        line = line.strip()
+        if not line:
+            return None
+
+        event = parse_line(line, host or "", timestamp)
+        document = logstash_document(line, host, timestamp, event)
+        if event is None or event["topic"] != "firewall_drop":
+            return document, None
+        return document, event
+
+
+_parser: Optional[LineParser] = None
+
+
+def init_worker(options: Options):
+    global _parser
+    _parser = LineParser(options)
+
+
+def read_chunk(task: Tuple) -> bytes:
+    if task[0] == "data":
+        return task[1]
+    _, path, start, end = task
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return mapped[start:end]
+
+
+def parse_chunk(task: Tuple) -> ChunkResult:
+    """Parse one chunk of lines into a gzip'd _bulk body (and alert NDJSON)"""
+    dumps = codec.dumps
+    bulk: List[bytes] = []
+    alerts: List[bytes] = []
+    actions: Dict[str, bytes] = {}
+    lines = drops = 0
+    send_alerts = _parser.options.alerts
+    for line in read_chunk(task).decode("utf-8", errors="replace").splitlines():
+        lines += 1
+        parsed = _parser.parse(line)
+        if parsed is None:
+            continue
+        document, event = parsed
+        day = document["@timestamp"][:10]
+        action = actions.get(day)
+        if action is None:
+            index = f"{INDEX_PREFIX}-{day.replace('-', '.')}"
+            action = actions[day] = dumps({"index": {"_index": index}})
+        bulk.append(action)
+        bulk.append(dumps(document))
+        if event is not None:
+            drops += 1
+            if send_alerts:
+                alerts.append(dumps(event))
+    documents = len(bulk) // 2
+    body = gzip.compress(b"\n".join(bulk) + b"\n", compresslevel=1) if bulk else None
+    return ChunkResult(lines, documents, drops, body, b"\n".join(alerts) + b"\n" if alerts else None)
+
+
+def file_chunks(path: str, chunk_bytes: int) -> Iterator[Tuple]:
+    """Tasks covering a file: byte ranges for plain files, decompressed blocks for gzip"""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            rest = b""
+            while True:
+                block = f.read(chunk_bytes)
+                if not block:
+                    break
+                block = rest + block
+                cut = block.rfind(b"\n") + 1
+                if cut == 0:
+                    rest = block
+                    continue
+                rest = block[cut:]
+                yield ("data", block[:cut])
+            if rest:
+                yield ("data", rest)
+        return
+
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        start = 0
+        while start < size:
+            end = mapped.find(b"\n", min(start + chunk_bytes, size) - 1)
+            end = size if end < 0 else end + 1
+            yield ("file", path, start, end)
+            start = end
+
+
+class Replayer:
+    """Feeds parsed chunks to Elasticsearch (and the bridge) with bounded concurrency"""
+
+    RETRIES = 5
+
+    def __init__(self, es_url: str, alerts_url: Optional[str], in_flight: int, dry_run: bool):
+        self.es_url = es_url.rstrip("/")
+        self.alerts_url = alerts_url
+        self.dry_run = dry_run
+        self.client = httpx.Client(timeout=120.0, limits=httpx.Limits(max_connections=in_flight * 2))
+        self.senders = ThreadPoolExecutor(max_workers=in_flight)
+        self.slots = threading.BoundedSemaphore(in_flight)
+        self.lock = threading.Lock()
+        self.lines = self.documents = self.drops = 0
+        self.failed = self.alerts_sent = self.alerts_failed = 0
+
+    def _post(self, url: str, body: bytes, headers: Dict[str, str]) -> Optional[httpx.Response]:
+        delay = 1.0
+        for attempt in range(self.RETRIES):
+            try:
+                response = self.client.post(url, content=body, headers=headers)
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                logger.warning("%s answered %s, retrying in %.0fs", url, response.status_code, delay)
+            except httpx.HTTPError as e:
+                logger.warning("%s failed (%s), retrying in %.0fs", url, e, delay)
+            time.sleep(delay)
+            delay *= 2
+        return None
+
+    def _send(self, result: ChunkResult, accounted: Dict[str, bool]):
+        """POST one chunk; ``accounted`` records the parts already counted, for ``_on_done``"""
+        try:
+            if result.bulk is not None:
+                response = self._post(f"{self.es_url}/_bulk?filter_path=errors,items.*.error", result.bulk,
+                                      {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+                failed = result.documents
+                if response is not None and response.status_code == 200:
+                    body = codec.loads(response.content)
+                    failed = sum(1 for item in body.get("items", ())
+                                 if any("error" in action for action in item.values()))
+                elif response is not None:
+                    logger.error("Bulk rejected: %s %s", response.status_code, response.text[:200])
+                with self.lock:
+                    self.failed += failed
+                accounted["bulk"] = True
+            if result.alerts is not None and self.alerts_url:
+                response = self._post(self.alerts_url, result.alerts, {"Content-Type": "application/x-ndjson"})
+                with self.lock:
+                    count = result.alerts.count(b"\n")
+                    if response is not None and response.status_code == 200:
+                        self.alerts_sent += count
+                    else:
+                        self.alerts_failed += count
+                accounted["alerts"] = True
+        finally:
+            self.slots.release()
+
+    def _on_done(self, result: ChunkResult, accounted: Dict[str, bool], future: "Future[None]"):
+        """Count the parts of a chunk whose send raised as failed, so the summary never overstates"""
+        error = future.exception()
+        if error is None:
+            return
+        logger.error("Sending a chunk of %d documents failed: %s: %s", result.documents, type(error).__name__, error)
+        with self.lock:
+            if result.bulk is not None and not accounted.get("bulk"):
+                self.failed += result.documents
+            if result.alerts is not None and self.alerts_url and not accounted.get("alerts"):
+                self.alerts_failed += result.alerts.count(b"\n")
+
+    def submit(self, result: ChunkResult):
+        self.lines += result.lines
+        self.documents += result.documents
+        self.drops += result.drops
+        if self.dry_run:
+            return
+        self.slots.acquire()  # blocks while --in-flight requests are open
+        accounted: Dict[str, bool] = {}
+        future = self.senders.submit(self._send, result, accounted)
+        future.add_done_callback(lambda future: self._on_done(result, accounted, future))
+
+    def close(self):
+        self.senders.shutdown(wait=True)
+        self.client.close()
+
+
+def replay(paths: List[str], options: Options, es_url: str = ELASTICSEARCH_URL,
+           alerts_url: Optional[str] = None, workers: int = os.cpu_count() or 1,
+           chunk_bytes: int = 2 * 1024 * 1024, in_flight: int = 4, dry_run: bool = False,
+           progress_every: float = 5.0) -> Dict[str, Any]:
+    """Replay files and return the counters (lines, documents, drops, failed...)"""
+    replayer = Replayer(es_url, alerts_url if options.alerts else None, in_flight, dry_run)
+    started = last_report = time.perf_counter()
+    pending: List[Future] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(options,)) as pool:
+        def drain(keep: int):
+            nonlocal last_report
+            while len(pending) > keep:
+                replayer.submit(pending.pop(0).result())
+                now = time.perf_counter()
+                if progress_every and now - last_report >= progress_every:
+                    last_report = now
+                    logger.info("%d lines, %.0f lines/s", replayer.lines, replayer.lines / (now - started))
+
+        for path in paths:
+            for task in file_chunks(path, chunk_bytes):
+                pending.append(pool.submit(parse_chunk, task))
+                # Bounded read-ahead: at most two chunks per worker in memory
+                drain(workers * 2)
+        drain(0)
+    replayer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "files": len(paths),
+        "lines": replayer.lines,
+        "documents": replayer.documents,
+        "drops": replayer.drops,
+        "failed": replayer.failed,
+        "alerts_sent": replayer.alerts_sent,
+        "alerts_failed": replayer.alerts_failed,
+        "seconds": round(elapsed, 3),
+        "lines_per_second": round(replayer.lines / elapsed) if elapsed else 0
+    }
+
+
+def parse_offset(value: str) -> timezone:
+    sign = -1 if value.startswith("-") else 1
+    hours, _, minutes = value.lstrip("+-").partition(":")
+    return timezone(sign * timedelta(hours=int(hours), minutes=int(minutes or 0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay archived RouterOS syslog files into Elasticsearch",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("files", nargs="+", help="plain or .gz syslog files")
+    parser.add_argument("--es-url", default=ELASTICSEARCH_URL)
+    parser.add_argument("--host", help="router address for lines without a host field")
+    parser.add_argument("--year", type=int, default=datetime.now().year,
+                        help="year of 'Sep 21 12:34:56' timestamps (default: current)")
+    parser.add_argument("--utc-offset", default="+00:00", help="zone of timestamps without one, e.g. --utc-offset=-03:00")
+    parser.add_argument("--time", help="ISO @timestamp for lines without a timestamp (default: now)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--chunk-mb", type=float, default=2.0, help="input MB per parse task / bulk request")
+    parser.add_argument("--in-flight", type=int, default=4, help="concurrent _bulk requests")
+    parser.add_argument("--alerts", metavar="URL", help="also post drops to the bridge (/notify/batch)")
+    parser.add_argument("--dry-run", action="store_true", help="parse only, do not write")
+    args = parser.parse_args()
+
+    utc_offset = parse_offset(args.utc_offset)
+    if args.time:
+        moment = datetime.fromisoformat(args.time.replace("Z", "+00:00"))
+        default_time = format_utc(moment if moment.tzinfo else moment.replace(tzinfo=utc_offset))
+    else:
+        default_time = format_utc(datetime.now(timezone.utc))
+    options = Options(args.host, args.year, utc_offset, default_time, bool(args.alerts))
+
+    stats = replay(args.files, options, es_url=args.es_url, alerts_url=args.alerts, workers=args.workers,
+                   chunk_bytes=int(args.chunk_mb * 1024 * 1024), in_flight=args.in_flight, dry_run=args.dry_run)
+    print(codec.dumps(stats).decode())
+    sys.exit(1 if stats["failed"] or stats["alerts_failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
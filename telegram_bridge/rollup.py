@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Drop rollup worker: per-minute counts of firewall drops for Grafana.
+
+Reads new ``mikrotik-firewall-*`` documents in time order (point in time +
+``search_after``), counts them per minute by (host, interface, protocol,
+destination port, source /24) and bulk-writes one document per group to the
+monthly ``mikrotik-rollup-YYYY.MM`` index. Dashboards aggregate ``count``
+over thousands of rollup documents instead of millions of raw ones.
+
+Time is processed in whole-minute ranges that end ``ROLLUP_LAG`` seconds in
+the past, so late events are still counted. Rollup document ids are derived
+from the minute and the group, so re-running a range overwrites the same
+documents instead of double counting; the checkpoint (end of the last
+completed range) is only saved after its bulk writes succeeded. Usage:
+
+    python rollup.py run                                  # incremental worker
+    python rollup.py backfill --start 2025-09-01 [--end 2025-09-21T12:00]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+import codec
+from config import *
+
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger("rollup")
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MINUTE = 60
+SOURCE_FIELDS = ["@timestamp", "host", "interface", "protocol", "destination_port", "source_ip"]
+DROP_FILTER = {"term": {"topic.keyword": "firewall_drop"}}
+
+# (minute, host, interface, protocol, destination_port, source_net)
+GroupKey = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[int], Optional[str]]
+
+ROLLUP_TEMPLATE = {
+    "index_patterns": [f"{ROLLUP_INDEX_PREFIX}-*"],
+    "template": {
+        "settings": {"number_of_shards": 1, "number_of_replicas": 0},
+        "mappings": {
+            "dynamic": False,
+            "properties": {
+                "@timestamp": {"type": "date"},
+                "host": {"type": "keyword"},
+                "interface": {"type": "keyword"},
+                "protocol": {"type": "keyword"},
+                "destination_port": {"type": "integer"},
+                "source_net": {"type": "keyword"},
+                "count": {"type": "long"}
+            }
+        }
+    }
+}
+
+
+def source_net(ip: Any) -> Optional[str]:
+    """IPv4 /24 (IPv6 /64) of a source address"""
+    if not isinstance(ip, str) or not ip:
+        return None
+    if "." in ip and ":" not in ip:
+        return ip.rsplit(".", 1)[0] + ".0/24"
+    if ":" in ip:
+        groups = ip.split("::", 1)[0].split(":")[:4]
+        return ":".join(groups) + "::/64"
+    return None
+
+
+def group_key(doc: Dict[str, Any]) -> Optional[GroupKey]:
+    """Rollup group of one raw document, None without a usable @timestamp"""
+    timestamp = doc.get("@timestamp")
+    if not isinstance(timestamp, str) or len(timestamp) < 16:
+        return None
+    host = doc.get("host")
+    if isinstance(host, dict):
+        host = host.get("ip") or host.get("name")
+    port = doc.get("destination_port")
+    try:
+        port = int(port) if port is not None else None
+    except (TypeError, ValueError):
+        port = None
+    # Logstash writes UTC ("...T12:34:56.789Z"), so the minute is a string prefix
+    return (timestamp[:16] + ":00Z", host if isinstance(host, str) else None,
+            doc.get("interface"), doc.get("protocol"), port, source_net(doc.get("source_ip")))
+
+
+def rollup_actions(counts: Counter) -> Iterator[bytes]:
+    """Bulk index actions (NDJSON lines) for one range of counts"""
+    for key, count in counts.items():
+        minute, host, interface, protocol, port, net = key
+        doc_id = hashlib.md5(repr(key).encode()).hexdigest()
+        index = f"{ROLLUP_INDEX_PREFIX}-{minute[:4]}.{minute[5:7]}"
+        doc = {"@timestamp": minute, "count": count}
+        for field, value in (("host", host), ("interface", interface), ("protocol", protocol),
+                             ("destination_port", port), ("source_net", net)):
+            if value is not None:
+                doc[field] = value
+        yield codec.dumps({"index": {"_index": index, "_id": doc_id}})
+        yield codec.dumps(doc)
+
+
+class RollupWorker:
+    """Scans raw drop documents range by range and writes their rollups"""
+
+    def __init__(self, es_url: str = ELASTICSEARCH_URL, source_index: str = ROLLUP_SOURCE_INDEX,
+                 checkpoint_path: str = ROLLUP_CHECKPOINT, page_size: int = ROLLUP_PAGE_SIZE,
+                 bulk_size: int = ROLLUP_BULK_SIZE, chunk_minutes: int = ROLLUP_CHUNK_MINUTES):
+        self.client = httpx.Client(base_url=es_url.rstrip("/"), timeout=60.0)
+        self.source_index = source_index
+        self.checkpoint_path = checkpoint_path
+        self.page_size = page_size
+        self.bulk_size = bulk_size
+        self.chunk = chunk_minutes * MINUTE
+        self.scanned = 0
+        self.written = 0
+
+    def close(self):
+        self.client.close()
+
+    def _request(self, method: str, url: str, body: Any = None, content: Optional[bytes] = None,
+                 content_type: str = "application/json") -> Dict[str, Any]:
+        if body is not None:
+            content = codec.dumps(body)
+        response = self.client.request(method, url, content=content, headers={"Content-Type": content_type})
+        response.raise_for_status()
+        return codec.loads(response.content)
+
+    def ensure_template(self):
+        """Create or update the index template of the rollup indices"""
+        self._request("PUT", f"/_index_template/{ROLLUP_INDEX_PREFIX}", ROLLUP_TEMPLATE)
+
+    def load_checkpoint(self) -> Optional[int]:
+        """Start of the next interval, None without a usable checkpoint (the caller then looks back)"""
+        try:
+            with open(self.checkpoint_path) as f:
+                return int(json.load(f)["until"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            # Empty, truncated or hand-edited: the rollup IDs are deterministic, so redoing
+            # the lookback window overwrites documents instead of double counting
+            logger.error("Ignoring unreadable checkpoint %s (%s: %s), starting ROLLUP_INITIAL_LOOKBACK seconds back",
+                         self.checkpoint_path, type(e).__name__, e)
+            return None
+
+    def save_checkpoint(self, until: int):
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"until": until, "until_iso": iso(until)}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def scan(self, start: int, end: int) -> Iterator[Dict[str, Any]]:
+        """Raw drop documents with start <= @timestamp < end (epoch seconds), oldest first"""
+        pit = self._request("POST", f"/{self.source_index}/_pit?keep_alive=2m&ignore_unavailable=true")["id"]
+        query = {
+            "size": self.page_size,
+            "_source": SOURCE_FIELDS,
+            "query": {"bool": {"filter": [
+                {"range": {"@timestamp": {"gte": start * 1000, "lt": end * 1000, "format": "epoch_millis"}}},
+                DROP_FILTER
+            ]}},
+            "sort": [{"@timestamp": "asc"}, {"_shard_doc": "asc"}],
+            "track_total_hits": False
+        }
+        try:
+            while True:
+                query["pit"] = {"id": pit, "keep_alive": "2m"}
+                result = self._request("POST", "/_search", query)
+                pit = result.get("pit_id", pit)
+                hits = result["hits"]["hits"]
+                for hit in hits:
+                    yield hit["_source"]
+                if len(hits) < self.page_size:
+                    break
+                query["search_after"] = hits[-1]["sort"]
+        finally:
+            try:
+                self._request("DELETE", "/_pit", {"id": pit})
+            except httpx.HTTPError:
+                pass
+
+    def write(self, counts: Counter):
+        """Bulk-write rollup documents, raising if any action failed"""
+        lines: List[bytes] = []
+        for line in rollup_actions(counts):
+            lines.append(line)
+            if len(lines) >= self.bulk_size * 2:
+                self._bulk(lines)
+                lines = []
+        if lines:
+            self._bulk(lines)
+
+    def _bulk(self, lines: List[bytes]):
+        result = self._request("POST", "/_bulk", content=b"\n".join(lines) + b"\n",
+                               content_type="application/x-ndjson")
+        if result.get("errors"):
+            failed = [item["index"]["error"] for item in result["items"] if "error" in item["index"]]
+            raise RuntimeError(f"{len(failed)} rollup documents failed, first: {failed[0]}")
+        self.written += len(lines) // 2
+
+    def process(self, start: int, end: int):
+        """Roll up [start, end) in chunks; counts for one chunk are held in memory at a time"""
+        while start < end:
+            chunk_end = min(start + self.chunk, end)
+            counts: Counter = Counter()
+            for doc in self.scan(start, chunk_end):
+                self.scanned += 1
+                key = group_key(doc)
+                if key is not None:
+                    counts[key] += 1
+            self.write(counts)
+            logger.info("Rolled up %s .. %s: %d groups", iso(start), iso(chunk_end), len(counts))
+            yield chunk_end
+            start = chunk_end
+
+    def run_once(self, now: Optional[float] = None) -> int:
+        """Process everything between the checkpoint and now - ROLLUP_LAG; returns the new checkpoint"""
+        end = floor_minute((time.time() if now is None else now) - ROLLUP_LAG)
+        start = self.load_checkpoint()
+        if start is None:
+            start = floor_minute(end - ROLLUP_INITIAL_LOOKBACK)
+        for until in self.process(start, end):
+            self.save_checkpoint(until)
+        return max(start, end)
+
+    def run(self):
+        self.ensure_template()
+        while True:
+            try:
+                self.run_once()
+            except (httpx.HTTPError, RuntimeError, KeyError) as e:
+                logger.error("Rollup failed, retrying next cycle: %s", e)
+            time.sleep(ROLLUP_INTERVAL)
+
+
+def floor_minute(timestamp: float) -> int:
+    return int(timestamp // MINUTE * MINUTE)
+
+
+def iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_time(value: str) -> int:
+    """ISO date/datetime (UTC unless an offset is given) -> epoch seconds on a minute"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return floor_minute(parsed.timestamp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-minute drop rollups for Grafana",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="incremental worker (follows the checkpoint)")
+    backfill = commands.add_parser("backfill", help="roll up a past time range (checkpoint untouched)")
+    backfill.add_argument("--start", required=True, help="ISO date/datetime, UTC")
+    backfill.add_argument("--end", help="ISO date/datetime, UTC (default: now - ROLLUP_LAG)")
+    args = parser.parse_args()
+
+    worker = RollupWorker()
+    try:
+        if args.command == "run":
+            worker.run()
+        else:
+            worker.ensure_template()
+            start = parse_time(args.start)
+            end = parse_time(args.end) if args.end else floor_minute(time.time() - ROLLUP_LAG)
+            started = time.perf_counter()
+            for _ in worker.process(start, end):
+                pass
+            elapsed = time.perf_counter() - started
+            print(f"{worker.scanned:,} documents -> {worker.written:,} rollup documents in {elapsed:.1f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""RouterOS syslog line parsing (precompiled equivalents of the logstash.conf grok rules)"""
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional
+
+# if [message] =~ /(?i)\bdrop\b/
+DROP_RE = re.compile(r"(?i)\bdrop\b")
+# proto %{WORD:protocol}.*?%{IPORHOST:source_ip}:%{POSINT:source_port}->%{IPORHOST:destination_ip}:%{POSINT:destination_port}
+CONNECTION_RE = re.compile(
+    r"proto (?P<proto>\w+).*?"
+    r"(?P<srcip>[\w.:\-\[\]]+?):(?P<srcport>[1-9]\d*)->"
+    r"(?P<dstip>[\w.:\-\[\]]+?):(?P<dstport>[1-9]\d*)"
+)
+# in:(?<interface>[^ ]+)
+INTERFACE_RE = re.compile(r"in:(?P<in_interface>[^ ]+)")
+# src-mac (?<mac>%{COMMONMAC})
+MAC_RE = re.compile(r"src-mac (?P<src_mac>(?:[0-9A-Fa-f]{2}[:-]){5}[0-9A-Fa-f]{2})")
+# if [message] =~ /dns,packet/
+DNS_RE = re.compile(r"dns,packet")
+
+# Bridge field -> field name in the Logstash documents
+LOGSTASH_FIELDS = {
+    "proto": "protocol",
+    "srcip": "source_ip",
+    "srcport": "source_port",
+    "dstip": "destination_ip",
+    "dstport": "destination_port",
+    "in_interface": "interface",
+    "src_mac": "mac",
+}
+TAG_FIELDS = ("topic", "action", "priority", "alert_type", "severity")
+
+
+def utc_timestamp() -> str:
+    """Current time in the ISO format Logstash uses for @timestamp"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def parse_line(line: str, host: str, timestamp: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Parse one RouterOS syslog line into the fields the pipeline produces.
+
+    Returns the event with the same keys Logstash sends to ``/notify`` (``srcip``,
+    ``dstport``, ``in_interface``...) for firewall drops and DNS events, or
+    None for lines the pipeline does not tag.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    event: Dict[str, Any] = {
+        "@timestamp": timestamp or utc_timestamp(),
+        "host": host,
+        "message": line
+    }
+
+    if DROP_RE.search(line):
+        match = CONNECTION_RE.search(line)
+        if match:
+            event.update(match.groupdict())
+            match = INTERFACE_RE.search(line)
+            if match:
+                event["in_interface"] = match.group("in_interface")
+            match = MAC_RE.search(line)
+            if match:
+                event["src_mac"] = match.group("src_mac")
+        event.update(topic="firewall_drop", action="Drop", priority="high",
+                     alert_type="firewall_drop", severity="info")
+        return event
+
+    if DNS_RE.search(line):
+        event.update(topic="dns_event", severity="info", priority="medium",
+                     alert_type="dns_event", action="DNS_Query")
+        return event
+
+    return None
+
+
+def logstash_document(line: str, host: Optional[str], timestamp: str,
+                      event: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """The document Logstash indexes for a line, given its parse_line event (None for untagged lines).
+
+    Field names follow the grok captures (``protocol``, ``source_ip``,
+    ``interface``, ``mac``...) so documents written by the bridge land next
+    to the ones written by Logstash in the same indices.
+    """
+    document: Dict[str, Any] = {"@timestamp": timestamp, "message": line, "type": "mikrotik_firewall"}
+    if host:
+        document["host"] = {"ip": host}
+    if event is None:
+        return document
+
+    for field in TAG_FIELDS:
+        value = event.get(field)
+        if value is not None:
+            document[field] = value
+    if event.get("topic") != "firewall_drop":
+        return document
+    if event.get("srcip"):
+        for field, name in LOGSTASH_FIELDS.items():
+            value = event.get(field)
+            if value is not None:
+                document[name] = value
+        document["source"] = f"{event['srcip']}:{event.get('srcport')}"
+        document["destination"] = f"{event.get('dstip')}:{event.get('dstport')}"
+        document["tags"] = ["firewall_parsed_main"]
+    else:
+        document["tags"] = ["_grokparsefailure"]
+    return document
@@ -0,0 +1,339 @@
+"""Declarative alert rules compiled into Python predicates, per entry point ("scope")"""
+import fnmatch
+import json
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_LEVELS = ("critical", "error", "warning", "info", "system", "firewall")
+SEVERITY_RANK = {level: index for index, level in enumerate(SEVERITY_LEVELS)}
+
+# Rule field -> alias paths, like the template field specs
+FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "topic": ("topic",),
+    "action": ("action",),
+    "alert_type": ("alert_type",),
+    "severity": ("severity",),
+    "priority": ("priority",),
+    "host": ("host", "host.ip", "host.name"),
+    "interface": ("in_interface", "interface"),
+    "proto": ("proto", "protocol"),
+    "srcip": ("srcip", "src_ip", "source.ip"),
+    "dstip": ("dstip", "dst_ip", "destination.ip"),
+    "srcport": ("srcport", "src_port", "source_port", "source.port"),
+    "dstport": ("dstport", "dst_port", "destination_port", "destination.port"),
+    "message": ("message",),
+}
+PORT_FIELDS = ("srcport", "dstport")
+
+# Relative cost of one condition, used to order the conditions of a rule
+COST = {"equals": 1, "min_severity": 1, "ports": 2, "pattern": 3, "regex": 8, "regex_any": 12}
+
+# Every PROFILE_EVERY-th evaluation times each rule; after REORDER_EVERY such
+# samples the rules are re-sorted by observed match rate per nanosecond
+PROFILE_EVERY = 64
+REORDER_EVERY = 256
+
+# Built-in rules: the filters the bridge used before rule files existed
+DEFAULT_RULES: Dict[str, List[Dict[str, Any]]] = {
+    # /notify and /notify/batch: severity at least info (unknown severities pass)
+    "notify": [{"name": "min-severity", "match": {"min_severity": "info"}}],
+    # Syslog listener: same condition as the Logstash http output
+    "syslog": [{"name": "firewall-drop", "match": {"topic": "firewall_drop", "action": "Drop",
+                                                   "min_severity": "info"}}],
+    # /drop-forward: "drop" in any string value of the body
+    "drop_forward": [{"name": "drop-word", "match": {"regex_any": {"fields": "*", "pattern": "(?i)drop"}}}],
+    # alerts.py: action Drop, or "drop" in the message
+    "alerts": [
+        {"name": "drop-action", "match": {"regex": {"action": "(?i)^drop$"}}},
+        {"name": "drop-message", "match": {"regex_any": {"fields": ["debug_message", "message"],
+                                                         "pattern": "(?i)drop"}}},
+    ],
+}
+
+
+def _lookup_source(name: str) -> str:
+    """Expression reading a rule field (or a raw event key) from ``event``"""
+    lookups = []
+    paths = FIELD_ALIASES.get(name, (name,))
+    for path in paths:
+        if len(paths) > 1:
+            # A dict (Logstash's host: {"ip": ...}) is not a value: fall through to the dotted aliases
+            lookups.append(f"(_f if type(_f := event.get({path!r})) is not dict else None)")
+        else:
+            lookups.append(f"event.get({path!r})")
+        if "." in path:
+            head, tail = path.split(".", 1)
+            lookups.append(f"(event[{head!r}].get({tail!r}) if type(event.get({head!r})) is dict else None)")
+    return " or ".join(lookups)
+
+
+def _values(value: Any) -> List[str]:
+    return [str(item) for item in value] if isinstance(value, (list, tuple)) else [str(value)]
+
+
+def parse_ports(value: Any) -> Callable[[Any], bool]:
+    """'22,80,8000-8100' (or a list) -> predicate on a port value"""
+    singles = set()
+    ranges = []
+    for part in ",".join(_values(value)).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            low, high = part.split("-", 1)
+            ranges.append((int(low), int(high)))
+        else:
+            singles.add(int(part))
+    # Small ranges are expanded so most checks are one set lookup
+    for low, high in [r for r in ranges if r[1] - r[0] < 4096]:
+        singles.update(range(low, high + 1))
+        ranges.remove((low, high))
+    singles = frozenset(singles)
+
+    def check(port: Any) -> bool:
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            return False
+        if port in singles:
+            return True
+        return any(low <= port <= high for low, high in ranges)
+    return check
+
+
+class Rule:
+    """One compiled rule: a generated function that is True when every condition matches.
+
+    Conditions are emitted cheapest first, so the common early exits (an
+    equality or a severity rank) happen before any regex runs.
+    """
+
+    def __init__(self, scope: str, index: int, spec: Mapping[str, Any]):
+        self.name = str(spec.get("name") or f"{scope}-{index}")
+        self.action = spec.get("action", "alert")
+        if self.action not in ("alert", "ignore"):
+            raise ValueError(f"rule {self.name}: action must be 'alert' or 'ignore'")
+        match = spec.get("match") or {}
+        if not isinstance(match, dict):
+            raise ValueError(f"rule {self.name}: match must be a mapping")
+        namespace: Dict[str, Any] = {"_ranks": SEVERITY_RANK}
+        conditions = self._conditions(match, namespace)
+        conditions.sort(key=lambda condition: condition[0])
+        self.cost = sum(cost for cost, _ in conditions) or 1
+        lines = ["def predicate(event):"]
+        for _, test in conditions:
+            lines.append(f"    if not ({test}): return False")
+        lines.append("    return True")
+        self.source = "\n".join(lines) + "\n"
+        exec(compile(self.source, f"<rule {self.name}>", "exec"), namespace)
+        self.predicate: Callable[[Mapping[str, Any]], bool] = namespace["predicate"]
+        self.hits = 0
+        self.samples = 0
+        self.sample_hits = 0
+        self.sample_ns = 0
+
+    def _conditions(self, match: Mapping[str, Any], namespace: Dict[str, Any]) -> List[Tuple[int, str]]:
+        conditions = []
+        for key, value in match.items():
+            name = f"_c{len(namespace)}"
+            if key == "min_severity":
+                level = str(value).lower()
+                if level not in SEVERITY_RANK:
+                    raise ValueError(f"rule {self.name}: unknown severity {value!r}")
+                # Unknown severities pass, like the old filter
+                conditions.append((COST["min_severity"], f"_ranks.get(str({_lookup_source('severity')} or '')"
+                                                          f".lower(), -1) <= {SEVERITY_RANK[level]}"))
+            elif key == "regex":
+                if not isinstance(value, dict):
+                    raise ValueError(f"rule {self.name}: regex must map fields to patterns")
+                for field, pattern in value.items():
+                    name = f"_c{len(namespace)}"
+                    namespace[name] = re.compile(pattern).search
+                    conditions.append((COST["regex"], f"(v := {_lookup_source(field)}) is not None "
+                                                      f"and {name}(str(v)) is not None"))
+            elif key == "regex_any":
+                if not isinstance(value, dict) or "pattern" not in value or not value.get("fields"):
+                    raise ValueError(f"rule {self.name}: regex_any needs fields and pattern")
+                namespace[name] = re.compile(value["pattern"]).search
+                if value["fields"] == "*":
+                    # Every top-level string value; numbers, lists and nested objects are skipped
+                    conditions.append((COST["regex_any"], f"any(type(v) is str and {name}(v) is not None "
+                                                          f"for v in event.values())"))
+                    continue
+                tests = [f"((v := {_lookup_source(field)}) is not None and {name}(str(v)) is not None)"
+                         for field in value["fields"]]
+                conditions.append((COST["regex_any"], " or ".join(tests)))
+            elif key in PORT_FIELDS:
+                namespace[name] = parse_ports(value)
+                conditions.append((COST["ports"], f"{name}({_lookup_source(key)})"))
+            elif key in FIELD_ALIASES:
+                values = _values(value)
+                if any(char in item for item in values for char in "*?["):
+                    namespace[name] = re.compile("|".join(fnmatch.translate(item) for item in values)).match
+                    conditions.append((COST["pattern"], f"(v := {_lookup_source(key)}) is not None "
+                                                        f"and {name}(str(v)) is not None"))
+                else:
+                    namespace[name] = frozenset(values)
+                    conditions.append((COST["equals"], f"str({_lookup_source(key)}) in {name}"))
+            else:
+                raise ValueError(f"rule {self.name}: unknown match key {key!r}")
+        return conditions
+
+    @property
+    def score(self) -> float:
+        """Expected matches per nanosecond: rules that decide most often, cheapest, go first"""
+        rate = (self.sample_hits + 1) / (self.samples + 2)
+        cost = self.sample_ns / self.samples if self.samples else self.cost * 100
+        return rate / max(cost, 1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "action": self.action,
+            "hits": self.hits,
+            "sampled": self.samples,
+            "sampled_match_rate": round(self.sample_hits / self.samples, 4) if self.samples else None,
+            "avg_eval_ns": round(self.sample_ns / self.samples) if self.samples else None,
+        }
+
+
+class RuleSet:
+    """Rules of one scope. ``ignore`` rules are checked first, then ``alert`` rules.
+
+    An event is accepted when no ignore rule matches and some alert rule
+    does (or the scope has no alert rules). Both lists are OR-ed, so their
+    order does not change the outcome and they are kept sorted by observed
+    selectivity: a rule that matches often and cheaply is tried first.
+    """
+
+    def __init__(self, scope: str, specs: Sequence[Mapping[str, Any]]):
+        self.scope = scope
+        rules = [Rule(scope, index, spec) for index, spec in enumerate(specs)]
+        names = [rule.name for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"scope {scope}: rule names must be unique")
+        # Static order until there are samples: cheapest first
+        self.ignore = sorted((rule for rule in rules if rule.action == "ignore"), key=lambda rule: rule.cost)
+        self.alert = sorted((rule for rule in rules if rule.action == "alert"), key=lambda rule: rule.cost)
+        self.rules = rules
+        self.evaluations = 0
+        self.profiled = 0
+        self.reorders = 0
+
+    def decide(self, event: Mapping[str, Any]) -> Tuple[bool, Optional[Rule]]:
+        """(accepted, deciding rule): the ignore rule that matched, or the alert rule that matched"""
+        self.evaluations += 1
+        if not self.evaluations % PROFILE_EVERY:
+            return self._decide_profiled(event)
+        for rule in self.ignore:
+            if rule.predicate(event):
+                rule.hits += 1
+                return False, rule
+        if not self.alert:
+            return True, None
+        for rule in self.alert:
+            if rule.predicate(event):
+                rule.hits += 1
+                return True, rule
+        return False, None
+
+    def _decide_profiled(self, event: Mapping[str, Any]) -> Tuple[bool, Optional[Rule]]:
+        """Same decision, but every rule is timed so match rates and costs can be learned"""
+        matched: Dict[str, Optional[Rule]] = {"ignore": None, "alert": None}
+        perf_counter_ns = time.perf_counter_ns
+        for rule in self.rules:
+            started = perf_counter_ns()
+            result = rule.predicate(event)
+            rule.sample_ns += perf_counter_ns() - started
+            rule.samples += 1
+            if result:
+                rule.sample_hits += 1
+                if matched[rule.action] is None:
+                    matched[rule.action] = rule
+        self.profiled += 1
+        if not self.profiled % REORDER_EVERY:
+            self.reorder()
+        decision: Tuple[bool, Optional[Rule]]
+        if matched["ignore"] is not None:
+            decision = (False, matched["ignore"])
+        elif not self.alert:
+            decision = (True, None)
+        else:
+            decision = (matched["alert"] is not None, matched["alert"])
+        if decision[1] is not None:
+            decision[1].hits += 1
+        return decision
+
+    def reorder(self):
+        # New lists swapped in by assignment: other threads (alerts.py) may be iterating the old ones
+        self.ignore = sorted(self.ignore, key=lambda rule: rule.score, reverse=True)
+        self.alert = sorted(self.alert, key=lambda rule: rule.score, reverse=True)
+        self.reorders += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "evaluations": self.evaluations,
+            "reorders": self.reorders,
+            "order": [rule.name for rule in self.ignore + self.alert],
+            "rules": {rule.name: rule.stats() for rule in self.rules},
+        }
+
+
+class RuleEngine:
+    """Rule sets per scope, loaded from RULES_FILE (JSON or YAML) or the built-in defaults.
+
+    Scopes missing from the file keep their default rules. ``reload``
+    compiles the file again and only swaps the rule sets in if every rule
+    compiled, so a bad edit never leaves the bridge without filters.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or None
+        self.scopes: Dict[str, RuleSet] = {}
+        self.loaded_at = 0.0
+        self.reload()
+
+    def _read(self) -> Dict[str, Any]:
+        if not self.path:
+            return {}
+        with open(self.path) as f:
+            if self.path.endswith((".yml", ".yaml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RuntimeError("PyYAML is needed for YAML rule files (or use JSON)") from None
+                data = yaml.safe_load(f) or {}
+            else:
+                data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path}: expected a mapping of scope -> rules")
+        return data.get("rules", data)
+
+    def reload(self) -> Dict[str, int]:
+        """Compile the rules again; returns rules per scope, raises (keeping the old rules) on errors"""
+        specs = {**DEFAULT_RULES, **self._read()}
+        scopes = {scope: RuleSet(scope, rules or []) for scope, rules in specs.items()}
+        self.scopes = scopes
+        self.loaded_at = time.time()
+        counts = {scope: len(rule_set.rules) for scope, rule_set in scopes.items()}
+        logger.info("Loaded rules from %s: %s", self.path or "built-in defaults", counts)
+        return counts
+
+    def decide(self, scope: str, event: Mapping[str, Any]) -> Tuple[bool, Optional[Rule]]:
+        rule_set = self.scopes.get(scope)
+        if rule_set is None:
+            return True, None
+        return rule_set.decide(event)
+
+    def allows(self, scope: str, event: Mapping[str, Any]) -> bool:
+        return self.decide(scope, event)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "file": self.path,
+            "loaded_at": self.loaded_at,
+            "scopes": {scope: rule_set.stats() for scope, rule_set in self.scopes.items()},
+        }
@@ -0,0 +1,263 @@
+"""Port-scan and sweep detection: distinct (dstip, dstport) per source with fixed-size sketches"""
+import heapq
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# Alias lists, like the template field specs
+SRC_FIELDS = ("srcip", "src_ip")
+DST_FIELDS = ("dstip", "dst_ip")
+PORT_FIELDS = ("dstport", "dst_port")
+
+HASH_MASK = (1 << 64) - 1
+# Distinct targets kept exactly before a sketch switches to HyperLogLog registers
+EXACT_LIMIT = 16
+POWERS = [2.0 ** -rank for rank in range(66)]
+
+
+def _set_register(registers: bytearray, value: int, precision: int) -> bool:
+    """HyperLogLog update: low bits pick the register, the rest give the rank"""
+    index = value & ((1 << precision) - 1)
+    rank = 64 - precision - (value >> precision).bit_length() + 1
+    if rank > registers[index]:
+        registers[index] = rank
+        return True
+    return False
+
+
+def _first(event: Mapping[str, Any], fields: Tuple[str, ...]) -> Any:
+    for field in fields:
+        value = event.get(field)
+        if value:
+            return value
+    return None
+
+
+class DistinctSketch:
+    """Distinct-count sketch: an exact set for small counts, HyperLogLog above.
+
+    Almost every source in a drop stream hits one or two targets, so a
+    sketch starts as a tuple of target hashes (a one-element tuple is far
+    smaller than a set) and only allocates its ``2 ** precision`` one-byte
+    registers once it holds more than ``EXACT_LIMIT`` of them. ``add``
+    returns whether the estimate can have changed, so callers only
+    re-estimate when needed.
+    """
+
+    __slots__ = ("exact", "registers")
+
+    def __init__(self):
+        self.exact: Optional[Tuple[int, ...]] = ()
+        self.registers: Optional[bytearray] = None
+
+    def add(self, value: int, precision: int) -> bool:
+        exact = self.exact
+        if exact is not None:
+            if value in exact:
+                return False
+            exact = self.exact = exact + (value,)
+            if len(exact) > EXACT_LIMIT:
+                registers = self.registers = bytearray(1 << precision)
+                self.exact = None
+                for item in exact:
+                    _set_register(registers, item, precision)
+            return True
+        return _set_register(self.registers, value, precision)
+
+
+def estimate(sketches: List[DistinctSketch], precision: int) -> int:
+    """Distinct values in the union of ``sketches``"""
+    if all(sketch.exact is not None for sketch in sketches):
+        if len(sketches) == 1:
+            return len(sketches[0].exact)
+        return len(set(sketches[0].exact).union(*(sketch.exact for sketch in sketches[1:])))
+    m = 1 << precision
+    registers = bytearray(m)
+    for sketch in sketches:
+        if sketch.registers is not None:
+            registers = bytearray(map(max, registers, sketch.registers))
+    for sketch in sketches:
+        if sketch.exact is not None:
+            for value in sketch.exact:
+                _set_register(registers, value, precision)
+    alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213)
+    raw = alpha * m * m / sum(POWERS[rank] for rank in registers)
+    zeros = registers.count(0)
+    if raw <= 2.5 * m and zeros:
+        return round(m * math.log(m / zeros))  # linear counting for small cardinalities
+    return round(raw)
+
+
+class SourceState:
+    """Targets of one source in the current and previous half-window"""
+
+    __slots__ = ("epoch", "current", "previous", "first_seen", "last_seen", "dstip", "dstport",
+                 "one_host", "one_port", "alerted_until", "distinct")
+
+    def __init__(self, epoch: int, now: float, dstip: str, dstport: str):
+        self.epoch = epoch
+        self.current = DistinctSketch()
+        self.previous: Optional[DistinctSketch] = None
+        self.first_seen = now
+        self.last_seen = now
+        self.dstip = dstip
+        self.dstport = dstport
+        self.one_host = True
+        self.one_port = True
+        self.alerted_until = 0.0
+        self.distinct = 0
+
+
+class ScanDetector:
+    """Flags sources that hit many distinct (dstip, dstport) targets within ``window`` seconds.
+
+    Each source keeps two sketches covering consecutive half-windows; the
+    estimate is their union, i.e. the last half to full window, like the
+    rotating slots of the heavy-hitter tracker. Sources are kept in LRU
+    order of their last event: idle ones (nothing for a whole window) are
+    evicted as new events arrive and at most ``max_sources`` are tracked,
+    so memory is bounded whatever the number of distinct sources.
+
+    ``add`` returns a synthesized scan event the first time a source
+    reaches ``threshold`` and then at most once per ``cooldown`` seconds.
+    A source whose targets all share one port is a sweep, one whose targets
+    all share one host a port scan.
+    """
+
+    def __init__(self, window: float = 300, threshold: int = 50, max_sources: int = 100000,
+                 precision: int = 7, cooldown: Optional[float] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.window = window
+        self.half = window / 2
+        self.threshold = threshold
+        self.max_sources = max_sources
+        self.precision = precision
+        self.cooldown = window if cooldown is None else cooldown
+        self.sources: "OrderedDict[str, SourceState]" = OrderedDict()
+        self.events = 0
+        self.detected = 0
+        self.evicted_idle = 0
+        self.evicted_full = 0
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def add(self, event: Mapping[str, Any], now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        srcip = _first(event, SRC_FIELDS)
+        dstip = _first(event, DST_FIELDS)
+        if not srcip or not dstip:
+            return None
+        if now is None:
+            now = time.time()
+        self.events += 1
+        srcip = str(srcip)
+        dstip = str(dstip)
+        dstport = str(_first(event, PORT_FIELDS) or "")
+        epoch = int(now // self.half)
+
+        sources = self.sources
+        state = sources.get(srcip)
+        if state is None:
+            self._evict(now)
+            state = sources[srcip] = SourceState(epoch, now, dstip, dstport)
+        else:
+            sources.move_to_end(srcip)
+            if epoch != state.epoch:
+                state.previous = state.current if epoch == state.epoch + 1 else None
+                state.current = DistinctSketch()
+                state.epoch = epoch
+                if state.previous is None:
+                    state.first_seen = now
+                    state.dstip, state.dstport = dstip, dstport
+                    state.one_host = state.one_port = True
+            state.last_seen = now
+            if state.one_host and dstip != state.dstip:
+                state.one_host = False
+            if state.one_port and dstport != state.dstport:
+                state.one_port = False
+
+        if not state.current.add(hash((dstip, dstport)) & HASH_MASK, self.precision):
+            return None
+        sketches = [state.current] if state.previous is None else [state.previous, state.current]
+        state.distinct = estimate(sketches, self.precision)
+        if state.distinct < self.threshold or now < state.alerted_until:
+            return None
+        state.alerted_until = now + self.cooldown
+        self.detected += 1
+        return self._scan_event(srcip, state, event)
+
+    def _evict(self, now: float):
+        sources = self.sources
+        # Oldest first: stop at the first source seen within the window
+        for _ in range(2):
+            if not sources:
+                return
+            srcip, state = next(iter(sources.items()))
+            if now - state.last_seen < self.window:
+                break
+            del sources[srcip]
+            self.evicted_idle += 1
+        while len(sources) >= self.max_sources:
+            sources.popitem(last=False)
+            self.evicted_full += 1
+
+    def _scan_event(self, srcip: str, state: SourceState, event: Mapping[str, Any]) -> Dict[str, Any]:
+        if state.one_port and not state.one_host:
+            kind = "sweep"
+        elif state.one_host and not state.one_port:
+            kind = "port_scan"
+        else:
+            kind = "scan"
+        scan = {
+            "@timestamp": event.get("@timestamp") or event.get("timestamp"),
+            "host": event.get("host"),
+            "topic": "scan",
+            "severity": "warning",
+            "alert_type": kind,
+            "srcip": srcip,
+            "distinct_targets": state.distinct,
+            "window": int(self.window),
+            "first_seen": state.first_seen,
+            "duration": round(state.last_seen - state.first_seen, 1),
+        }
+        if state.one_host:
+            scan["dstip"] = state.dstip
+        if state.one_port:
+            scan["dstport"] = state.dstport
+        for field in ("in_interface", "src_mac"):
+            if event.get(field):
+                scan[field] = event[field]
+        return scan
+
+    def suspects(self, n: int = 10, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Sources with the most distinct targets in the window (sketched sources only)"""
+        if now is None:
+            now = time.time()
+        candidates = []
+        for srcip, state in self.sources.items():
+            if state.current.registers is None and (state.previous is None or state.previous.registers is None):
+                continue
+            if now - state.last_seen < self.window:
+                candidates.append((state.distinct, srcip, state))
+        return [
+            {"srcip": srcip, "distinct_targets": distinct, "last_seen": state.last_seen,
+             "alerted": now < state.alerted_until}
+            for distinct, srcip, state in heapq.nlargest(n, candidates, key=lambda item: item[0])
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        sketched = sum(1 for state in self.sources.values() if state.current.registers is not None)
+        return {
+            "sources": len(self.sources),
+            "sketched_sources": sketched,
+            "max_sources": self.max_sources,
+            "window": self.window,
+            "threshold": self.threshold,
+            "registers": 1 << self.precision,
+            "events": self.events,
+            "detected": self.detected,
+            "evicted_idle": self.evicted_idle,
+            "evicted_full": self.evicted_full,
+        }
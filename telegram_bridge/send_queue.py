@@ -0,0 +1,186 @@
+"""Bounded in-memory send queue: priority order, a worker pool and load shedding of the lowest priority"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Highest first; the index is the priority used by the queue
+PRIORITIES = ("critical", "high", "medium", "low")
+PRIORITY_INDEX = {name: index for index, name in enumerate(PRIORITIES)}
+DEFAULT_PRIORITY = PRIORITY_INDEX["medium"]
+
+
+def event_priority(event: Mapping[str, Any]) -> int:
+    """Queue priority of an event from its ``priority`` field, raised by a critical/error severity"""
+    priority = PRIORITY_INDEX.get(str(event.get("priority") or "").lower(), DEFAULT_PRIORITY)
+    severity = str(event.get("severity") or "").lower()
+    if severity == "critical":
+        return PRIORITY_INDEX["critical"]
+    if severity == "error":
+        return min(priority, PRIORITY_INDEX["high"])
+    return priority
+
+
+class QueueItem:
+    __slots__ = ("payload", "priority", "queued")
+
+    def __init__(self, payload: Any, priority: int, queued: float):
+        self.payload = payload
+        self.priority = priority
+        self.queued = queued
+
+
+class SendQueue:
+    """Messages waiting for the send workers, served highest priority first (FIFO within a priority).
+
+    ``put`` never waits: the endpoint answers 202 as soon as the message is
+    queued. Each priority has its own deque, so enqueue, dequeue and
+    shedding are O(1). When ``maxsize`` messages are waiting, a new message
+    evicts the oldest one of the lowest priority below its own; if there is
+    none, the new message itself is shed. Messages older than ``max_age``
+    seconds when a worker reaches them are shed as expired. Every shed
+    message goes to ``on_shed`` (e.g. to give back its rate limit slot).
+
+    ``handler`` returns whether the message was delivered; a False (or an
+    exception) is counted as failed and passed to ``on_failed``. The caller
+    already got its 202, so this is the only record of the lost message.
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[bool]], maxsize: int = 1000, workers: int = 4,
+                 max_age: float = 0, on_shed: Optional[Callable[[Any, int, str], None]] = None,
+                 on_failed: Optional[Callable[[Any, int], None]] = None,
+                 observe_wait: Optional[Callable[[float, str], None]] = None):
+        self.handler = handler
+        self.maxsize = max(maxsize, 1)
+        self.workers = max(workers, 1)
+        self.max_age = max_age
+        self.on_shed = on_shed
+        self.on_failed = on_failed
+        self.observe_wait = observe_wait
+        self.queues: List[Deque[QueueItem]] = [deque() for _ in PRIORITIES]
+        self.size = 0
+        self.busy = 0
+        self.ready = asyncio.Event()
+        self.tasks: List["asyncio.Task[None]"] = []
+        self.closing = False
+        self.queued = [0] * len(PRIORITIES)
+        self.processed = [0] * len(PRIORITIES)
+        self.failed = [0] * len(PRIORITIES)
+        self.shed: Dict[Tuple[int, str], int] = {}
+        self.wait_total = [0.0] * len(PRIORITIES)
+        self.wait_max = [0.0] * len(PRIORITIES)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def put(self, payload: Any, priority: int = DEFAULT_PRIORITY) -> bool:
+        """Queue a message; False when it was shed instead"""
+        if self.closing:
+            self._shed(QueueItem(payload, priority, time.monotonic()), "closing")
+            return False
+        item = QueueItem(payload, priority, time.monotonic())
+        if self.size >= self.maxsize:
+            victim_queue = next((queue for queue in reversed(self.queues[priority + 1:]) if queue), None)
+            if victim_queue is None:
+                self._shed(item, "full")
+                return False
+            self.size -= 1
+            self._shed(victim_queue.popleft(), "full")
+        self.queues[priority].append(item)
+        self.size += 1
+        self.queued[priority] += 1
+        self.ready.set()
+        return True
+
+    def _shed(self, item: QueueItem, reason: str):
+        key = (item.priority, reason)
+        self.shed[key] = self.shed.get(key, 0) + 1
+        if self.on_shed is not None:
+            self.on_shed(item.payload, item.priority, reason)
+
+    def _pop(self) -> Optional[QueueItem]:
+        for queue in self.queues:
+            if queue:
+                self.size -= 1
+                return queue.popleft()
+        return None
+
+    async def _worker(self):
+        while True:
+            item = self._pop()
+            if item is None:
+                if self.closing:
+                    return
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            waited = time.monotonic() - item.queued
+            if self.max_age and waited > self.max_age:
+                self._shed(item, "expired")
+                continue
+            self.processed[item.priority] += 1
+            self.wait_total[item.priority] += waited
+            self.wait_max[item.priority] = max(self.wait_max[item.priority], waited)
+            if self.observe_wait is not None:
+                self.observe_wait(waited, PRIORITIES[item.priority])
+            self.busy += 1
+            try:
+                delivered = await self.handler(item.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error in send worker: %s", e)
+                delivered = False
+            finally:
+                self.busy -= 1
+            if not delivered:
+                self.failed[item.priority] += 1
+                if self.on_failed is not None:
+                    self.on_failed(item.payload, item.priority)
+
+    async def start(self):
+        self.closing = False
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self, timeout: float = 5.0):
+        """Stop accepting, give the workers ``timeout`` seconds to drain, then shed what is left"""
+        self.closing = True
+        self.ready.set()
+        if self.tasks:
+            done, pending = await asyncio.wait(self.tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.tasks = []
+        while True:
+            item = self._pop()
+            if item is None:
+                break
+            self._shed(item, "closing")
+
+    def depth(self) -> Dict[str, int]:
+        return {name: len(queue) for name, queue in zip(PRIORITIES, self.queues)}
+
+    def stats(self) -> Dict[str, Any]:
+        shed: Dict[str, Dict[str, int]] = {}
+        for (priority, reason), count in sorted(self.shed.items()):
+            shed.setdefault(PRIORITIES[priority], {})[reason] = count
+        return {
+            "pending": self.size,
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "depth": self.depth(),
+            "queued": dict(zip(PRIORITIES, self.queued)),
+            "processed": dict(zip(PRIORITIES, self.processed)),
+            "failed": dict(zip(PRIORITIES, self.failed)),
+            "shed": shed,
+            "avg_wait_seconds": {
+                name: round(self.wait_total[index] / self.processed[index], 4) if self.processed[index] else None
+                for index, name in enumerate(PRIORITIES)
+            },
+            "max_wait_seconds": {name: round(wait, 4) for name, wait in zip(PRIORITIES, self.wait_max)},
+        }
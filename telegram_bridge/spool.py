@@ -0,0 +1,260 @@
+"""Disk-backed outbound spool: accepted alerts survive Telegram outages and restarts"""
+import fcntl
+import logging
+import mmap
+import os
+import re
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Record: payload length, CRC32 of the payload, payload
+RECORD_HEADER = struct.Struct("<II")
+# Checkpoint: segment number and offset of the next unsent record
+CHECKPOINT = struct.Struct("<QQ")
+SEGMENT_RE = re.compile(r"^(\d{12})\.seg$")
+
+
+class Spool:
+    """Append-only queue of messages in segment files, consumed in order.
+
+    Messages are appended to the newest segment (``<number>.seg``); a new
+    segment is started once it reaches ``segment_bytes``. The consumer reads
+    one record at a time at the offset stored in ``checkpoint``, a 16-byte
+    file mapped with mmap so every ``ack`` is a memory write instead of a
+    write syscall. Fully consumed segments are deleted, so memory is constant
+    and disk use is bounded by ``max_bytes`` whatever the backlog.
+
+    A record torn by a crash is truncated from the tail of the newest segment
+    on open. A corrupt record found while reading moves the rest of its
+    segment aside as ``<number>.seg.corrupt`` (new messages go to a fresh
+    segment if it was the one being written) and reading resumes after it.
+    The directory is locked with flock so two processes never share a spool
+    (``open_spool`` picks a free numbered directory per worker).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024,
+                 max_bytes: int = 256 * 1024 * 1024, fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = open(os.path.join(directory, "lock"), "a+b")
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # BlockingIOError: another process owns this spool
+            self._lock.close()
+            raise
+
+        self.appended = 0
+        self.acked = 0
+        self.rejected = 0
+        self.corrupt = 0
+
+        self._open_checkpoint()
+        segments = self._segments()
+        read_segment, read_offset = CHECKPOINT.unpack_from(self._checkpoint)
+        # Segments before the checkpoint were consumed before a crash
+        for number in segments:
+            if number < read_segment:
+                os.remove(self._path(number))
+        segments = [number for number in segments if number >= read_segment]
+        if not segments:
+            segments = [max(read_segment, 1)]
+            read_offset = 0
+        if segments[0] != read_segment:
+            read_segment, read_offset = segments[0], 0
+
+        self._write_segment = segments[-1]
+        self._writer = open(self._path(self._write_segment), "ab")
+        self._recover_tail()
+        self._write_offset = self._writer.tell()
+
+        self._read_segment = read_segment
+        self._read_offset = read_offset
+        self._reader = open(self._path(read_segment), "rb")
+        self._next: Optional[Tuple[bytes, int]] = None
+        self._save_checkpoint()
+
+        self.pending, self.pending_bytes = self._count_pending(segments)
+
+    def _path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{number:012d}.seg")
+
+    def _segments(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_RE.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _open_checkpoint(self):
+        path = os.path.join(self.directory, "checkpoint")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < CHECKPOINT.size:
+                os.ftruncate(fd, CHECKPOINT.size)
+            self._checkpoint = mmap.mmap(fd, CHECKPOINT.size)
+        finally:
+            os.close(fd)
+
+    def _save_checkpoint(self):
+        CHECKPOINT.pack_into(self._checkpoint, 0, self._read_segment, self._read_offset)
+
+    def _recover_tail(self):
+        """Drop a partially written record at the end of the newest segment"""
+        path = self._path(self._write_segment)
+        valid = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                length, crc = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                valid = f.tell()
+        if valid < os.path.getsize(path):
+            logger.warning("Spool: truncating torn record at %s:%d", path, valid)
+            self._writer.truncate(valid)
+            self._writer.seek(valid)
+
+    def _count_pending(self, segments: List[int]) -> Tuple[int, int]:
+        """Records and bytes not yet acknowledged; reads headers only"""
+        count = size = 0
+        for number in segments:
+            start = self._read_offset if number == self._read_segment else 0
+            with open(self._path(number), "rb") as f:
+                f.seek(start)
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    length, _ = RECORD_HEADER.unpack(header)
+                    f.seek(length, os.SEEK_CUR)
+                    count += 1
+                    size += RECORD_HEADER.size + length
+        return count, size
+
+    def __len__(self) -> int:
+        return self.pending
+
+    def append(self, payload: bytes) -> bool:
+        """Write one message; False when the spool is at ``max_bytes``"""
+        record_size = RECORD_HEADER.size + len(payload)
+        if self.pending_bytes + record_size > self.max_bytes:
+            self.rejected += 1
+            return False
+        if self._write_offset and self._write_offset + record_size > self.segment_bytes:
+            self._roll()
+        self._writer.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+        self._write_offset += record_size
+        self.appended += 1
+        self.pending += 1
+        self.pending_bytes += record_size
+        return True
+
+    def _roll(self):
+        self._writer.close()
+        self._write_segment += 1
+        self._writer = open(self._path(self._write_segment), "ab")
+        self._write_offset = 0
+
+    def peek(self) -> Optional[bytes]:
+        """Oldest unacknowledged message, None when the spool is empty"""
+        while self._next is None:
+            self._reader.seek(self._read_offset)
+            header = self._reader.read(RECORD_HEADER.size)
+            if len(header) == RECORD_HEADER.size:
+                length, crc = RECORD_HEADER.unpack(header)
+                payload = self._reader.read(length)
+                if len(payload) == length and zlib.crc32(payload) == crc:
+                    self._next = (payload, RECORD_HEADER.size + length)
+                    break
+            elif self._read_segment != self._write_segment:
+                self._next_segment()
+                continue
+            if self._read_segment == self._write_segment and self._read_offset >= self._write_offset:
+                return None
+            # append writes whole records, so a bad one is corruption, not a write in progress
+            logger.error("Spool: corrupt record in %s at %d, moving the rest of the segment aside",
+                         self._path(self._read_segment), self._read_offset)
+            self.corrupt += 1
+            if self._read_segment == self._write_segment:
+                self._roll()
+            self._next_segment(quarantine=True)
+        return self._next[0]
+
+    def ack(self):
+        """Mark the message returned by ``peek`` as delivered"""
+        if self._next is None:
+            return
+        _, size = self._next
+        self._next = None
+        self._read_offset += size
+        self.acked += 1
+        self.pending = max(self.pending - 1, 0)
+        self.pending_bytes = max(self.pending_bytes - size, 0)
+        self._save_checkpoint()
+
+    def _next_segment(self, quarantine: bool = False):
+        """Move the checkpoint to the next segment; the consumed one is deleted (or kept aside if corrupt)"""
+        consumed = self._path(self._read_segment)
+        self._reader.close()
+        self._read_segment += 1
+        self._read_offset = 0
+        self._reader = open(self._path(self._read_segment), "rb")
+        self._save_checkpoint()
+        if not quarantine:
+            os.remove(consumed)
+            return
+        os.replace(consumed, consumed + ".corrupt")
+        self.pending, self.pending_bytes = self._count_pending(
+            list(range(self._read_segment, self._write_segment + 1)))
+
+    def close(self):
+        self._writer.close()
+        self._reader.close()
+        self._checkpoint.flush()
+        self._checkpoint.close()
+        self._lock.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "pending": self.pending,
+            "pending_bytes": self.pending_bytes,
+            "max_bytes": self.max_bytes,
+            "segments": self._write_segment - self._read_segment + 1,
+            "appended": self.appended,
+            "acked": self.acked,
+            "rejected": self.rejected,
+            "corrupt": self.corrupt
+        }
+
+
+def open_spool(directory: str, slots: int = 64, **kwargs: Any) -> Spool:
+    """Open the first unlocked ``<directory>/<n>`` so each worker owns one spool.
+
+    After a restart every worker picks up a numbered spool again, so
+    messages left by any previous worker are still delivered. Only a lock
+    held by another worker moves on to the next slot; any other error
+    (permissions, a full or read-only disk) is raised, so the bridge does
+    not start without the durability it was configured for.
+    """
+    for slot in range(slots):
+        try:
+            return Spool(os.path.join(directory, str(slot)), **kwargs)
+        except BlockingIOError:
+            continue
+    raise RuntimeError(f"no free spool directory under {directory}")
@@ -0,0 +1,235 @@
+"""Pluggable rate-limit and deduplication state backends"""
+import asyncio
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from dedup import DedupCache
+
+RATE_WINDOW = 60  # seconds, RATE_LIMIT is per minute
+
+
+class StateBackend(ABC):
+    """Rate-limit and dedup state consulted by every request.
+
+    ``acquire_send`` checks and records a send in a sliding one-minute window
+    in one step, so concurrent requests (or workers) cannot overshoot the
+    limit, and ``release_send`` gives the slot back when the send does not
+    happen. ``check_deduplication`` returns True the first time a hash is
+    seen within ``dedup_window`` seconds and False for duplicates.
+
+    The methods that may wait on other processes are coroutines;
+    ``release_send`` is called from synchronous callbacks and must not block.
+    """
+
+    name = "base"
+
+    def __init__(self, rate_limit: int, dedup_window: float, dedup_max_entries: int):
+        self.rate_limit = rate_limit
+        self.dedup_window = dedup_window
+        self.dedup_max_entries = dedup_max_entries
+
+    @abstractmethod
+    async def rate_count(self, now: Optional[float] = None) -> int:
+        """Sends recorded in the current window"""
+
+    @abstractmethod
+    async def acquire_send(self, now: Optional[float] = None) -> Optional[Any]:
+        """Reserve a slot in the rate limit window, None when the limit is reached"""
+
+    @abstractmethod
+    def release_send(self, slot: Any):
+        """Give back a slot whose message was not sent"""
+
+    @abstractmethod
+    async def check_deduplication(self, key: str, now: Optional[float] = None) -> bool:
+        """True the first time ``key`` is seen within the window"""
+
+    @abstractmethod
+    async def dedup_stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters of the dedup state"""
+
+    def close(self):
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """Per-process state (the default; limits are not shared between workers)"""
+
+    name = "memory"
+
+    def __init__(self, rate_limit: int, dedup_window: float, dedup_max_entries: int):
+        super().__init__(rate_limit, dedup_window, dedup_max_entries)
+        self.message_queue: deque = deque()
+        self.message_hashes = DedupCache(dedup_window, max_entries=dedup_max_entries)
+
+    def _rate_count(self, now: float) -> int:
+        message_queue = self.message_queue
+        while message_queue and now - message_queue[0] > RATE_WINDOW:
+            message_queue.popleft()
+        return len(message_queue)
+
+    async def rate_count(self, now: Optional[float] = None) -> int:
+        return self._rate_count(time.time() if now is None else now)
+
+    async def acquire_send(self, now: Optional[float] = None) -> Optional[float]:
+        if now is None:
+            now = time.time()
+        if self._rate_count(now) >= self.rate_limit:
+            return None
+        self.message_queue.append(now)
+        return now
+
+    def release_send(self, slot: float):
+        try:
+            self.message_queue.remove(slot)
+        except ValueError:
+            pass  # already outside the window
+
+    async def check_deduplication(self, key: str, now: Optional[float] = None) -> bool:
+        return self.message_hashes.check(key, now)
+
+    async def dedup_stats(self) -> Dict[str, Any]:
+        self.message_hashes.expire()
+        return self.message_hashes.stats()
+
+
+class SQLiteStateBackend(StateBackend):
+    """State in a SQLite database in WAL mode, shared by all processes using the same file.
+
+    Dedup is a single atomic UPSERT that only overwrites an expired entry, so
+    two workers can never both accept the same hash. The file survives
+    restarts, so a redeploy does not re-send the alerts of the last window.
+
+    Statements run on one dedicated thread: waiting up to ``busy_timeout``
+    for another worker's write lock holds that thread, not the event loop.
+    Released slots are deleted in the next ``acquire_send`` transaction.
+    """
+
+    name = "sqlite"
+    PRUNE_EVERY = 1024  # inserts between expiry/cap sweeps
+
+    def __init__(self, rate_limit: int, dedup_window: float, dedup_max_entries: int,
+                 path: str = "bridge_state.db", busy_timeout: float = 5.0):
+        super().__init__(rate_limit, dedup_window, dedup_max_entries)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sends (ts REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS sends_ts ON sends (ts);
+            CREATE TABLE IF NOT EXISTS dedup (hash TEXT PRIMARY KEY, ts REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS dedup_ts ON dedup (ts);
+        """)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state")
+        self._released: List[int] = []
+        self._inserts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _rate_count(self, now: float) -> int:
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM sends WHERE ts >= ?",
+                                     (now - RATE_WINDOW,)).fetchone()
+        return count
+
+    async def rate_count(self, now: Optional[float] = None) -> int:
+        return await self._run(self._rate_count, time.time() if now is None else now)
+
+    def _acquire_send(self, now: float) -> Optional[int]:
+        released, self._released = self._released, []
+        # BEGIN IMMEDIATE takes the write lock before counting, so the
+        # count and the insert are atomic across processes
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM sends WHERE ts < ?", (now - RATE_WINDOW,))
+            if released:
+                conn.executemany("DELETE FROM sends WHERE rowid = ?", [(slot,) for slot in released])
+            (count,) = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM sends LIMIT ?)",
+                                    (self.rate_limit,)).fetchone()
+            slot = None
+            if count < self.rate_limit:
+                slot = conn.execute("INSERT INTO sends (ts) VALUES (?)", (now,)).lastrowid
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            self._released.extend(released)
+            raise
+        return slot
+
+    async def acquire_send(self, now: Optional[float] = None) -> Optional[int]:
+        return await self._run(self._acquire_send, time.time() if now is None else now)
+
+    def release_send(self, slot: int):
+        self._released.append(slot)
+
+    def _check_deduplication(self, key: str, now: float) -> bool:
+        cursor = self.conn.execute(
+            "INSERT INTO dedup (hash, ts) VALUES (?, ?) "
+            "ON CONFLICT (hash) DO UPDATE SET ts = excluded.ts WHERE dedup.ts <= ?",
+            (key, now, now - self.dedup_window)
+        )
+        if cursor.rowcount == 0:
+            self.hits += 1
+            return False
+
+        self.misses += 1
+        self._inserts += 1
+        if self._inserts % self.PRUNE_EVERY == 0:
+            self._prune(now)
+        return True
+
+    async def check_deduplication(self, key: str, now: Optional[float] = None) -> bool:
+        return await self._run(self._check_deduplication, key, time.time() if now is None else now)
+
+    def _prune(self, now: float):
+        with self.conn:
+            self.conn.execute("DELETE FROM dedup WHERE ts <= ?", (now - self.dedup_window,))
+            cursor = self.conn.execute(
+                "DELETE FROM dedup WHERE hash IN ("
+                "SELECT hash FROM dedup ORDER BY ts LIMIT max((SELECT COUNT(*) FROM dedup) - ?, 0))",
+                (self.dedup_max_entries,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def _dedup_size(self) -> int:
+        (size,) = self.conn.execute("SELECT COUNT(*) FROM dedup WHERE ts > ?",
+                                    (time.time() - self.dedup_window,)).fetchone()
+        return size
+
+    async def dedup_stats(self) -> Dict[str, Any]:
+        return {
+            "size": await self._run(self._dedup_size),
+            "max_entries": self.dedup_max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "path": self.path
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self._released:
+            self.conn.executemany("DELETE FROM sends WHERE rowid = ?", [(slot,) for slot in self._released])
+        self.conn.close()
+
+
+def create_state_backend(backend: str, rate_limit: int, dedup_window: float,
+                         dedup_max_entries: int, path: str = "bridge_state.db") -> StateBackend:
+    if backend == "memory":
+        return MemoryStateBackend(rate_limit, dedup_window, dedup_max_entries)
+    if backend == "sqlite":
+        return SQLiteStateBackend(rate_limit, dedup_window, dedup_max_entries, path=path)
+    raise ValueError(f"unknown STATE_BACKEND: {backend}")
@@ -0,0 +1,144 @@
+"""Native asyncio syslog UDP listener for the low-latency alert path"""
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from routeros import parse_line
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+# (line, host, parse_line event or None) for every line, e.g. to index it
+LineHandler = Callable[[str, str, Optional[Dict[str, Any]]], Any]
+
+
+class SyslogProtocol(asyncio.DatagramProtocol):
+    """Hands datagrams to the listener queue without doing any work in the callback"""
+
+    def __init__(self, listener: "SyslogListener"):
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        listener = self.listener
+        listener.received += 1
+        try:
+            listener.queue.put_nowait((data, addr[0]))
+        except asyncio.QueueFull:
+            listener.dropped += 1
+
+    def error_received(self, exc: Exception):
+        self.listener.errors += 1
+        logger.warning("Syslog socket error: %s", exc)
+
+
+class SyslogListener:
+    """Receives RouterOS syslog over UDP and feeds parsed events to ``handler``.
+
+    With ``reuse_port`` every process (e.g. each uvicorn worker) binds the same
+    port with SO_REUSEPORT and the kernel spreads datagrams across them.
+    Datagrams that arrive while the bounded queue is full are counted in
+    ``dropped``; drops inside the kernel receive buffer are read from
+    /proc/net/udp when available. ``on_line``, when given, sees every line,
+    including the ones that are not events.
+    """
+
+    def __init__(self, handler: EventHandler, host: str = "0.0.0.0", port: int = 5514,
+                 queue_size: int = 10000, workers: int = 1, reuse_port: bool = True,
+                 rcvbuf: int = 0, on_line: Optional[LineHandler] = None):
+        self.handler = handler
+        self.on_line = on_line
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.rcvbuf = rcvbuf
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.sock: Optional[socket.socket] = None
+        self._tasks: List[asyncio.Task] = []
+        self.received = 0
+        self.dropped = 0
+        self.ignored = 0
+        self.processed = 0
+        self.errors = 0
+
+    def _create_socket(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            if hasattr(socket, "SO_REUSEPORT"):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            else:
+                logger.warning("SO_REUSEPORT not supported on this platform")
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        sock.bind((self.host, self.port))
+        sock.setblocking(False)
+        return sock
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.sock = self._create_socket()
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: SyslogProtocol(self), sock=self.sock)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info("Syslog listener on udp://%s:%s (pid %s)", self.host, self.port, os.getpid())
+
+    async def stop(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            data, host = await self.queue.get()
+            try:
+                for line in data.decode("utf-8", errors="replace").splitlines():
+                    event = parse_line(line, host)
+                    if self.on_line is not None:
+                        self.on_line(line, host, event)
+                    if event is None:
+                        self.ignored += 1
+                        continue
+                    await self.handler(event)
+                    self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error("Error processing syslog datagram from %s: %s", host, e)
+            finally:
+                self.queue.task_done()
+
+    def kernel_drops(self) -> Optional[int]:
+        """Datagrams dropped by the kernel for this socket (Linux only)"""
+        if self.sock is None:
+            return None
+        try:
+            inode = str(os.fstat(self.sock.fileno()).st_ino)
+            proc_file = "/proc/net/udp6" if self.sock.family == socket.AF_INET6 else "/proc/net/udp"
+            with open(proc_file) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[9] == inode:
+                        return int(fields[-1])
+        except (OSError, ValueError, IndexError, StopIteration):
+            pass
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": f"udp://{self.host}:{self.port}",
+            "received": self.received,
+            "processed": self.processed,
+            "ignored": self.ignored,
+            "dropped": self.dropped,
+            "kernel_drops": self.kernel_drops(),
+            "errors": self.errors,
+            "queue_depth": self.queue.qsize()
+        }
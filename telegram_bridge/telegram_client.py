@@ -0,0 +1,103 @@
+"""Shared Telegram Bot API client with keep-alive connection pooling"""
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class SendResult(NamedTuple):
+    ok: bool
+    status_code: Optional[int] = None
+    retry_after: Optional[float] = None
+    error: Optional[str] = None
+
+
+def http2_available() -> bool:
+    """Check if the optional h2 package needed for HTTP/2 is installed"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class TelegramClient:
+    """Long-lived httpx.AsyncClient for the Bot API.
+
+    Opened once per application lifespan so every alert reuses the pooled
+    TCP/TLS connections instead of paying a new handshake. New connections are
+    counted through the httpcore ``trace`` extension, which gives the
+    connection-reuse rate reported by ``/stats``.
+    """
+
+    def __init__(self, bot_token: str, base_url: str = "https://api.telegram.org",
+                 connect_timeout: float = 5.0, read_timeout: float = 10.0,
+                 max_connections: int = 10, max_keepalive: int = 5,
+                 keepalive_expiry: float = 30.0, http2: bool = False):
+        self.bot_token = bot_token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        if http2 and not http2_available():
+            logger.warning("HTTP/2 requested but h2 is not installed, using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout,
+                                            limits=self.limits, http2=self.http2)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    async def send_message(self, chat_id: str, text: str, **params: Any) -> SendResult:
+        """Call sendMessage and map the answer to a SendResult"""
+        if self.client is None:
+            await self.start()
+        
+        payload = {"chat_id": chat_id, "text": text}
+        payload.update(params)
+        self.requests += 1
+        try:
+            response = await self.client.post(f"/bot{self.bot_token}/sendMessage", json=payload,
+                                              extensions={"trace": self._trace})
+        except httpx.HTTPError as e:
+            self.errors += 1
+            return SendResult(False, error=str(e) or e.__class__.__name__)
+        
+        if response.status_code == 200:
+            return SendResult(True, 200)
+        
+        retry_after = None
+        try:
+            retry_after = response.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            pass
+        return SendResult(False, response.status_code, retry_after, response.text)
+
+    def stats(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_rate": round(reused / self.requests, 4) if self.requests else 0.0,
+            "errors": self.errors
+        }
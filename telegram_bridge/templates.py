@@ -0,0 +1,603 @@
+"""Compiled field extraction and message templates shared by all formatters"""
+import ast
+import inspect
+import logging
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FieldSpec(NamedTuple):
+    paths: Tuple[str, ...]  # alias list, tried in order; dotted paths are also tried nested
+    default: Any = None
+    transform: Optional[Callable[[Any], Any]] = None  # applied to found values only
+
+
+class Line(NamedTuple):
+    text: str  # str.format template over field and computed names
+    when: Tuple[str, ...] = ()  # rendered only if all of these are truthy
+    unless: Tuple[str, ...] = ()  # skipped if any of these is truthy
+
+
+class TemplateDef(NamedTuple):
+    fields: Dict[str, FieldSpec]
+    lines: Tuple[Line, ...]
+    # Evaluated in order after the fields. Either a Python expression over
+    # field/computed names (inlined into the generated code) or a function
+    # whose parameter names are the field/computed names it reads.
+    computed: Dict[str, Any] = {}
+
+
+def _nested_get(event: Mapping[str, Any], parts: Tuple[str, ...]) -> Any:
+    value = event
+    for part in parts:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def none_if_empty(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Mark a computed function whose result is None when all of its inputs are empty.
+
+    The generated code then skips the call for events without those fields.
+    """
+    func.none_if_empty = True
+    return func
+
+
+class _NameRewriter(ast.NodeTransformer):
+    """Rename field references in a computed expression to generated locals"""
+
+    def __init__(self, known: set):
+        self.known = known
+        self.used: set = set()
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        if node.id in self.known:
+            self.used.add(node.id)
+            return ast.copy_location(ast.Name(id=f"v_{node.id}", ctx=node.ctx), node)
+        return node
+
+
+class Template:
+    """A TemplateDef compiled into a single generated render function.
+
+    Field lookups, computed values, line conditions and f-strings are emitted
+    as straight-line Python source and compiled once. Lines sharing a
+    condition are nested under one ``if``, consecutive unconditional lines
+    become one f-string, and each value is looked up or computed only in the
+    branch that first needs it, so absent optional fields cost nothing.
+    """
+
+    def __init__(self, name: str, definition: TemplateDef):
+        self.name = name
+        self.source = self._generate(definition)
+        namespace: Dict[str, Any] = {"_nested_get": _nested_get}
+        for field, spec in definition.fields.items():
+            namespace[f"_default_{field}"] = spec.default
+            namespace[f"_transform_{field}"] = spec.transform
+        for field, compute in definition.computed.items():
+            namespace[f"_compute_{field}"] = compute
+        exec(compile(self.source, f"<template {name}>", "exec"), namespace)
+        self.render: Callable[[Mapping[str, Any]], str] = namespace["render"]
+
+    def _generate(self, definition: TemplateDef) -> str:
+        # name -> (assignment lines, names they read)
+        values: Dict[str, Tuple[List[str], Tuple[str, ...]]] = {}
+
+        for field, spec in definition.fields.items():
+            lookups = []
+            for path in spec.paths:
+                lookups.append(f"event.get({path!r})")
+                if "." in path:
+                    parts = tuple(path.split("."))
+                    if len(parts) == 2:
+                        head, tail = parts
+                        lookups.append(f"(event[{head!r}].get({tail!r}) if type(event.get({head!r})) is dict else None)")
+                    else:
+                        lookups.append(f"_nested_get(event, {parts!r})")
+            code = [f"v_{field} = {' or '.join(lookups)}"]
+            if spec.transform is not None:
+                code.append(f"v_{field} = _transform_{field}(v_{field}) if v_{field} else _default_{field}")
+            elif spec.default is not None:
+                code.append(f"v_{field} = v_{field} or _default_{field}")
+            values[field] = (code, ())
+
+        for field, compute in definition.computed.items():
+            if isinstance(compute, str):
+                rewriter = _NameRewriter(set(values))
+                expression = rewriter.visit(ast.parse(compute, mode="eval"))
+                values[field] = ([f"v_{field} = {ast.unparse(expression)}"], tuple(sorted(rewriter.used)))
+                continue
+            params = list(inspect.signature(compute).parameters)
+            missing = set(params) - set(values)
+            if missing:
+                raise ValueError(f"template {self.name!r}: {field} reads unknown fields {sorted(missing)}")
+            call = f"_compute_{field}({', '.join('v_' + p for p in params)})"
+            if getattr(compute, "none_if_empty", False):
+                call = f"{call} if {' or '.join('v_' + p for p in params)} else None"
+            values[field] = ([f"v_{field} = {call}"], tuple(params))
+
+        # (conditions as (field, negated), f-string body, fields it formats)
+        lines = []
+        for line in definition.lines:
+            pieces = []
+            used = []
+            for literal, field, spec, conversion in Formatter().parse(line.text):
+                pieces.append(literal.replace("{", "{{").replace("}", "}}"))
+                if field is not None:
+                    used.append(field)
+                    conversion = f"!{conversion}" if conversion else ""
+                    spec = f":{spec}" if spec else ""
+                    pieces.append(f"{{v_{field}{conversion}{spec}}}")
+            conditions = tuple((field, False) for field in line.when) + tuple((field, True) for field in line.unless)
+            unknown = (set(used) | {field for field, _ in conditions}) - set(values)
+            if unknown:
+                raise ValueError(f"template {self.name!r}: unknown fields {sorted(unknown)}")
+            lines.append((conditions, "".join(pieces), tuple(used)))
+
+        def emit_value(name: str, emitted: set, out: List[str], indent: str):
+            if name in emitted:
+                return
+            code, reads = values[name]
+            for dependency in reads:
+                emit_value(dependency, emitted, out, indent)
+            out.extend(indent + statement for statement in code)
+            emitted.add(name)
+
+        def emit_lines(items: List[Tuple], emitted: set, out: List[str], indent: str):
+            text: List[str] = []
+
+            def flush():
+                if text:
+                    out.append(f"{indent}parts.append(f{chr(10).join(text)!r})")
+                    text.clear()
+
+            index = 0
+            while index < len(items):
+                conditions, body, used = items[index]
+                if not conditions:
+                    for field in used:
+                        emit_value(field, emitted, out, indent)
+                    text.append(body)
+                    index += 1
+                    continue
+                # Nest under the condition shared by the longest run of following lines
+                def run(condition):
+                    end = index
+                    while end < len(items) and condition in items[end][0]:
+                        end += 1
+                    return end
+                condition = max(conditions, key=run)
+                end = run(condition)
+                flush()
+                field, negated = condition
+                emit_value(field, emitted, out, indent)
+                out.append(f"{indent}if {'not ' if negated else ''}v_{field}:")
+                inner = [(tuple(c for c in item[0] if c != condition),) + item[1:] for item in items[index:end]]
+                emit_lines(inner, set(emitted), out, indent + "    ")
+                index = end
+            flush()
+
+        render = ["def render(event):", "    parts = []"]
+        emit_lines(lines, set(), render, "    ")
+        render.append("    return '\\n'.join(parts)")
+        return "\n".join(render) + "\n"
+
+
+# ----------------------------------------------------------------------
+# Shared value helpers
+# ----------------------------------------------------------------------
+
+# The @timestamp shape Logstash and routeros.py produce; formatted by slicing instead of a datetime
+ISO_TIMESTAMP_RE = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)[T ]([01]\d|2[0-3]):([0-5]\d):([0-5]\d)(?:\.\d{1,6})?(?:Z|[+-]\d\d:\d\d)?"
+)
+# strftime format -> the same layout over the regex groups (year, month, day, hour, minute, second)
+ISO_TIMESTAMP_LAYOUTS = {
+    "%d/%m/%Y %H:%M:%S": "{2}/{1}/{0} {3}:{4}:{5}",
+    "%Y-%m-%d %H:%M:%S": "{0}-{1}-{2} {3}:{4}:{5}",
+}
+
+
+@lru_cache(maxsize=64)
+def _valid_date(year: str, month: str, day: str) -> bool:
+    try:
+        date(int(year), int(month), int(day))
+    except ValueError:
+        return False
+    return True
+
+
+def format_iso_timestamp(value: Any, fmt: str) -> Optional[str]:
+    """Format an ISO 8601 timestamp, returning None if it does not parse"""
+    layout = ISO_TIMESTAMP_LAYOUTS.get(fmt)
+    if layout is not None and type(value) is str:
+        match = ISO_TIMESTAMP_RE.fullmatch(value)
+        if match is not None:
+            parts = match.groups()
+            if _valid_date(parts[0], parts[1], parts[2]):
+                return layout.format(*parts)
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return dt.strftime(fmt)
+
+
+def first_severity(value: Any) -> str:
+    """Take the first part of a duplicated severity such as 'info,info'"""
+    value = str(value)
+    if "," in value:
+        return value.split(",", 1)[0].strip()
+    return value
+
+
+def format_network_tags(src_tags: Sequence[str], dst_tags: Sequence[str],
+                        hidden: Sequence[str] = ()) -> Optional[str]:
+    """'origem internal, guest · destino dmz' from the classifier tags (None if empty)"""
+    parts = []
+    for label, tags in (("origem", src_tags), ("destino", dst_tags)):
+        shown = [tag for tag in tags or () if tag != "ignore" and tag not in hidden]
+        if shown:
+            parts.append(f"{label} {', '.join(shown)}")
+    return " · ".join(parts) or None
+
+
+@none_if_empty
+def _network_tags(src_tags: Tuple[str, ...], dst_tags: Tuple[str, ...]) -> Optional[str]:
+    return format_network_tags(src_tags, dst_tags)
+
+
+def format_source_enrichment(country: Optional[str], asn: Optional[str], as_name: Optional[str],
+                             rdns: Optional[str]) -> Optional[str]:
+    """'BR · AS28573 CLARO · host.example.net' from the enrichment fields (None if empty)"""
+    parts = []
+    if country:
+        parts.append(country)
+    if asn:
+        parts.append(f"AS{asn} {as_name}" if as_name else f"AS{asn}")
+    if rdns:
+        parts.append(rdns)
+    return " · ".join(parts) or None
+
+
+@none_if_empty
+def _source_enrichment(src_country: Optional[str], src_asn: Optional[str], src_as_name: Optional[str],
+                       src_rdns: Optional[str]) -> Optional[str]:
+    return format_source_enrichment(src_country, src_asn, src_as_name, src_rdns)
+
+
+def extract_rule_name(message: str) -> str:
+    """Extract the rule name from a RouterOS '[chain: rule]' log prefix"""
+    rule_name = "Default Deny"
+    if "[" in message and "]" in message:
+        rule_part = message.split("[")[1].split("]")[0]
+        if ":" in rule_part:
+            rule_name = rule_part.split(":", 1)[1].strip()
+    return rule_name
+
+
+# ----------------------------------------------------------------------
+# alerts.format_alert_message
+# ----------------------------------------------------------------------
+
+def _alert_timestamp(value: Any) -> str:
+    value = str(value)
+    if "T" in value:
+        return format_iso_timestamp(value, "%Y-%m-%d %H:%M:%S") or value
+    return value
+
+
+def _alert_severity(value: Any) -> str:
+    return str(value).split(",", 1)[0].strip().upper()
+
+
+ALERT = TemplateDef(
+    fields={
+        "timestamp": FieldSpec(("timestamp", "@timestamp", "time"), "—", _alert_timestamp),
+        "host_ip": FieldSpec(("host.ip", "host", "src_host", "device_ip"), "—", str),
+        "alert_type": FieldSpec(("alert_type", "type", "topic"), "—", str),
+        "severity": FieldSpec(("severity", "level"), "—", _alert_severity),
+        "priority": FieldSpec(("priority", "prio"), "—", lambda value: str(value).upper()),
+        "action": FieldSpec(("action", "act"), "—", str),
+        "protocol": FieldSpec(("protocol", "proto"), "—", str),
+        "src_ip": FieldSpec(("source.ip", "srcip", "src_ip"), "—", str),
+        "src_port": FieldSpec(("source.port", "srcport", "src_port"), "—", str),
+        "dst_ip": FieldSpec(("destination.ip", "dstip", "dst_ip"), "—", str),
+        "dst_port": FieldSpec(("destination.port", "dstport", "dst_port"), "—", str),
+        "mac": FieldSpec(("src-mac", "src_mac", "mac", "source_mac"), "—", str),
+        "interface": FieldSpec(("interface", "in_interface", "iface"), "—", str),
+        "details": FieldSpec(("message", "details", "description"), "—", str),
+        # Added by networks.NetworkClassifier.template_fields (absent otherwise)
+        "src_tags": FieldSpec(("src_tags",), ()),
+        "dst_tags": FieldSpec(("dst_tags",), ()),
+        # Added by enrichment.Enricher.template_fields (absent otherwise)
+        "src_vendor": FieldSpec(("src_vendor",)),
+        "src_country": FieldSpec(("src_country",)),
+        "src_asn": FieldSpec(("src_asn",)),
+        "src_as_name": FieldSpec(("src_as_name",)),
+        "src_rdns": FieldSpec(("src_rdns",)),
+    },
+    computed={
+        "network_tags": _network_tags,
+        "src_enrichment": _source_enrichment,
+    },
+    lines=(
+        Line("🚨 MIKROTIK ALERT"),
+        Line("📅 {timestamp}"),
+        Line("🖥️ Host: {host_ip}"),
+        Line("⚠️ Tipo: {alert_type} | Sev: {severity} | Prio: {priority}"),
+        Line("❌ Ação: {action} | 🌐 {protocol}"),
+        Line("📤 {src_ip}:{src_port} → 📥 {dst_ip}:{dst_port}"),
+        Line("🔗 MAC: {mac} | 🔌 Iface: {interface}"),
+        Line("🗂️ Rede: {network_tags}", when=("network_tags",)),
+        Line("🏭 Fabricante: {src_vendor}", when=("src_vendor",)),
+        Line("🌍 Localização: {src_enrichment}", when=("src_enrichment",)),
+        Line("💬 {details}"),
+    ),
+)
+
+
+# ----------------------------------------------------------------------
+# app.format_telegram_message (/notify)
+# ----------------------------------------------------------------------
+
+def _notify_time(timestamp: Optional[str]) -> str:
+    timestamp = timestamp or ""
+    formatted = format_iso_timestamp(timestamp, "%d/%m/%Y %H:%M:%S")
+    if formatted is None:
+        logger.warning("Error parsing timestamp %s", timestamp)
+        formatted = timestamp[:19] if len(timestamp) > 19 else timestamp
+    return formatted
+
+
+def _notify_emojis(priority: Optional[str], alert_type: Optional[str]) -> Tuple[str, str]:
+    if priority == "high" or alert_type == "firewall_drop":
+        return "🔥", "🔴"
+    if priority == "critical":
+        return "🚨", "🔴"
+    return "⚠️", "🟡"
+
+
+@none_if_empty
+def _notify_destination_type(dst_tags: Tuple[str, ...]) -> Optional[str]:
+    if "broadcast" in dst_tags:
+        return "📢 **Tipo:** Broadcast"
+    if "multicast" in dst_tags:
+        return "📡 **Tipo:** Multicast"
+    return None
+
+
+@none_if_empty
+def _notify_network_tags(src_tags: Tuple[str, ...], dst_tags: Tuple[str, ...]) -> Optional[str]:
+    # Broadcast/multicast destinations already have their own "Tipo" line
+    return format_network_tags(src_tags, dst_tags, hidden=("broadcast", "multicast"))
+
+
+NOTIFY = TemplateDef(
+    fields={
+        "timestamp": FieldSpec(("timestamp", "@timestamp")),
+        "topic": FieldSpec(("topic",), ""),
+        "severity": FieldSpec(("severity",), "", first_severity),
+        "action": FieldSpec(("action",)),
+        "proto": FieldSpec(("proto",), "UDP"),
+        "srcip": FieldSpec(("srcip",)),
+        "srcport": FieldSpec(("srcport",), "0"),
+        "dstip": FieldSpec(("dstip",)),
+        "dstport": FieldSpec(("dstport",), "0"),
+        "message": FieldSpec(("message",), ""),
+        "priority": FieldSpec(("priority",)),
+        "alert_type": FieldSpec(("alert_type",)),
+        "src_mac": FieldSpec(("src_mac",)),
+        "in_interface": FieldSpec(("in_interface",), "Unknown"),
+        # Heavy-hitter context added by app.top_context (absent otherwise)
+        "src_rank": FieldSpec(("src_rank",)),
+        "src_rank_count": FieldSpec(("src_rank_count",)),
+        "src_rank_window": FieldSpec(("src_rank_window",)),
+        "src_tags": FieldSpec(("src_tags",), ()),
+        "dst_tags": FieldSpec(("dst_tags",), ()),
+        # Added by enrichment.Enricher.template_fields (absent otherwise)
+        "src_vendor": FieldSpec(("src_vendor",)),
+        "src_country": FieldSpec(("src_country",)),
+        "src_asn": FieldSpec(("src_asn",)),
+        "src_as_name": FieldSpec(("src_as_name",)),
+        "src_rdns": FieldSpec(("src_rdns",)),
+    },
+    computed={
+        "formatted_time": _notify_time,
+        "emojis": _notify_emojis,
+        "header_emoji": "emojis[0]",
+        "priority_emoji": "emojis[1]",
+        "is_drop": "action == 'Drop'",
+        "has_connection": "is_drop and srcip and dstip",
+        "rule_name": extract_rule_name,
+        "show_mac": "src_mac and src_mac != 'unknown'",
+        "destination_type": _notify_destination_type,
+        "network_tags": _notify_network_tags,
+        "src_enrichment": _source_enrichment,
+        "topic_upper": "topic.upper()",
+        "severity_title": "severity.title()",
+        "priority_upper": "(priority or '').upper()",
+        "log_excerpt": "message[:80] + '...' if len(message) > 80 else message",
+    },
+    lines=(
+        Line("{header_emoji} **FIREWALL BLOCKED**"),
+        Line("🕐 {formatted_time}"),
+        Line(""),
+        Line("🚫 **Regra:** {rule_name}", when=("has_connection",)),
+        Line("🌐 **Protocolo:** {proto}", when=("has_connection",)),
+        Line("🔌 **Interface:** {in_interface}", when=("has_connection",)),
+        Line("", when=("has_connection",)),
+        Line("📤 **Origem:** {srcip}:{srcport}", when=("has_connection",)),
+        Line("📥 **Destino:** {dstip}:{dstport}", when=("has_connection",)),
+        Line("🏷️ **MAC:** {src_mac}", when=("has_connection", "show_mac")),
+        Line("🏭 **Fabricante:** {src_vendor}", when=("has_connection", "show_mac", "src_vendor")),
+        Line("🌍 **Localização:** {src_enrichment}", when=("has_connection", "src_enrichment")),
+        Line("{destination_type}", when=("has_connection", "destination_type")),
+        Line("🗂️ **Rede:** {network_tags}", when=("has_connection", "network_tags")),
+        Line("📊 **Ranking:** origem #{src_rank} com {src_rank_count} drops nos últimos {src_rank_window}",
+             when=("has_connection", "src_rank")),
+        Line("📋 **{topic_upper}**", unless=("is_drop",)),
+        Line("⚠️ {severity_title}", unless=("is_drop",)),
+        Line("{priority_emoji} {priority_upper}", when=("priority",), unless=("is_drop",)),
+        Line(""),
+        Line("🔍 **Log:** {log_excerpt}"),
+    ),
+)
+
+
+# ----------------------------------------------------------------------
+# app.forward_drop_logs (/drop-forward)
+# ----------------------------------------------------------------------
+
+def _drop_forward_time(timestamp: Any) -> str:
+    if not timestamp:
+        return "N/A"
+    formatted = format_iso_timestamp(timestamp, "%d/%m/%Y %H:%M:%S")
+    if formatted is None:
+        logger.warning("Error parsing timestamp in drop-forward %s", timestamp)
+        timestamp = str(timestamp)
+        formatted = timestamp[:19] if len(timestamp) > 19 else timestamp
+    return formatted
+
+
+DROP_FORWARD = TemplateDef(
+    fields={
+        "timestamp": FieldSpec(("timestamp", "@timestamp")),
+        "protocol": FieldSpec(("protocol", "proto")),
+        "src_ip": FieldSpec(("source.ip", "srcip")),
+        "src_port": FieldSpec(("source.port", "srcport")),
+        "dst_ip": FieldSpec(("destination.ip", "dstip")),
+        "dst_port": FieldSpec(("destination.port", "dstport")),
+        "mac": FieldSpec(("src-mac", "src_mac")),
+        "interface": FieldSpec(("interface", "in_interface")),
+        "details": FieldSpec(("message",), ""),
+        "src_rank": FieldSpec(("src_rank",)),
+        "src_rank_count": FieldSpec(("src_rank_count",)),
+        "src_rank_window": FieldSpec(("src_rank_window",)),
+        "src_tags": FieldSpec(("src_tags",), ()),
+        "dst_tags": FieldSpec(("dst_tags",), ()),
+        # Added by enrichment.Enricher.template_fields (absent otherwise)
+        "src_vendor": FieldSpec(("src_vendor",)),
+        "src_country": FieldSpec(("src_country",)),
+        "src_asn": FieldSpec(("src_asn",)),
+        "src_as_name": FieldSpec(("src_as_name",)),
+        "src_rdns": FieldSpec(("src_rdns",)),
+    },
+    computed={
+        "formatted_time": _drop_forward_time,
+        "src_info": "f'{src_ip}:{src_port}' if src_port else src_ip",
+        "dst_info": "f'{dst_ip}:{dst_port}' if dst_port else dst_ip",
+        "network_tags": _network_tags,
+        "src_enrichment": _source_enrichment,
+    },
+    lines=(
+        Line("🔥 **MIKROTIK ALERT**"),
+        Line("📅 {formatted_time}"),
+        Line(""),
+        Line("🛡️ **FIREWALL DROP**"),
+        Line("📍 {protocol} • {interface}", when=("protocol", "interface")),
+        Line("📍 {protocol}", when=("protocol",), unless=("interface",)),
+        Line("🔗 {src_info} → {dst_info}", when=("src_ip", "dst_ip")),
+        Line("🏷️ {mac}", when=("mac",)),
+        Line("🏭 {src_vendor}", when=("mac", "src_vendor")),
+        Line("🌍 {src_enrichment}", when=("src_ip", "src_enrichment")),
+        Line("🗂️ {network_tags}", when=("network_tags",)),
+        Line("📊 origem #{src_rank} com {src_rank_count} drops nos últimos {src_rank_window}",
+             when=("src_ip", "src_rank")),
+        Line("─" * 25),
+        Line("💬 {details}"),
+    ),
+)
+
+
+# ----------------------------------------------------------------------
+# app.emit_scan_alert (scan_detector.ScanDetector)
+# ----------------------------------------------------------------------
+
+SCAN_KINDS = {
+    "port_scan": "Varredura de portas",
+    "sweep": "Varredura de hosts (sweep)",
+    "scan": "Varredura de hosts e portas",
+}
+
+
+def _scan_kind(alert_type: str) -> str:
+    return SCAN_KINDS.get(alert_type, alert_type)
+
+
+def _scan_window(window: Any) -> str:
+    window = int(window)
+    return f"{window // 60} min" if window >= 60 and window % 60 == 0 else f"{window} s"
+
+
+SCAN = TemplateDef(
+    fields={
+        "timestamp": FieldSpec(("@timestamp", "timestamp")),
+        "host": FieldSpec(("host",)),
+        "alert_type": FieldSpec(("alert_type",), "scan"),
+        "srcip": FieldSpec(("srcip",)),
+        "dstip": FieldSpec(("dstip",)),
+        "dstport": FieldSpec(("dstport",)),
+        "distinct_targets": FieldSpec(("distinct_targets",), 0),
+        "window": FieldSpec(("window",), 0, _scan_window),
+        "duration": FieldSpec(("duration",), 0),
+        "in_interface": FieldSpec(("in_interface",)),
+        "src_tags": FieldSpec(("src_tags",), ()),
+        "dst_tags": FieldSpec(("dst_tags",), ()),
+        "src_vendor": FieldSpec(("src_vendor",)),
+        "src_country": FieldSpec(("src_country",)),
+        "src_asn": FieldSpec(("src_asn",)),
+        "src_as_name": FieldSpec(("src_as_name",)),
+        "src_rdns": FieldSpec(("src_rdns",)),
+    },
+    computed={
+        "formatted_time": _notify_time,
+        "kind": _scan_kind,
+        "network_tags": _network_tags,
+        "src_enrichment": _source_enrichment,
+    },
+    lines=(
+        Line("🎯 **SCAN DETECTADO**"),
+        Line("🕐 {formatted_time}"),
+        Line(""),
+        Line("🔎 **Tipo:** {kind}"),
+        Line("📤 **Origem:** {srcip}"),
+        Line("🌍 **Localização:** {src_enrichment}", when=("src_enrichment",)),
+        Line("🗂️ **Rede:** {network_tags}", when=("network_tags",)),
+        Line("📥 **Destino:** {dstip}", when=("dstip",)),
+        Line("🚪 **Porta:** {dstport}", when=("dstport",)),
+        Line("🔌 **Interface:** {in_interface}", when=("in_interface",)),
+        Line("🖥️ **Host:** {host}", when=("host",)),
+        Line(""),
+        Line("📊 ~{distinct_targets} alvos distintos (ip:porta) em {duration}s (janela de {window})"),
+    ),
+)
+
+
+TEMPLATES: Dict[str, TemplateDef] = {
+    "alert": ALERT,
+    "notify": NOTIFY,
+    "drop_forward": DROP_FORWARD,
+    "scan": SCAN,
+}
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> Template:
+    """Compile a registered template once and cache it by name"""
+    try:
+        definition = TEMPLATES[name]
+    except KeyError:
+        raise KeyError(f"unknown message template: {name}") from None
+    return Template(name, definition)
+
+
+def render(name: str, event: Mapping[str, Any]) -> str:
+    return get_template(name).render(event)
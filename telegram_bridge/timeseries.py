@@ -0,0 +1,260 @@
+"""Live per-host/interface/alert_type event counts in fixed-size ring buffers (per second and per minute)"""
+import fnmatch
+import math
+import time
+from array import array
+from datetime import datetime
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# Series dimensions and their alias lists, like the template field specs
+DIMENSIONS: Dict[str, Tuple[str, ...]] = {
+    "host": ("host", "device_ip"),
+    "interface": ("in_interface", "interface"),
+    "alert_type": ("alert_type", "topic"),
+}
+TOTAL = "total"
+# Points returned per series at most; larger ranges get a coarser step
+MAX_POINTS = 11000
+
+
+def finite(number: float) -> float:
+    """``number`` itself; ValueError for nan and infinities, which float() accepts"""
+    if not math.isfinite(number):
+        raise ValueError(f"not a finite number: {number}")
+    return number
+
+
+def parse_time(value: Any, default: float) -> float:
+    """Epoch seconds from epoch seconds, epoch milliseconds (Grafana ``${__from}``) or ISO 8601"""
+    if value is None or value == "":
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    finite(number)
+    return number / 1000 if number > 1e11 else number
+
+
+def parse_step(value: Any) -> float:
+    """Seconds from a number of seconds or a Grafana interval (``500ms``, ``15s``, ``1m``, ``1h``)"""
+    if value is None or value == "":
+        return 0.0
+    text = str(value).strip()
+    for suffix, seconds in (("ms", 0.001), ("s", 1), ("m", 60), ("h", 3600), ("d", 86400)):
+        if text.endswith(suffix):
+            return finite(float(text[:-len(suffix)]) * seconds)
+    return finite(float(text))
+
+
+class Ring:
+    """Counts of the last ``len(counts)`` buckets of one resolution.
+
+    ``head`` is the absolute bucket (time // resolution) written last; slot
+    ``bucket % size`` holds a bucket while it is within ``size`` of the
+    head. Moving the head forward zeroes the slots skipped over with slice
+    assignments from a shared zero array, so an update is O(1) amortized
+    and an idle key costs nothing until its next event.
+    """
+
+    __slots__ = ("counts", "head")
+
+    def __init__(self, size: int, bucket: int):
+        self.counts = array("I", bytes(4 * size))
+        self.head = bucket
+
+    def add(self, bucket: int, zeros: array, amount: int = 1):
+        counts = self.counts
+        size = len(counts)
+        head = self.head
+        if bucket > head:
+            gap = bucket - head
+            if gap >= size:
+                counts[:] = zeros
+            else:
+                start = (head + 1) % size
+                end = start + gap
+                if end <= size:
+                    counts[start:end] = zeros[:gap]
+                else:
+                    counts[start:] = zeros[:size - start]
+                    counts[:end - size] = zeros[:end - size]
+            self.head = bucket
+        elif bucket <= head - size:
+            return  # older than the buffer
+        counts[bucket % size] += amount
+
+    def window(self, first: int, last: int, per_point: int) -> Iterator[int]:
+        """Sums of ``per_point`` consecutive buckets from ``first`` to ``last`` (inclusive), oldest first.
+
+        Only the slots in the requested range are read; buckets outside the
+        buffer (too old, or after the head) count as zero.
+        """
+        counts = self.counts
+        size = len(counts)
+        oldest = self.head - size + 1
+        if per_point == 1:
+            # One bucket per point: copy just the slots in range, zeros around them
+            low = max(first, oldest)
+            high = min(last, self.head)
+            if low > high:
+                yield from [0] * (last - first + 1)
+                return
+            yield from [0] * (low - first)
+            low_slot = low % size
+            high_slot = high % size
+            if low_slot <= high_slot:
+                yield from counts[low_slot:high_slot + 1]
+            else:
+                yield from counts[low_slot:]
+                yield from counts[:high_slot + 1]
+            yield from [0] * (last - high)
+            return
+        for start in range(first, last + 1, per_point):
+            low = max(start, oldest)
+            high = min(start + per_point - 1, last, self.head)
+            if low > high:
+                yield 0
+                continue
+            low_slot = low % size
+            high_slot = high % size
+            if low_slot <= high_slot:
+                yield sum(counts[low_slot:high_slot + 1])
+            else:
+                yield sum(counts[low_slot:]) + sum(counts[:high_slot + 1])
+
+
+class SeriesState:
+    __slots__ = ("seconds", "minutes")
+
+    def __init__(self, seconds: Ring, minutes: Ring):
+        self.seconds = seconds
+        self.minutes = minutes
+
+
+class TimeSeriesStore:
+    """Per-second and per-minute event counts per host, interface and alert_type.
+
+    Series are named ``<dimension>:<value>`` (``host:192.168.88.1``,
+    ``interface:ether1``, ``alert_type:firewall_drop``) plus ``total``.
+    Each one keeps ``seconds`` one-second and ``minutes`` one-minute
+    buckets in ``array('I')`` rings. At most ``max_keys`` series are
+    tracked; the least recently updated one is evicted to make room
+    (``total`` is never evicted).
+    """
+
+    def __init__(self, seconds: int = 900, minutes: int = 1440, max_keys: int = 1000):
+        if seconds < 60 or minutes < 1:
+            raise ValueError("need at least 60 one-second and 1 one-minute buckets")
+        self.seconds = seconds
+        self.minutes = minutes
+        self.max_keys = max_keys
+        self._second_zeros = array("I", bytes(4 * seconds))
+        self._minute_zeros = array("I", bytes(4 * minutes))
+        self.series: "OrderedDict[str, SeriesState]" = OrderedDict()
+        self.total = self._new_state(int(time.time()))
+        self.events = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def _new_state(self, second: int) -> SeriesState:
+        return SeriesState(Ring(self.seconds, second), Ring(self.minutes, second // 60))
+
+    def add(self, event: Mapping[str, Any], now: Optional[float] = None, amount: int = 1):
+        if now is None:
+            now = time.time()
+        second = int(now)
+        minute = second // 60
+        second_zeros = self._second_zeros
+        minute_zeros = self._minute_zeros
+        second_slot = second % self.seconds
+        minute_slot = minute % self.minutes
+        self.events += amount
+        states = [self.total]
+        series = self.series
+        for dimension, fields in DIMENSIONS.items():
+            value = None
+            for field in fields:
+                value = event.get(field)
+                if value:
+                    break
+            if not value or isinstance(value, dict):
+                continue
+            key = f"{dimension}:{value}"
+            state = series.get(key)
+            if state is None:
+                if len(series) >= self.max_keys:
+                    series.popitem(last=False)
+                    self.evicted += 1
+                state = series[key] = self._new_state(second)
+            else:
+                series.move_to_end(key)
+            states.append(state)
+        for state in states:
+            # Same bucket as the last event (the common case): one array increment
+            ring = state.seconds
+            if ring.head == second:
+                ring.counts[second_slot] += amount
+            else:
+                ring.add(second, second_zeros, amount)
+            ring = state.minutes
+            if ring.head == minute:
+                ring.counts[minute_slot] += amount
+            else:
+                ring.add(minute, minute_zeros, amount)
+
+    def keys(self, pattern: Optional[str] = None) -> List[str]:
+        keys = [TOTAL, *self.series]
+        if pattern:
+            keys = [key for key in keys if fnmatch.fnmatchcase(key, pattern)]
+        return sorted(keys)
+
+    def _state(self, key: str) -> Optional[SeriesState]:
+        return self.total if key == TOTAL else self.series.get(key)
+
+    def query(self, key: str, start: float, end: float, step: float = 0,
+              rate: bool = False) -> List[Tuple[int, float]]:
+        """(timestamp ms, value) points for ``key`` from ``start`` to ``end`` (epoch seconds).
+
+        Uses the one-second buckets when the range starts within them and
+        ``step`` is below a minute, the one-minute buckets otherwise. ``step``
+        is rounded up to a whole number of buckets (and coarsened to return at
+        most ``MAX_POINTS`` points); each point is the sum of its buckets, or
+        events per second with ``rate``.
+        """
+        state = self._state(key)
+        if state is None or end < start:
+            return []
+        if step < 60 and start > time.time() - self.seconds:
+            ring, resolution = state.seconds, 1
+        else:
+            ring, resolution = state.minutes, 60
+        per_point = max(1, -(-int(step) // resolution))
+        first = int(start) // resolution
+        last = int(end) // resolution
+        per_point = max(per_point, -(-(last - first + 1) // MAX_POINTS))
+        first -= first % per_point  # align points to the step, so refreshes do not shift them
+        points = [((first + index * per_point) * resolution * 1000, value)
+                  for index, value in enumerate(ring.window(first, last, per_point))]
+        if rate:
+            seconds = per_point * resolution
+            points = [(timestamp, value / seconds) for timestamp, value in points]
+        return points
+
+    def stats(self) -> Dict[str, Any]:
+        per_key = 4 * (self.seconds + self.minutes)
+        dimensions = {dimension: 0 for dimension in DIMENSIONS}
+        for key in self.series:
+            dimensions[key.split(":", 1)[0]] += 1
+        return {
+            "series": len(self.series),
+            "max_keys": self.max_keys,
+            "per_dimension": dimensions,
+            "retention": {"seconds": self.seconds, "minutes": self.minutes},
+            "buffer_bytes": per_key * (len(self.series) + 1),
+            "events": self.events,
+            "evicted": self.evicted,
+        }